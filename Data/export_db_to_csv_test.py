@@ -45,7 +45,7 @@ def export_flights_to_csv(cursor, output_dir, filename="domestic_flights.csv"):
             f.arrival_time,
             w.number as arrival_weekday,
             f.flight_number,
-            SUBSTR(f.airline, 1, 2) as airline_code,
+            f.airline_code,
             f.airline,
             f.economy_fare,
             f.business_fare,
@@ -63,7 +63,7 @@ def parse_duration(duration_str):
 
 def import_flights(data_dir):
     """Import flights from CSV"""
-    from flight.models import Flight, Place, Week
+    from flight.models import Flight, Place, Week, airline_code_from_flight_number
     
     csv_file = os.path.join(data_dir, 'domestic_flights.csv')
     
@@ -101,6 +101,7 @@ def import_flights(data_dir):
                     airline=row['airline'],
                     flight_number=row.get('flight_no', ''),
                     defaults={
+                        'airline_code': row.get('airline_code') or airline_code_from_flight_number(row.get('flight_no')),
                         'duration': parse_duration(row.get('duration')),
                         'economy_fare': float(row['economy_fare']) if row.get('economy_fare') else None,
                         'business_fare': float(row['business_fare']) if row.get('business_fare') else None,
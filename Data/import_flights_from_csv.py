@@ -49,6 +49,7 @@ def create_dummy_database(db_path):
             arrival_time TIME NOT NULL,
             plane VARCHAR(24) NOT NULL,
             airline VARCHAR(64) NOT NULL,
+            airline_code VARCHAR(3) NOT NULL DEFAULT '',
             flight_number VARCHAR(10),
             economy_fare REAL,
             business_fare REAL,
@@ -57,6 +58,7 @@ def create_dummy_database(db_path):
             FOREIGN KEY (destination_id) REFERENCES flight_place (id)
         )
     ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS flight_flight_airline_code ON flight_flight (airline_code)')
     
     # Create Flight-Week relationship table
     cursor.execute('''
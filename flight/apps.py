@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class FlightConfig(AppConfig):
     name = 'flight'
+
+    def ready(self):
+        # Register signal handlers that keep the in-memory indexes fresh
+        from . import place_index  # noqa: F401
@@ -2,6 +2,12 @@
 Constants for the flight booking application
 """
 
+# Carriers the flight search shows, by IATA airline code
+DEFAULT_AIRLINE_CODES = ('AA',)
+
+# Seat classes a flight search can ask for; each has a <class>_fare column on Flight
+SEAT_CLASSES = ('economy', 'business', 'first')
+
 # Fee and surcharge constants
 FEE = 50.0  # Base booking fee
 TAX_RATE = 0.18  # 18% GST
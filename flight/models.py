@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from datetime import datetime
+import re
 
 # Create your models here.
 
@@ -27,25 +31,101 @@ class Week(models.Model):
         return f"{self.name} ({self.number})"
 
 
+def weekday_bit(number):
+    """Bit for a Week.number (0=Monday) in Flight.operating_days"""
+    return 1 << number
+
+
+# Two-character IATA designator followed by the numeric part, e.g. AA2893, 6E155
+FLIGHT_NUMBER_RE = re.compile(r'^([A-Z0-9]{2})\d')
+
+
+def airline_code_from_flight_number(flight_number):
+    """IATA airline code prefixed to a flight number, or '' if there is none"""
+    match = FLIGHT_NUMBER_RE.match((flight_number or '').strip().upper())
+    return match.group(1) if match else ''
+
+
+class FlightQuerySet(models.QuerySet):
+    def operating_on(self, weekday):
+        """Flights whose operating_days bitmask includes the weekday"""
+        bit = weekday_bit(weekday)
+        return self.annotate(operates=F('operating_days').bitand(bit)).filter(operates=bit)
+
+    def by_airlines(self, airline_codes):
+        """Flights operated by any of the given IATA airline codes"""
+        return self.filter(airline_code__in=list(airline_codes))
+
+
 class Flight(models.Model):
     origin = models.ForeignKey(Place, on_delete=models.CASCADE, related_name="departures")
     destination = models.ForeignKey(Place, on_delete=models.CASCADE, related_name="arrivals")
     depart_time = models.TimeField(auto_now=False, auto_now_add=False)
     depart_day = models.ManyToManyField(Week, related_name="flights_of_the_day")
+    operating_days = models.PositiveSmallIntegerField(default=0)  # Bitmask of depart_day, kept in sync by signal
     duration = models.DurationField(null=True)
     arrival_time = models.TimeField(auto_now=False, auto_now_add=False)
     plane = models.CharField(max_length=24)
     airline = models.CharField(max_length=64)
+    airline_code = models.CharField(max_length=3, blank=True, default='', db_index=True)  # IATA code, e.g. AA
     flight_number = models.CharField(max_length=10, blank=True, null=True)  # Added flight number field
     economy_fare = models.FloatField(null=True)
     business_fare = models.FloatField(null=True)
     first_fare = models.FloatField(null=True)
 
+    objects = FlightQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['origin', 'destination', 'operating_days'], name='flight_route_days_idx'),
+            models.Index(fields=['origin', 'destination', 'airline_code'], name='flight_route_airline_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.airline_code:
+            self.airline_code = airline_code_from_flight_number(self.flight_number)
+        super().save(*args, **kwargs)
+
+    def operates_on(self, weekday):
+        return bool(self.operating_days & weekday_bit(weekday))
+
+    def operating_weekdays(self):
+        return [number for number in range(7) if self.operates_on(number)]
+
     def __str__(self):
         return f"{self.pk or 'New'}: {self.origin} to {self.destination}"
 
 
 
+def refresh_operating_days(flight_ids):
+    """Recompute operating_days for the given flights from the depart_day M2M"""
+    masks = dict.fromkeys(flight_ids, 0)
+    for flight_id, number in Flight.depart_day.through.objects.filter(
+        flight_id__in=list(masks)
+    ).values_list('flight_id', 'week__number'):
+        masks[flight_id] |= weekday_bit(number)
+
+    by_mask = {}
+    for flight_id, mask in masks.items():
+        by_mask.setdefault(mask, []).append(flight_id)
+    for mask, ids in by_mask.items():
+        Flight.objects.filter(id__in=ids).update(operating_days=mask)
+    return masks
+
+
+@receiver(m2m_changed, sender=Flight.depart_day.through)
+def sync_operating_days(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.operating_days = refresh_operating_days([instance.pk])[instance.pk]
+    elif pk_set is not None:
+        refresh_operating_days(pk_set)
+    else:
+        # Week.flights_of_the_day.clear(): the mask still names the affected flights
+        refresh_operating_days(Flight.objects.operating_on(instance.number).values_list('id', flat=True))
+
+
 GENDER = (
     ('male','MALE'),    #(actual_value, human_readable_value)
     ('female','FEMALE')
@@ -0,0 +1,139 @@
+"""
+Place Autocomplete Index
+In-memory prefix and n-gram index over Place code, city, airport and country
+"""
+# The monolith and the backend service are separate Django projects that each have their own
+# `flight` app, so neither can import the other's; this module is kept as identical copies in
+# flight/ and microservices/backend-service/flight/, and the backend's tests fail when they differ.
+import bisect
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Set
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Place
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ('code', 'city', 'airport', 'country')
+
+# Substrings up to this length are indexed directly; longer queries intersect
+# their trigrams and verify the candidates
+MAX_GRAM = 3
+
+# Rank buckets, lower sorts first
+RANK_CODE_EXACT = 0
+RANK_CODE_PREFIX = 1
+RANK_CITY_PREFIX = 2
+RANK_WORD_PREFIX = 3
+RANK_INFIX = 4
+
+
+class PlaceIndex:
+    """
+    Autocomplete over Place rows.
+
+    Matches are the same as a case-insensitive substring test on code, city,
+    airport and country, but candidates come from an n-gram map instead of a
+    table scan, and results are ranked: exact IATA code, code prefix, city
+    prefix, any word prefix, then plain infix matches.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None  # (places, grams, words)
+        self.version = 0
+
+    def invalidate(self):
+        """Drop the index; it is rebuilt on the next search"""
+        self._snapshot = None
+        self.version += 1
+
+    def _build(self):
+        places: Dict[int, Dict[str, Any]] = {}
+        grams: Dict[str, Set[int]] = {}
+        words = []  # sorted (word, place id) for prefix lookups
+
+        for place in Place.objects.values('id', *SEARCH_FIELDS):
+            places[place['id']] = place
+            for field in SEARCH_FIELDS:
+                text = (place[field] or '').lower()
+                for size in range(1, MAX_GRAM + 1):
+                    for start in range(len(text) - size + 1):
+                        grams.setdefault(text[start:start + size], set()).add(place['id'])
+                for word in text.split():
+                    words.append((word, place['id']))
+
+        words.sort()
+        logger.info(f"[PLACE INDEX] Built autocomplete index for {len(places)} places")
+        return places, grams, words
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            version = self.version
+            snapshot = self._build()
+            if version == self.version:
+                self._snapshot = snapshot
+            return snapshot
+
+    @staticmethod
+    def _rank(place: Dict[str, Any], query: str, prefix_ids: Set[int]) -> int:
+        code = place['code'].lower()
+        if code == query:
+            return RANK_CODE_EXACT
+        if code.startswith(query):
+            return RANK_CODE_PREFIX
+        if place['city'].lower().startswith(query):
+            return RANK_CITY_PREFIX
+        if place['id'] in prefix_ids:
+            return RANK_WORD_PREFIX
+        return RANK_INFIX
+
+    def search(self, query: str, limit: Optional[int] = 10) -> List[Dict[str, Any]]:
+        """Places matching the query anywhere in the indexed fields, best first"""
+        query = query.lower()
+        if not query:
+            return []
+        places, grams, words = self.snapshot()
+
+        if len(query) <= MAX_GRAM:
+            candidates = grams.get(query, set())
+        else:
+            trigrams = [query[i:i + MAX_GRAM] for i in range(len(query) - MAX_GRAM + 1)]
+            candidate_sets = sorted((grams.get(gram, set()) for gram in trigrams), key=len)
+            candidates = set.intersection(*candidate_sets) if candidate_sets else set()
+            candidates = {
+                place_id for place_id in candidates
+                if any(query in (places[place_id][field] or '').lower() for field in SEARCH_FIELDS)
+            }
+
+        prefix_ids = set()
+        position = bisect.bisect_left(words, (query,))
+        while position < len(words) and words[position][0].startswith(query):
+            prefix_ids.add(words[position][1])
+            position += 1
+
+        ranked = sorted(
+            (places[place_id] for place_id in candidates),
+            key=lambda place: (self._rank(place, query, prefix_ids), place['city'], place['code'])
+        )
+        return ranked[:limit] if limit is not None else ranked
+
+
+# Global instance
+place_index = PlaceIndex()
+
+
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+def invalidate_place_index(sender, **kwargs):
+    place_index.invalidate()
+    transaction.on_commit(place_index.invalidate)
@@ -0,0 +1,62 @@
+from datetime import time, timedelta
+from django.test import TestCase, Client
+from django.urls import reverse
+from .models import Place, Week, Flight
+from .place_index import place_index
+
+
+class FlightSearchViewTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        place_index.invalidate()
+        self.dallas = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        self.chicago = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.monday = Week.objects.create(number=0, name='Monday')
+        self.tuesday = Week.objects.create(number=1, name='Tuesday')
+        self.outbound = self.add_flight(self.dallas, self.chicago, 'AA100', 150, self.monday)
+        self.inbound = self.add_flight(self.chicago, self.dallas, 'AA101', 170, self.tuesday)
+        # Same route and day, but not an airline the search shows
+        self.add_flight(self.dallas, self.chicago, 'UA200', 90, self.monday, airline='United Airlines')
+
+    def add_flight(self, origin, destination, flight_number, fare, day, airline='American Airlines'):
+        flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline=airline, flight_number=flight_number,
+            economy_fare=fare, business_fare=fare * 4, first_fare=0
+        )
+        flight.depart_day.add(day)
+        return flight
+
+    def search(self, **params):
+        query = {'Origin': 'DFW', 'Destination': 'ORD', 'TripType': '1', 'DepartDate': '2026-01-05', 'SeatClass': 'economy'}
+        query.update(params)
+        return self.client.get(reverse('flight'), query)
+
+    def test_place_query_ranks_code_match_first(self):
+        Place.objects.create(city='Ordos', airport='Ordos Ejin Horo', code='DSN', country='China')
+        response = self.client.get(reverse('query', args=['ord']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([place['code'] for place in response.json()], ['ORD', 'DSN'])
+
+    def test_one_way_search_uses_operating_days_and_airline(self):
+        response = self.search()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['flights']), [self.outbound])
+        self.assertEqual((response.context['min_price'], response.context['max_price']), (100, 200))
+
+        # No flight of the route operates on a Tuesday
+        self.assertEqual(list(self.search(DepartDate='2026-01-06').context['flights']), [])
+
+    def test_round_trip_search_returns_both_legs(self):
+        response = self.search(TripType='2', ReturnDate='2026-01-06', SeatClass='business')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['flights']), [self.outbound])
+        self.assertEqual(list(response.context['flights2']), [self.inbound])
+        self.assertEqual(response.context['origin2'], self.chicago)
+        self.assertEqual((response.context['min_price2'], response.context['max_price2']), (600, 700))
+
+    def test_unknown_seat_class_is_rejected(self):
+        self.assertEqual(self.search(SeatClass='premium').status_code, 400)
+        self.assertEqual(self.search(SeatClass='').status_code, 400)
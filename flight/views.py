@@ -5,12 +5,14 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth import authenticate, login, logout
 from django.utils import timezone
+from django.db import DatabaseError
 import json
 from decimal import Decimal
 
 from datetime import datetime
 import math
 from .models import *
+from .place_index import place_index
 from capstone.utils import render_to_pdf, createticket
 
 # Import loyalty and order services
@@ -25,9 +27,11 @@ except ImportError:
 
 # Fee and Surcharge variable
 try:
-    from .constant import FEE
+    from .constant import FEE, DEFAULT_AIRLINE_CODES, SEAT_CLASSES
 except ImportError:
     FEE = 50.0  # Default fee if constant file is missing
+    DEFAULT_AIRLINE_CODES = ('AA',)
+    SEAT_CLASSES = ('economy', 'business', 'first')
 
 try:
     from flight.utils import createWeekDays, addPlaces, addDomesticFlights, addInternationalFlights
@@ -148,13 +152,23 @@ def logout_view(request):
     return HttpResponseRedirect(reverse("index"))
 
 def query(request, q):
-    places = Place.objects.all()
-    filters = []
-    q = q.lower()
-    for place in places:
-        if (q in place.city.lower()) or (q in place.airport.lower()) or (q in place.code.lower()) or (q in place.country.lower()):
-            filters.append(place)
-    return JsonResponse([{'code':place.code, 'city':place.city, 'country': place.country} for place in filters], safe=False)
+    filters = place_index.search(q, limit=None)
+    return JsonResponse([{'code':place['code'], 'city':place['city'], 'country': place['country']} for place in filters], safe=False)
+
+def search_leg(origin, destination, date, seat):
+    """Flights for one leg sorted by the seat class fare, with the leg's price range"""
+    fare_field = f'{seat}_fare'
+    flights = Flight.objects.operating_on(date.weekday()).by_airlines(DEFAULT_AIRLINE_CODES).filter(origin=origin,destination=destination).exclude(**{fare_field: 0}).order_by(fare_field)
+    try:
+        last_flight = flights.last()
+        first_flight = flights.first()
+        max_price = getattr(last_flight, fare_field) if last_flight else 0
+        min_price = getattr(first_flight, fare_field) if first_flight else 0
+    except DatabaseError as e:
+        print(f"Flight search for {origin} to {destination} failed: {e}")
+        max_price = 0
+        min_price = 0
+    return flights, min_price, max_price
 
 @csrf_exempt
 def flight(request):
@@ -164,85 +178,22 @@ def flight(request):
     departdate = request.GET.get('DepartDate')
     depart_date = datetime.strptime(departdate, "%Y-%m-%d")
     return_date = None
-    if trip_type == '2':
-        returndate = request.GET.get('ReturnDate')
-        return_date = datetime.strptime(returndate, "%Y-%m-%d")
-        flightday2 = Week.objects.get(number=return_date.weekday()) ##
-        origin2 = Place.objects.get(code=d_place.upper())   ##
-        destination2 = Place.objects.get(code=o_place.upper())  ##
     seat = request.GET.get('SeatClass')
+    if seat not in SEAT_CLASSES:
+        # search_leg builds its filter from the seat class's fare column
+        return HttpResponse(f"Unknown seat class. Please choose one of: {', '.join(SEAT_CLASSES)}.", status=400)
 
-    flightday = Week.objects.get(number=depart_date.weekday())
     destination = Place.objects.get(code=d_place.upper())
     origin = Place.objects.get(code=o_place.upper())
-    if seat == 'economy':
-        flights = Flight.objects.filter(depart_day=flightday,origin=origin,destination=destination,airline__icontains='American Airlines').exclude(economy_fare=0).order_by('economy_fare')
-        try:
-            last_flight = flights.last()
-            first_flight = flights.first()
-            max_price = last_flight.economy_fare if last_flight else 0
-            min_price = first_flight.economy_fare if first_flight else 0
-        except:
-            max_price = 0
-            min_price = 0
-
-        if trip_type == '2':    ##
-            flights2 = Flight.objects.filter(depart_day=flightday2,origin=origin2,destination=destination2,airline__icontains='American Airlines').exclude(economy_fare=0).order_by('economy_fare')    ##
-            try:
-                last_flight2 = flights2.last()
-                first_flight2 = flights2.first()
-                max_price2 = last_flight2.economy_fare if last_flight2 else 0
-                min_price2 = first_flight2.economy_fare if first_flight2 else 0
-            except:
-                max_price2 = 0
-                min_price2 = 0
-                
-    elif seat == 'business':
-        flights = Flight.objects.filter(depart_day=flightday,origin=origin,destination=destination,airline__icontains='American Airlines').exclude(business_fare=0).order_by('business_fare')
-        try:
-            last_flight = flights.last()
-            first_flight = flights.first()
-            max_price = last_flight.business_fare if last_flight else 0
-            min_price = first_flight.business_fare if first_flight else 0
-        except:
-            max_price = 0
-            min_price = 0
-
-        if trip_type == '2':    ##
-            flights2 = Flight.objects.filter(depart_day=flightday2,origin=origin2,destination=destination2,airline__icontains='American Airlines').exclude(business_fare=0).order_by('business_fare')    ##
-            try:
-                last_flight2 = flights2.last()
-                first_flight2 = flights2.first()
-                max_price2 = last_flight2.business_fare if last_flight2 else 0
-                min_price2 = first_flight2.business_fare if first_flight2 else 0
-            except:
-                max_price2 = 0
-                min_price2 = 0
-
-    elif seat == 'first':
-        flights = Flight.objects.filter(depart_day=flightday,origin=origin,destination=destination,airline__icontains='American Airlines').exclude(first_fare=0).order_by('first_fare')
-        try:
-            last_flight = flights.last()
-            first_flight = flights.first()
-            max_price = last_flight.first_fare if last_flight else 0
-            min_price = first_flight.first_fare if first_flight else 0
-        except:
-            max_price = 0
-            min_price = 0
-            
-        if trip_type == '2':    ##
-            flights2 = Flight.objects.filter(depart_day=flightday2,origin=origin2,destination=destination2,airline__icontains='American Airlines').exclude(first_fare=0).order_by('first_fare')
-            try:
-                last_flight2 = flights2.last()
-                first_flight2 = flights2.first()
-                max_price2 = last_flight2.first_fare if last_flight2 else 0
-                min_price2 = first_flight2.first_fare if first_flight2 else 0
-            except:
-                max_price2 = 0
-                min_price2 = 0
+    flights, min_price, max_price = search_leg(origin, destination, depart_date, seat)
 
     #print(calendar.day_name[depart_date.weekday()])
     if trip_type == '2':
+        returndate = request.GET.get('ReturnDate')
+        return_date = datetime.strptime(returndate, "%Y-%m-%d")
+        # The return leg is the outbound route reversed
+        origin2, destination2 = destination, origin
+        flights2, min_price2, max_price2 = search_leg(origin2, destination2, return_date, seat)
         return render(request, "flight/search.html", {
             'flights': flights,
             'origin': origin,
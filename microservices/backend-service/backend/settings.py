@@ -37,6 +37,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'flight.flight_etags.FlightDataVersionMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -64,6 +65,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Seconds a statement waits for another connection's write lock before
+        # failing with "database is locked"; SAGA workers, the step executor
+        # and the log flusher all write at once
+        'OPTIONS': {
+            'timeout': int(os.getenv('SQLITE_TIMEOUT', '20')),
+        },
+        # On disk rather than in memory, so threads writing at once wait for
+        # the lock instead of failing with "database table is locked"
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -102,6 +114,33 @@ AUTH_USER_MODEL = 'flight.User'
 PAYMENT_SERVICE_URL = os.getenv('PAYMENT_SERVICE_URL', 'http://localhost:8201')
 LOYALTY_SERVICE_URL = os.getenv('LOYALTY_SERVICE_URL', 'http://localhost:8202')
 
+# SAGA orchestration: 'threaded' or 'asyncio' (event loop, pooled connections); asyncio
+# only pays off with a database that takes concurrent writers, which SQLite does not
+SAGA_ORCHESTRATOR = os.getenv('SAGA_ORCHESTRATOR', 'threaded')
+SAGA_HTTP_CONNECTIONS_PER_SERVICE = int(os.getenv('SAGA_HTTP_CONNECTIONS_PER_SERVICE', '20'))
+# One thread, so concurrent steps of a SAGA queue their writes instead of fighting over SQLite's lock
+SAGA_DB_WORKERS = int(os.getenv('SAGA_DB_WORKERS', '1'))
+# SQLite takes one writer at a time; past two workers SAGAs mostly wait on its lock
+SAGA_WORKERS = int(os.getenv('SAGA_WORKERS', '2'))
+SAGA_QUEUE_MAX_DEPTH = int(os.getenv('SAGA_QUEUE_MAX_DEPTH', '200'))
+SAGA_RECOVERY_STALE_SECONDS = int(os.getenv('SAGA_RECOVERY_STALE_SECONDS', '120'))
+SAGA_RECOVERY_INTERVAL = int(os.getenv('SAGA_RECOVERY_INTERVAL', '60'))
+
+# SAGA step transport: 'http' for split deployments, or 'inprocess' to call steps
+# served by this process (SAGA_INPROCESS_ORIGINS) directly instead of over loopback
+SAGA_STEP_TRANSPORT = os.getenv('SAGA_STEP_TRANSPORT', 'http')
+SAGA_INPROCESS_ORIGINS = os.getenv('SAGA_INPROCESS_ORIGINS', 'http://localhost:8001').split(',')
+
+# SAGA log streams (SSE) served at once per process; each holds a server thread for up to 5 minutes
+SAGA_STREAM_MAX_CONNECTIONS = int(os.getenv('SAGA_STREAM_MAX_CONNECTIONS', '20'))
+
+# How long SAGA step endpoints replay the stored response for a (correlation_id, step)
+SAGA_IDEMPOTENCY_TTL_SECONDS = int(os.getenv('SAGA_IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+
+# Seat reservation expiry: in-process sweep interval (0 to rely on `manage.py expire_reservations`)
+RESERVATION_SWEEP_INTERVAL = int(os.getenv('RESERVATION_SWEEP_INTERVAL', '60'))
+RESERVATION_SWEEP_BATCH = int(os.getenv('RESERVATION_SWEEP_BATCH', '500'))
+
 # Logging
 LOGGING = {
     'version': 1,
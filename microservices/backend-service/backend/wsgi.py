@@ -7,10 +7,32 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/wsgi/
 """
 
+import logging
 import os
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Serving process only: drain SAGAs left queued by the previous run
+try:
+    from flight.saga_queue import saga_worker_pool
+    saga_worker_pool.start()
+except Exception as e:
+    logging.getLogger(__name__).error(f"[SAGA QUEUE] Saga workers not started: {e}")
+
+# Resume or roll back SAGAs a previous run left in flight
+try:
+    from flight.saga_recovery import saga_recovery_worker
+    saga_recovery_worker.start()
+except Exception as e:
+    logging.getLogger(__name__).error(f"[SAGA RECOVERY] Recovery worker not started: {e}")
+
+# Release seats held by abandoned reservations
+try:
+    from flight.reservation_sweeper import reservation_sweeper
+    reservation_sweeper.start()
+except Exception as e:
+    logging.getLogger(__name__).error(f"[RESERVATION SWEEPER] Sweeper not started: {e}")
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class FlightConfig(AppConfig):
     name = 'flight'
-    default_auto_field = 'django.db.models.BigAutoField'
\ No newline at end of file
+    default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        # Register signal handlers that keep the in-memory indexes fresh
+        from . import route_index, place_index, flight_payloads, fare_calendar, flight_etags  # noqa: F401
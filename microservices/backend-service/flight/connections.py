@@ -0,0 +1,152 @@
+"""
+Connection Search Engine
+One-stop itineraries enumerated from a precomputed route graph
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List
+
+from .models import Flight, weekday_bit
+from .route_index import route_index, DEFAULT_AIRLINE_CODES
+from .flight_payloads import flight_payloads
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_LAYOVER = timedelta(minutes=60)
+DEFAULT_MAX_LAYOVER = timedelta(hours=6)
+MAX_LAYOVER_LIMIT = timedelta(hours=24)
+
+SORT_KEYS = ('fare', 'duration')
+
+
+class Leg:
+    """A scheduled flight as an edge of the route graph"""
+    __slots__ = ('payload', 'origin', 'destination', 'depart_time', 'duration', 'operating_days')
+
+    def __init__(self, flight, payload):
+        self.payload = payload
+        self.origin = flight.origin.code
+        self.destination = flight.destination.code
+        self.depart_time = flight.depart_time
+        self.operating_days = flight.operating_days
+        if flight.duration:
+            self.duration = flight.duration
+        else:
+            # Fall back to the block time implied by the clock times
+            depart = datetime.combine(datetime.min, flight.depart_time)
+            arrival = datetime.combine(datetime.min, flight.arrival_time)
+            self.duration = (arrival - depart) % timedelta(days=1)
+
+    def operates_on(self, day) -> bool:
+        return bool(self.operating_days & weekday_bit(day.weekday()))
+
+    def fare(self, seat_class: str) -> float:
+        return self.payload.get(f'{seat_class}_fare') or 0.0
+
+
+class ConnectionGraph:
+    """
+    Adjacency of origin code -> destination code -> legs, built once from Flight.
+
+    The graph is tied to the route index version, so any Flight/Place/Week
+    change that invalidates the route index also forces a rebuild here.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._adjacency = None
+        self._version = None
+
+    def _build(self) -> Dict[str, Dict[str, List[Leg]]]:
+        adjacency: Dict[str, Dict[str, List[Leg]]] = {}
+        flights = list(
+            Flight.objects.by_airlines(DEFAULT_AIRLINE_CODES)
+            .exclude(operating_days=0)
+            .select_related('origin', 'destination')
+        )
+        payloads = flight_payloads.get_many(flights)
+        count = 0
+        for flight in flights:
+            leg = Leg(flight, payloads[flight.id])
+            adjacency.setdefault(leg.origin, {}).setdefault(leg.destination, []).append(leg)
+            count += 1
+        for destinations in adjacency.values():
+            for legs in destinations.values():
+                legs.sort(key=lambda leg: leg.depart_time)
+        logger.info(f"[CONNECTIONS] Built route graph with {count} legs from {len(adjacency)} airports")
+        return adjacency
+
+    def adjacency(self) -> Dict[str, Dict[str, List[Leg]]]:
+        version = route_index.version
+        if self._adjacency is not None and self._version == version:
+            return self._adjacency
+        with self._lock:
+            if self._adjacency is None or self._version != version:
+                self._adjacency = self._build()
+                self._version = version
+            return self._adjacency
+
+    def one_stop(self, origin_code: str, destination_code: str, depart_date, seat_class: str = 'economy',
+                 min_layover: timedelta = DEFAULT_MIN_LAYOVER, max_layover: timedelta = DEFAULT_MAX_LAYOVER,
+                 sort: str = 'fare', limit: int = 20) -> List[Dict[str, Any]]:
+        """One-stop itineraries departing on depart_date, ranked by total fare or duration"""
+        adjacency = self.adjacency()
+        itineraries = []
+
+        for hub, first_legs in adjacency.get(origin_code, {}).items():
+            if hub in (origin_code, destination_code):
+                continue
+            second_legs = adjacency.get(hub, {}).get(destination_code)
+            if not second_legs:
+                continue
+
+            for first in first_legs:
+                if not first.fare(seat_class) or not first.operates_on(depart_date):
+                    continue
+                departure = datetime.combine(depart_date, first.depart_time)
+                hub_arrival = departure + first.duration
+                earliest = hub_arrival + min_layover
+                latest = hub_arrival + max_layover
+
+                for second in second_legs:
+                    if not second.fare(seat_class):
+                        continue
+                    day = earliest.date()
+                    while day <= latest.date():
+                        connection = datetime.combine(day, second.depart_time)
+                        if earliest <= connection <= latest and second.operates_on(day):
+                            itineraries.append(self._itinerary(first, second, departure, hub_arrival, connection, seat_class))
+                        day += timedelta(days=1)
+
+        if sort == 'duration':
+            itineraries.sort(key=lambda item: (item['total_duration_minutes'], item['total_fare']))
+        else:
+            itineraries.sort(key=lambda item: (item['total_fare'], item['total_duration_minutes']))
+        return itineraries[:limit]
+
+    @staticmethod
+    def _itinerary(first: Leg, second: Leg, departure, hub_arrival, connection, seat_class: str) -> Dict[str, Any]:
+        arrival = connection + second.duration
+        return {
+            'via': first.payload['destination'],
+            'legs': [
+                {
+                    'flight': first.payload,
+                    'depart_datetime': departure.isoformat(),
+                    'arrival_datetime': hub_arrival.isoformat()
+                },
+                {
+                    'flight': second.payload,
+                    'depart_datetime': connection.isoformat(),
+                    'arrival_datetime': arrival.isoformat()
+                }
+            ],
+            'layover_minutes': int((connection - hub_arrival).total_seconds() // 60),
+            'total_duration_minutes': int((arrival - departure).total_seconds() // 60),
+            'total_fare': first.fare(seat_class) + second.fare(seat_class)
+        }
+
+
+# Global instance
+connection_graph = ConnectionGraph()
@@ -0,0 +1,45 @@
+"""
+Database Lock Retries
+Re-runs short writes that SQLite refused because another connection held its write lock
+"""
+import logging
+import random
+import time
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+logger = logging.getLogger(__name__)
+
+# Attempts of a write refused with "database is locked" before the error is raised
+DB_LOCK_RETRIES = getattr(settings, 'DB_LOCK_RETRIES', 5)
+
+# Seconds waited before the first retry; doubled for each one after it, with jitter
+DB_LOCK_BACKOFF = getattr(settings, 'DB_LOCK_BACKOFF', 0.05)
+
+
+def is_locked(error: Exception) -> bool:
+    return isinstance(error, OperationalError) and 'database is locked' in str(error)
+
+
+def retry_when_locked(write: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Call `write`, calling it again while SQLite reports the database as locked.
+
+    The busy timeout already makes a statement wait for the write lock, but
+    SQLite refuses at once a transaction that read first and then wants to
+    write while another connection is writing, since waiting could deadlock.
+    `write` must be safe to run again: a transaction of its own, or a single
+    statement. Inside a caller's transaction nothing is retried, as the
+    failed statement has already spoiled it.
+    """
+    for attempt in range(1, DB_LOCK_RETRIES + 1):
+        try:
+            return write(*args, **kwargs)
+        except OperationalError as e:
+            if not is_locked(e) or attempt == DB_LOCK_RETRIES or connection.in_atomic_block:
+                raise
+            delay = DB_LOCK_BACKOFF * 2 ** (attempt - 1)
+            logger.warning(f"[DB] {getattr(write, '__name__', 'write')} found the database locked, retry {attempt} in {delay:.2f}s")
+            time.sleep(random.uniform(delay / 2, delay))
@@ -30,7 +30,22 @@ def create_failed_booking_record(correlation_id: str, booking_data: Dict[str, An
             from django.contrib.auth import get_user_model
             
             User = get_user_model()
-            
+
+            # A rollback retried by the recovery worker reports again; keep one record per SAGA
+            existing_ticket = Ticket.objects.filter(saga_correlation_id=correlation_id, status='FAILED').first()
+            if existing_ticket is not None:
+                existing_ticket.compensation_executed = bool(compensation_result and compensation_result.get('successful_compensations', 0) > 0)
+                existing_ticket.compensation_details = compensation_result
+                existing_ticket.save(update_fields=['compensation_executed', 'compensation_details'])
+                logger.info(f"[SAGA FAILED BOOKING] ✅ Updated existing failed booking: {existing_ticket.ref_no}")
+                return {
+                    'success': True,
+                    'ref_no': existing_ticket.ref_no,
+                    'ticket_id': existing_ticket.id,
+                    'correlation_id': correlation_id,
+                    'message': 'Failed booking record updated in database'
+                }
+
             # Get flight
             flight_id = booking_data.get('flight_id')
             flight = Flight.objects.get(id=flight_id)
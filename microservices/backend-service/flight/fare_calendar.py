@@ -0,0 +1,178 @@
+"""
+Fare Calendar Store
+Lowest fare per route, date and seat class over the bookable window, refreshed per flight
+"""
+import logging
+import threading
+from datetime import date, timedelta
+from functools import reduce
+from operator import or_
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Place, Flight, weekday_bit
+from .route_index import SEAT_CLASSES, DEFAULT_AIRLINE_CODES
+
+logger = logging.getLogger(__name__)
+
+# Matches the 3-month booking window offered by the search form
+FARE_CALENDAR_DAYS = 90
+
+RouteKey = Tuple[str, str]
+
+FLIGHT_FIELDS = (
+    'id', 'origin__code', 'destination__code', 'operating_days',
+    'economy_fare', 'business_fare', 'first_fare'
+)
+
+
+class FareCalendar:
+    """
+    Lowest economy/business/first fare per route and date.
+
+    Fares do not vary by date and schedules repeat weekly, so the store keeps
+    the seven weekday minimums per route and expands them onto calendar
+    dates on read. A Flight change only marks that flight dirty; the next
+    read recomputes just the routes it left or joined.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Optional[Dict[RouteKey, List[Dict[str, float]]]] = None
+        self._flight_routes: Dict[int, RouteKey] = {}
+        self._dirty = set()
+        self.version = 0
+
+    def invalidate(self):
+        """Drop the whole store; it is rebuilt on the next read"""
+        self._routes = None
+        self.version += 1
+
+    def mark_dirty(self, flight_ids: Iterable[int]):
+        """Recompute the routes of these flights on the next read"""
+        self._dirty.update(flight_ids)
+
+    @staticmethod
+    def _flights():
+        return Flight.objects.by_airlines(DEFAULT_AIRLINE_CODES).exclude(operating_days=0)
+
+    @staticmethod
+    def _weekday_minimums(rows) -> List[Dict[str, float]]:
+        minimums = [{} for _ in range(7)]
+        for row in rows:
+            for weekday in range(7):
+                if not row['operating_days'] & weekday_bit(weekday):
+                    continue
+                for seat_class in SEAT_CLASSES:
+                    fare = row[f'{seat_class}_fare']
+                    if fare and fare < minimums[weekday].get(seat_class, float('inf')):
+                        minimums[weekday][seat_class] = float(fare)
+        return minimums
+
+    def _build(self):
+        by_route: Dict[RouteKey, List[Dict[str, Any]]] = {}
+        flight_routes = {}
+        for row in self._flights().values(*FLIGHT_FIELDS):
+            key = (row['origin__code'], row['destination__code'])
+            by_route.setdefault(key, []).append(row)
+            flight_routes[row['id']] = key
+        routes = {key: self._weekday_minimums(rows) for key, rows in by_route.items()}
+        logger.info(f"[FARE CALENDAR] Built weekday minimums for {len(routes)} routes")
+        return routes, flight_routes
+
+    def _refresh(self, routes, flight_ids):
+        """Recompute the routes touched by the given flights, before and after the change"""
+        affected = {self._flight_routes.pop(flight_id) for flight_id in flight_ids if flight_id in self._flight_routes}
+        for row in self._flights().filter(id__in=flight_ids).values('id', 'origin__code', 'destination__code'):
+            affected.add((row['origin__code'], row['destination__code']))
+        if not affected:
+            return
+
+        by_route = {key: [] for key in affected}
+        route_filter = reduce(or_, (Q(origin__code=o, destination__code=d) for o, d in affected))
+        for row in self._flights().filter(route_filter).values(*FLIGHT_FIELDS):
+            key = (row['origin__code'], row['destination__code'])
+            by_route[key].append(row)
+            self._flight_routes[row['id']] = key
+
+        for key, rows in by_route.items():
+            if rows:
+                routes[key] = self._weekday_minimums(rows)
+            else:
+                routes.pop(key, None)
+        logger.debug(f"[FARE CALENDAR] Refreshed {len(affected)} routes for {len(flight_ids)} flights")
+
+    def _snapshot(self) -> Dict[RouteKey, List[Dict[str, float]]]:
+        with self._lock:
+            routes = self._routes
+            if routes is None:
+                version = self.version
+                self._dirty.clear()
+                routes, self._flight_routes = self._build()
+                # A Place or schedule-wide change during the build: serve this
+                # result but rebuild on the next read
+                if version == self.version:
+                    self._routes = routes
+            elif self._dirty:
+                flight_ids, self._dirty = self._dirty, set()
+                self._refresh(routes, flight_ids)
+            return routes
+
+    def lowest_fares(self, origin_code: str, destination_code: str, start: Optional[date] = None,
+                     days: int = FARE_CALENDAR_DAYS) -> List[Dict[str, Any]]:
+        """Per-date lowest fare for each seat class (None where nothing flies) from start"""
+        start = start or date.today()
+        minimums = self._snapshot().get((origin_code, destination_code))
+        calendar = []
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            fares = minimums[day.weekday()] if minimums else {}
+            calendar.append({
+                'date': str(day),
+                'weekday': day.weekday(),
+                'fares': {seat_class: fares.get(seat_class) for seat_class in SEAT_CLASSES}
+            })
+        return calendar
+
+
+# Global instance
+fare_calendar = FareCalendar()
+
+
+def _mark_flights_dirty(flight_ids):
+    flight_ids = set(flight_ids)
+    fare_calendar.mark_dirty(flight_ids)
+    # The read path may run between the write and the commit, so mark again
+    # once the new rows are visible
+    transaction.on_commit(lambda: fare_calendar.mark_dirty(flight_ids))
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+def refresh_fare_calendar_flight(sender, instance, **kwargs):
+    _mark_flights_dirty([instance.pk])
+
+
+@receiver(m2m_changed, sender=Flight.depart_day.through)
+def refresh_fare_calendar_schedule(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _mark_flights_dirty([instance.pk])
+    elif pk_set is not None:
+        _mark_flights_dirty(pk_set)
+    else:
+        fare_calendar.invalidate()
+        transaction.on_commit(fare_calendar.invalidate)
+
+
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+def invalidate_fare_calendar(sender, **kwargs):
+    # Routes are keyed by airport code
+    fare_calendar.invalidate()
+    transaction.on_commit(fare_calendar.invalidate)
@@ -0,0 +1,87 @@
+"""
+Flight Data ETags
+Strong validators for flight responses derived from a shared flight-data version counter, and the
+middleware that keeps each worker's in-memory flight indexes in step with that counter
+"""
+import logging
+
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Place, Flight, Week, FlightDataVersion
+from .route_index import route_index
+from .place_index import place_index
+from .flight_payloads import flight_payloads
+from .fare_calendar import fare_calendar
+
+logger = logging.getLogger(__name__)
+
+# Last counter value this process served from; None until the first request
+_seen_version = None
+
+# Request paths served from the in-memory flight indexes
+INDEXED_PATH_PREFIXES = ('/api/places/', '/api/flights/')
+
+
+def _sync_local_indexes(version: int):
+    """
+    Drop the in-memory indexes when another process changed flight data.
+
+    Signals only reach the process that made the write, so the shared
+    counter is what lets every worker notice it is serving stale data.
+    """
+    global _seen_version
+    if _seen_version is not None and version != _seen_version:
+        logger.info(f"[ETAG] Flight data version {_seen_version} -> {version}, dropping local indexes")
+        route_index.invalidate()
+        place_index.invalidate()
+        flight_payloads.invalidate()
+        fare_calendar.invalidate()
+    _seen_version = version
+
+
+def _current_version(request) -> int:
+    version = getattr(request, 'flight_data_version', None)
+    if version is None:
+        version = request.flight_data_version = FlightDataVersion.current()
+        _sync_local_indexes(version)
+    return version
+
+
+class FlightDataVersionMiddleware:
+    """
+    Reads the flight-data version once per request to a flight endpoint.
+
+    Every view under INDEXED_PATH_PREFIXES answers from this process's
+    indexes, so each of them, not only the ones with an ETag, must drop the
+    indexes before serving once another worker has changed flight data.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path.startswith(INDEXED_PATH_PREFIXES):
+            _current_version(request)
+        return self.get_response(request)
+
+
+def flight_data_etag(request, *args, **kwargs) -> str:
+    """ETag for any response built only from Flight, Place and Week rows and the request URL"""
+    return f"flight-data-{_current_version(request)}"
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+@receiver(post_save, sender=Week)
+@receiver(post_delete, sender=Week)
+def bump_flight_data_version(sender, **kwargs):
+    FlightDataVersion.bump()
+
+
+@receiver(m2m_changed, sender=Flight.depart_day.through)
+def bump_flight_data_version_on_schedule_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        FlightDataVersion.bump()
@@ -0,0 +1,157 @@
+"""
+Bulk Flight Serialization
+Memoized flight payloads and batched ticket serialization with a fixed query count
+"""
+import logging
+from typing import Dict, Any, List, Optional
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Place, Flight
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_place(place) -> Dict[str, Any]:
+    """Place payload used in flight responses"""
+    return {
+        'code': place.code,
+        'city': place.city,
+        'airport': place.airport
+    }
+
+
+def serialize_flight(flight) -> Dict[str, Any]:
+    """Flight payload used in search, detail, booking and ticket responses"""
+    return {
+        'id': flight.id,
+        'plane': flight.plane,
+        'airline': flight.airline,
+        'airline_code': flight.airline_code,
+        'flight_number': flight.flight_number,
+        'origin': serialize_place(flight.origin),
+        'destination': serialize_place(flight.destination),
+        'depart_time': str(flight.depart_time),
+        'arrival_time': str(flight.arrival_time),
+        'economy_fare': float(flight.economy_fare) if flight.economy_fare else 0.0,
+        'business_fare': float(flight.business_fare) if flight.business_fare else 0.0,
+        'first_fare': float(flight.first_fare) if flight.first_fare else 0.0,
+        'duration': str(flight.duration)
+    }
+
+
+def copy_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a shared flight payload, including its place dicts, that a caller may change or keep"""
+    return {**payload, 'origin': dict(payload['origin']), 'destination': dict(payload['destination'])}
+
+
+class FlightPayloads:
+    """
+    Process-local memo of serialized flights keyed by flight id.
+
+    Payloads are shared between callers and must be treated as read-only;
+    callers that change or store one take a copy_payload() first.
+    Any Flight or Place write drops the whole memo; misses are loaded in a
+    single select_related query, so serializing N flights costs at most one
+    query however large N is.
+    """
+
+    def __init__(self):
+        self._payloads: Dict[int, Dict[str, Any]] = {}
+
+    def invalidate(self):
+        """Drop all memoized payloads"""
+        # Swap rather than clear, so a load that started before the write
+        # fills the discarded dict instead of the live one
+        self._payloads = {}
+
+    def get_many(self, flights) -> Dict[int, Dict[str, Any]]:
+        """
+        Payloads for flight ids, Flight instances or a Flight queryset, keyed by id.
+
+        Instances are expected to have origin and destination loaded already;
+        ids that do not exist are left out of the result.
+        """
+        payloads = self._payloads
+        result = {}
+
+        if isinstance(flights, QuerySet):
+            flights = flights.select_related('origin', 'destination')
+
+        missing = []
+        for item in flights:
+            if isinstance(item, Flight):
+                payload = payloads.get(item.id)
+                if payload is None:
+                    payload = payloads[item.id] = serialize_flight(item)
+                result[item.id] = payload
+            elif item is not None:
+                flight_id = int(item)
+                payload = payloads.get(flight_id)
+                if payload is None:
+                    missing.append(flight_id)
+                else:
+                    result[flight_id] = payload
+
+        if missing:
+            for flight in Flight.objects.filter(id__in=missing).select_related('origin', 'destination'):
+                result[flight.id] = payloads[flight.id] = serialize_flight(flight)
+            logger.debug(f"[FLIGHT PAYLOADS] Loaded {len(missing)} flights in one query")
+
+        return result
+
+    def get(self, flight_id) -> Optional[Dict[str, Any]]:
+        """Payload for a single flight id, or None if the flight does not exist"""
+        return self.get_many([flight_id]).get(int(flight_id))
+
+
+# Global instance
+flight_payloads = FlightPayloads()
+
+
+def serialize_tickets(tickets) -> List[Dict[str, Any]]:
+    """
+    Serialize Ticket rows in the stored-ticket shape used by the UI.
+
+    Issues one query for the tickets, one for all their passengers and at
+    most one for flights not already memoized. Tickets without a flight are
+    skipped.
+    """
+    tickets = list(tickets.prefetch_related('passengers'))
+    flights = flight_payloads.get_many(ticket.flight_id for ticket in tickets)
+
+    tickets_data = []
+    for ticket in tickets:
+        flight_data = flights.get(ticket.flight_id)
+        if flight_data is None:
+            continue
+        tickets_data.append({
+            'booking_reference': ticket.ref_no,
+            'flight': flight_data,
+            'passengers': [
+                {
+                    'first_name': p.first_name,
+                    'last_name': p.last_name,
+                    'gender': p.gender
+                } for p in ticket.passengers.all()
+            ],
+            'contact_info': {
+                'email': ticket.email,
+                'mobile': ticket.mobile
+            },
+            'booking_date': ticket.booking_date.strftime('%Y-%m-%d'),
+            'status': ticket.status.lower()
+        })
+    return tickets_data
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+def invalidate_flight_payloads(sender, **kwargs):
+    flight_payloads.invalidate()
+    transaction.on_commit(flight_payloads.invalidate)
@@ -137,6 +137,7 @@ class Command(BaseCommand):
                     duration=duration,
                     plane=flight_data['plane'],
                     airline='American Airlines',
+                    airline_code='AA',
                     flight_number=flight_data['flight_number'],  # Store flight number
                     economy_fare=economy_fare_usd,
                     business_fare=business_fare_usd,  # Business is 2.5x economy
@@ -0,0 +1,99 @@
+"""
+Management command to benchmark the booking SAGA end to end on one box
+Runs against a throwaway test database with stub payment and loyalty services
+"""
+import json
+import logging
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from flight.models import Flight, Place, Seat
+from flight.saga_benchmark import SagaBenchmark
+
+
+class Command(BaseCommand):
+    help = 'Measure booking SAGA throughput, latency and queries per SAGA against local stub services'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sagas', type=int, default=200, help='Bookings per mode')
+        parser.add_argument('--concurrency', type=int, default=10, help='Client threads posting bookings')
+        parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both',
+                            help='start-booking, start-booking-async or both')
+        parser.add_argument('--orchestrator', choices=['asyncio', 'threaded'],
+                            default=getattr(settings, 'SAGA_ORCHESTRATOR', 'threaded'))
+        parser.add_argument('--transport', choices=['http', 'inprocess'],
+                            default=getattr(settings, 'SAGA_STEP_TRANSPORT', 'http'),
+                            help='How the backend calls its own SAGA steps')
+        parser.add_argument('--payment-latency', type=float, default=20, help='Stub payment latency in ms')
+        parser.add_argument('--loyalty-latency', type=float, default=20, help='Stub loyalty latency in ms')
+        parser.add_argument('--payment-failure-rate', type=float, default=0.0, help='Share of declined authorizations')
+        parser.add_argument('--loyalty-failure-rate', type=float, default=0.0, help='Share of failed miles awards')
+        parser.add_argument('--seed', type=int, default=None, help='Seed for the stub failure draws')
+        parser.add_argument('--json', action='store_true', help='Print one JSON report per mode')
+
+    def handle(self, *args, **options):
+        if options['verbosity'] < 2:
+            # The SAGA path logs every step, and every expected failure at ERROR
+            logging.disable(logging.CRITICAL)
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            modes = ['sync', 'async'] if options['mode'] == 'both' else [options['mode']]
+            flight = self._flight(options['sagas'] * len(modes))
+            benchmark = SagaBenchmark(
+                flight.id,
+                orchestrator=options['orchestrator'],
+                payment_latency=options['payment_latency'] / 1000,
+                loyalty_latency=options['loyalty_latency'] / 1000,
+                payment_failure_rate=options['payment_failure_rate'],
+                loyalty_failure_rate=options['loyalty_failure_rate'],
+                seed=options['seed'],
+                transport=options['transport']
+            )
+            with benchmark:
+                for mode in modes:
+                    report = benchmark.run(mode, options['sagas'], options['concurrency'])
+                    self._print(report, options['json'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            logging.disable(logging.NOTSET)
+
+    @staticmethod
+    def _flight(seats: int) -> Flight:
+        """The booked flight, with an economy seat for every SAGA so none fails for a sold-out cabin"""
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+        Seat.objects.bulk_create([
+            Seat(flight=flight, seat_number=f"{number // 6 + 1}{'ABCDEF'[number % 6]}", seat_class='economy')
+            for number in range(seats)
+        ])
+        return flight
+
+    def _print(self, report, as_json):
+        if as_json:
+            self.stdout.write(json.dumps(report))
+            return
+        latency = report['latency_ms']
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['mode']} ({report['orchestrator']} orchestrator, {report['transport']} transport, "
+            f"concurrency {report['concurrency']})"
+        ))
+        self.stdout.write(
+            f"  {report['sagas']} sagas in {report['seconds']}s: {report['throughput_per_second']} sagas/s\n"
+            f"  latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}\n"
+            f"  completed {report['completed']}  failed {report['failed']}  "
+            f"rejected {report['rejected']}  errors {report['error']}\n"
+            f"  queries per saga: {report['queries_per_saga']}"
+        )
+        for reason, count in report['failure_reasons'].items():
+            self.stdout.write(f"  {count} x {reason}")
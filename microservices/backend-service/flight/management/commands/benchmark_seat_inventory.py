@@ -0,0 +1,55 @@
+"""
+Management command to benchmark seat inventory holds under contention
+Runs concurrent ReserveSeat steps against one hot flight on a throwaway test database
+"""
+import json
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from flight.management.commands.benchmark_saga import Command as SagaBenchmarkCommand
+from flight.saga_benchmark import SeatContentionBenchmark
+
+
+class Command(BaseCommand):
+    help = 'Measure ReserveSeat throughput on a single hot flight and check its seat counter for oversells'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sagas', type=int, default=500, help='Reservations to attempt')
+        parser.add_argument('--concurrency', type=int, default=16, help='Threads reserving at the same time')
+        parser.add_argument('--capacity', type=int, default=144, help='Seats on the hot flight')
+        parser.add_argument('--seat-class', choices=['economy', 'business', 'first'], default='economy')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if options['verbosity'] < 2:
+            # Every reservation and every sold-out refusal is logged
+            logging.disable(logging.CRITICAL)
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            flight = SagaBenchmarkCommand._flight()
+            benchmark = SeatContentionBenchmark(flight.id, capacity=options['capacity'], seat_class=options['seat_class'])
+            report = benchmark.run(options['sagas'], options['concurrency'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            logging.disable(logging.NOTSET)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+            return
+        latency = report['latency_ms']
+        style = self.style.SUCCESS if report['consistent'] else self.style.ERROR
+        self.stdout.write(style(
+            f"{report['sagas']} reservations, {report['concurrency']} threads, {report['capacity']} seats: "
+            f"{'consistent' if report['consistent'] else 'INCONSISTENT'}"
+        ))
+        self.stdout.write(
+            f"  {report['throughput_per_second']} reservations/s over {report['seconds']}s\n"
+            f"  latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}\n"
+            f"  held {report['held']}  sold out {report['sold_out']}  errors {report['error']}  "
+            f"remaining {report['remaining']}  seats assigned {report['seats_assigned']}"
+        )
+        for reason, count in report['failure_reasons'].items():
+            self.stdout.write(f"  {count} x {reason}")
@@ -0,0 +1,28 @@
+"""
+Management command to expire abandoned seat reservations
+Runs one sweep of the reservation sweeper, for cron when the in-process scheduler is off
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from flight.reservation_sweeper import ReservationSweeper, SWEEP_BATCH
+
+
+class Command(BaseCommand):
+    help = 'Expire RESERVED seat reservations past expires_at and release their seats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH, help='Reservations expired per transaction')
+        parser.add_argument('--json', action='store_true', help='Print the sweep report as JSON')
+
+    def handle(self, *args, **options):
+        report = ReservationSweeper(interval=0, batch_size=options['batch_size']).sweep()
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {report['expired']} reservations in {len(report['batches'])} batches, "
+            f"released {report['seats_released']} seats"
+        ))
+        self.stdout.write(f"  lag {report['lag_seconds']}s, sweep took {report['seconds']}s, batches {report['batches']}")
@@ -2,7 +2,7 @@ import csv
 import os
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from flight.models import Place, Flight
+from flight.models import Place, Flight, airline_code_from_flight_number
 from datetime import datetime, time
 
 
@@ -150,6 +150,8 @@ class Command(BaseCommand):
                         airline=airline,
                         defaults={
                             'plane': plane,
+                            'flight_number': flight_number,
+                            'airline_code': airline_code_from_flight_number(flight_number),
                             'arrival_time': arrival_time,
                             'duration': duration_hours,
                             'economy_fare': economy_fare,
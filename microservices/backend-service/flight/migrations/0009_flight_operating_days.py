@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+def backfill_operating_days(apps, schema_editor):
+    Flight = apps.get_model('flight', 'Flight')
+
+    masks = {}
+    for flight_id, number in Flight.depart_day.through.objects.values_list('flight_id', 'week__number'):
+        masks[flight_id] = masks.get(flight_id, 0) | (1 << number)
+
+    by_mask = {}
+    for flight_id, mask in masks.items():
+        by_mask.setdefault(mask, []).append(flight_id)
+    for mask, ids in by_mask.items():
+        Flight.objects.filter(id__in=ids).update(operating_days=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0008_auto_20260123_1616'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='operating_days',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['origin', 'destination', 'operating_days'], name='flight_route_days_idx'),
+        ),
+        migrations.RunPython(backfill_operating_days, migrations.RunPython.noop),
+    ]
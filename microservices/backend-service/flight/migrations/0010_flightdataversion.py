@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    FlightDataVersion = apps.get_model('flight', 'FlightDataVersion')
+    FlightDataVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0009_flight_operating_days'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightDataVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
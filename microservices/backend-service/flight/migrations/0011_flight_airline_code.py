@@ -0,0 +1,42 @@
+import re
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def backfill_airline_code(apps, schema_editor):
+    Flight = apps.get_model('flight', 'Flight')
+    flight_number_re = re.compile(r'^([A-Z0-9]{2})\d')
+
+    # Older imports stored the flight number in plane; some rows were mangled
+    # by spreadsheet round-trips, so each airline takes its most common prefix
+    votes = {}
+    for airline, flight_number, plane in Flight.objects.values_list('airline', 'flight_number', 'plane'):
+        for candidate in (flight_number, plane):
+            match = flight_number_re.match((candidate or '').strip().upper())
+            if match:
+                votes.setdefault(airline, Counter())[match.group(1)] += 1
+                break
+
+    for airline, counter in votes.items():
+        Flight.objects.filter(airline=airline).update(airline_code=counter.most_common(1)[0][0])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0010_flightdataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='airline_code',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=3),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['origin', 'destination', 'airline_code'], name='flight_route_airline_idx'),
+        ),
+        migrations.RunPython(backfill_airline_code, migrations.RunPython.noop),
+    ]
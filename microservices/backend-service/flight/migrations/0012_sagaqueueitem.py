@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0011_flight_airline_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SagaQueueItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('correlation_id', models.CharField(max_length=50, unique=True)),
+                ('booking_data', models.JSONField()),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed'), ('INTERRUPTED', 'Interrupted')], default='QUEUED', max_length=15)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='sagaqueueitem',
+            index=models.Index(fields=['status', 'created_at'], name='saga_queue_status_idx'),
+        ),
+    ]
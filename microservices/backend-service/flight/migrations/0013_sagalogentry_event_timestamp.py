@@ -0,0 +1,21 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0012_sagaqueueitem'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='sagalogentry',
+            options={'ordering': ['timestamp', 'id']},
+        ),
+        migrations.AlterField(
+            model_name='sagalogentry',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0013_sagalogentry_event_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sagatransaction',
+            name='current_step',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sagatransaction',
+            name='step_outcomes',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='sagatransaction',
+            name='recovery_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='sagatransaction',
+            name='status',
+            field=models.CharField(choices=[('STARTED', 'Started'), ('IN_PROGRESS', 'In Progress'), ('COMPENSATING', 'Compensating'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed'), ('COMPENSATED', 'Compensated')], default='STARTED', max_length=15),
+        ),
+        migrations.AddIndex(
+            model_name='sagatransaction',
+            index=models.Index(fields=['status', 'updated_at'], name='saga_txn_status_updated_idx'),
+        ),
+    ]
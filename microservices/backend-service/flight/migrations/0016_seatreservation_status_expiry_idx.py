@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def confirm_booked_reservations(apps, schema_editor):
+    SeatReservation = apps.get_model('flight', 'SeatReservation')
+    SagaTransaction = apps.get_model('flight', 'SagaTransaction')
+    Ticket = apps.get_model('flight', 'Ticket')
+
+    # ConfirmBooking used to leave reservations RESERVED; the expiry sweeper
+    # must not release the seats of bookings that went through
+    completed = SagaTransaction.objects.filter(status='COMPLETED').values('correlation_id')
+    ticketed = Ticket.objects.exclude(status='FAILED').exclude(saga_correlation_id=None).values('saga_correlation_id')
+    reserved = SeatReservation.objects.filter(status='RESERVED')
+    reserved.filter(correlation_id__in=completed).update(status='CONFIRMED')
+    reserved.filter(correlation_id__in=ticketed).update(status='CONFIRMED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0015_sagaidempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='seatreservation',
+            index=models.Index(fields=['status', 'expires_at'], name='seat_resv_status_expiry_idx'),
+        ),
+        migrations.RunPython(confirm_booked_reservations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0016_seatreservation_status_expiry_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatInventory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('departure_date', models.DateField()),
+                ('seat_class', models.CharField(choices=[('economy', 'Economy'), ('business', 'Business'), ('first', 'First')], max_length=10)),
+                ('capacity', models.PositiveIntegerField()),
+                ('remaining', models.IntegerField()),
+                ('flight', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='flight.flight')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='seatinventory',
+            constraint=models.UniqueConstraint(fields=('flight', 'departure_date', 'seat_class'), name='seat_inventory_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='seatinventory',
+            constraint=models.CheckConstraint(check=models.Q(remaining__gte=0), name='seat_inventory_not_oversold'),
+        ),
+        migrations.AddField(
+            model_name='seatreservation',
+            name='inventory',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='flight.seatinventory'),
+        ),
+        migrations.AddField(
+            model_name='seatreservation',
+            name='seat_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
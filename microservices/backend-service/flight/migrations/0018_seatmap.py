@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0017_seatinventory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatMap',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('departure_date', models.DateField()),
+                ('seat_class', models.CharField(choices=[('economy', 'Economy'), ('business', 'Business'), ('first', 'First')], max_length=10)),
+                ('layout', models.CharField(max_length=24)),
+                ('occupied', models.BinaryField()),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('flight', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_maps', to='flight.flight')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='seatmap',
+            constraint=models.UniqueConstraint(fields=('flight', 'departure_date', 'seat_class'), name='seat_map_key'),
+        ),
+        migrations.AddField(
+            model_name='seatreservation',
+            name='seat_map',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='flight.seatmap'),
+        ),
+        migrations.AddField(
+            model_name='seatreservation',
+            name='seat_numbers',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
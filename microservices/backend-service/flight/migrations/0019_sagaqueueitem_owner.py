@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0018_seatmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sagaqueueitem',
+            name='owner',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+def copy_held_departure_dates(apps, schema_editor):
+    """Reservations made before the field existed held seats on their inventory row's departure"""
+    SeatReservation = apps.get_model('flight', 'SeatReservation')
+    for reservation in SeatReservation.objects.filter(departure_date__isnull=True).exclude(inventory=None).select_related('inventory'):
+        reservation.departure_date = reservation.inventory.departure_date
+        reservation.save(update_fields=['departure_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0019_sagaqueueitem_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seatreservation',
+            name='departure_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_held_departure_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def delete_empty_inventory(apps, schema_editor):
+    """Counters created while a plane's layout had no such cabin; they are rebuilt with its capacity on next use"""
+    SeatInventory = apps.get_model('flight', 'SeatInventory')
+    SeatInventory.objects.filter(capacity=0, remaining=0, reservations=None).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0020_seatreservation_departure_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_empty_inventory, migrations.RunPython.noop),
+    ]
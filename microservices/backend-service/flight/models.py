@@ -1,8 +1,12 @@
 
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from datetime import datetime
+import re
 
 # Create your models here.
 
@@ -28,25 +32,101 @@ class Week(models.Model):
         return f"{self.name} ({self.number})"
 
 
+def weekday_bit(number):
+    """Bit for a Week.number (0=Monday) in Flight.operating_days"""
+    return 1 << number
+
+
+# Two-character IATA designator followed by the numeric part, e.g. AA2893, 6E155
+FLIGHT_NUMBER_RE = re.compile(r'^([A-Z0-9]{2})\d')
+
+
+def airline_code_from_flight_number(flight_number):
+    """IATA airline code prefixed to a flight number, or '' if there is none"""
+    match = FLIGHT_NUMBER_RE.match((flight_number or '').strip().upper())
+    return match.group(1) if match else ''
+
+
+class FlightQuerySet(models.QuerySet):
+    def operating_on(self, weekday):
+        """Flights whose operating_days bitmask includes the weekday"""
+        bit = weekday_bit(weekday)
+        return self.annotate(operates=F('operating_days').bitand(bit)).filter(operates=bit)
+
+    def by_airlines(self, airline_codes):
+        """Flights operated by any of the given IATA airline codes"""
+        return self.filter(airline_code__in=list(airline_codes))
+
+
 class Flight(models.Model):
     origin = models.ForeignKey(Place, on_delete=models.CASCADE, related_name="departures")
     destination = models.ForeignKey(Place, on_delete=models.CASCADE, related_name="arrivals")
     depart_time = models.TimeField(auto_now=False, auto_now_add=False)
     depart_day = models.ManyToManyField(Week, related_name="flights_of_the_day")
+    operating_days = models.PositiveSmallIntegerField(default=0)  # Bitmask of depart_day, kept in sync by signal
     duration = models.DurationField(null=True)
     arrival_time = models.TimeField(auto_now=False, auto_now_add=False)
     plane = models.CharField(max_length=24)
     airline = models.CharField(max_length=64)
+    airline_code = models.CharField(max_length=3, blank=True, default='', db_index=True)  # IATA code, e.g. AA
     flight_number = models.CharField(max_length=10, blank=True, null=True)  # Added flight number field
     economy_fare = models.FloatField(null=True)
     business_fare = models.FloatField(null=True)
     first_fare = models.FloatField(null=True)
 
+    objects = FlightQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['origin', 'destination', 'operating_days'], name='flight_route_days_idx'),
+            models.Index(fields=['origin', 'destination', 'airline_code'], name='flight_route_airline_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.airline_code:
+            self.airline_code = airline_code_from_flight_number(self.flight_number)
+        super().save(*args, **kwargs)
+
+    def operates_on(self, weekday):
+        return bool(self.operating_days & weekday_bit(weekday))
+
+    def operating_weekdays(self):
+        return [number for number in range(7) if self.operates_on(number)]
+
     def __str__(self):
         flight_display = self.flight_number if self.flight_number else f"Flight {self.pk}"
         return f"{flight_display}: {self.origin} to {self.destination}"
 
 
+def refresh_operating_days(flight_ids):
+    """Recompute operating_days for the given flights from the depart_day M2M"""
+    masks = dict.fromkeys(flight_ids, 0)
+    for flight_id, number in Flight.depart_day.through.objects.filter(
+        flight_id__in=list(masks)
+    ).values_list('flight_id', 'week__number'):
+        masks[flight_id] |= weekday_bit(number)
+
+    by_mask = {}
+    for flight_id, mask in masks.items():
+        by_mask.setdefault(mask, []).append(flight_id)
+    for mask, ids in by_mask.items():
+        Flight.objects.filter(id__in=ids).update(operating_days=mask)
+    return masks
+
+
+@receiver(m2m_changed, sender=Flight.depart_day.through)
+def sync_operating_days(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.operating_days = refresh_operating_days([instance.pk])[instance.pk]
+    elif pk_set is not None:
+        refresh_operating_days(pk_set)
+    else:
+        # Week.flights_of_the_day.clear(): the mask still names the affected flights
+        refresh_operating_days(Flight.objects.operating_on(instance.number).values_list('id', flat=True))
+
+
 GENDER = (
     ('male','MALE'),    #(actual_value, human_readable_value)
     ('female','FEMALE')
@@ -124,6 +204,42 @@ class Seat(models.Model):
         return f"{self.flight.flight_number} - {self.seat_number} ({self.seat_class})"
 
 
+class SeatInventory(models.Model):
+    """Seats left per flight, departure date and class; held and released by SAGA reservations"""
+    flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name='inventory')
+    departure_date = models.DateField()
+    seat_class = models.CharField(max_length=10, choices=Seat.SEAT_CLASS_CHOICES)
+    capacity = models.PositiveIntegerField()
+    remaining = models.IntegerField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['flight', 'departure_date', 'seat_class'], name='seat_inventory_key'),
+            models.CheckConstraint(check=models.Q(remaining__gte=0), name='seat_inventory_not_oversold'),
+        ]
+    
+    def __str__(self):
+        return f"{self.flight_id} {self.departure_date} {self.seat_class}: {self.remaining}/{self.capacity}"
+
+
+class SeatMap(models.Model):
+    """Occupied seats of one cabin on one departure, one bit per seat of the plane's seat layout"""
+    flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name='seat_maps')
+    departure_date = models.DateField()
+    seat_class = models.CharField(max_length=10, choices=Seat.SEAT_CLASS_CHOICES)
+    layout = models.CharField(max_length=24)  # Key of the seat layout the bits are ordered by
+    occupied = models.BinaryField()  # Little-endian bitmap, bit i set when seat i is taken
+    version = models.PositiveIntegerField(default=0)  # Bumped by every change to the bitmap
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['flight', 'departure_date', 'seat_class'], name='seat_map_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.flight_id} {self.departure_date} {self.seat_class} ({self.layout})"
+
+
 class SeatReservation(models.Model):
     """SAGA seat reservation tracking"""
     RESERVATION_STATUS_CHOICES = [
@@ -140,6 +256,16 @@ class SeatReservation(models.Model):
     status = models.CharField(max_length=10, choices=RESERVATION_STATUS_CHOICES, default='RESERVED')
     reserved_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()  # Reservation expiry
+    inventory = models.ForeignKey(SeatInventory, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations')
+    seat_count = models.PositiveIntegerField(default=0)  # Seats held on the inventory counter
+    seat_map = models.ForeignKey(SeatMap, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations')
+    seat_numbers = models.JSONField(default=list, blank=True)  # Seats assigned on the seat map
+    departure_date = models.DateField(null=True, blank=True)  # Departure the seats were held on; the ticket is issued for it
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='seat_resv_status_expiry_idx'),
+        ]
     
     def __str__(self):
         return f"Reservation {self.correlation_id} - {self.status}"
@@ -150,6 +276,7 @@ class SagaTransaction(models.Model):
     SAGA_STATUS_CHOICES = [
         ('STARTED', 'Started'),
         ('IN_PROGRESS', 'In Progress'),
+        ('COMPENSATING', 'Compensating'),
         ('COMPLETED', 'Completed'),
         ('FAILED', 'Failed'),
         ('COMPENSATED', 'Compensated')
@@ -164,9 +291,17 @@ class SagaTransaction(models.Model):
     failed_step = models.CharField(max_length=50, blank=True, null=True)
     error_message = models.TextField(blank=True, null=True)
     compensation_executed = models.BooleanField(default=False)
+    current_step = models.IntegerField(default=0)  # Index of the step being run or compensated
+    step_outcomes = models.JSONField(default=dict)  # Step name -> STARTED/SUCCEEDED/FAILED/COMPENSATED/COMPENSATION_FAILED
+    recovery_attempts = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='saga_txn_status_updated_idx'),
+        ]
+    
     def __str__(self):
         return f"SAGA {self.correlation_id} - {self.status}"
 
@@ -230,10 +365,11 @@ class SagaLogEntry(models.Model):
     log_level = models.CharField(max_length=15, choices=LOG_LEVEL_CHOICES, default='info')
     message = models.TextField()
     is_compensation = models.BooleanField(default=False)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Time the entry was logged, which can precede the batched INSERT
+    timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
-        ordering = ['timestamp']
+        ordering = ['timestamp', 'id']
         indexes = [
             models.Index(fields=['correlation_id', 'timestamp']),
         ]
@@ -257,3 +393,66 @@ class SagaLogEntry(models.Model):
             'timestamp_full': self.timestamp.astimezone(pytz.timezone('Asia/Calcutta')).strftime('%Y-%m-%d %H:%M:%S IST'),
             'is_compensation': self.is_compensation
         }
+
+
+class FlightDataVersion(models.Model):
+    """Single-row counter bumped on every Flight, Place or schedule change"""
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls) -> int:
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        if not cls.objects.filter(pk=1).update(version=F('version') + 1):
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+class SagaQueueItem(models.Model):
+    """Booking SAGA waiting for, or being run by, a saga worker; rows outlive restarts"""
+    QUEUE_STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+        ('INTERRUPTED', 'Interrupted')
+    ]
+
+    correlation_id = models.CharField(max_length=50, unique=True)
+    booking_data = models.JSONField()
+    status = models.CharField(max_length=15, choices=QUEUE_STATUS_CHOICES, default='QUEUED')
+    error_message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    owner = models.CharField(max_length=100, blank=True, default='')  # host:pid of the worker running it
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='saga_queue_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Queued SAGA {self.correlation_id} - {self.status}"
+
+
+class SagaIdempotencyRecord(models.Model):
+    """First successful response of a SAGA step call, replayed to retries of the same step"""
+    correlation_id = models.CharField(max_length=50)
+    step = models.CharField(max_length=30)
+    status_code = models.IntegerField(null=True, blank=True)  # None while the first call is running
+    response_body = models.TextField(blank=True, default='')
+    claimed_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['correlation_id', 'step'], name='saga_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='saga_idempotency_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"SAGA {self.correlation_id} {self.step} - {self.status_code or 'in progress'}"
@@ -0,0 +1,192 @@
+"""
+Seat Reservation Sweeper
+Expires RESERVED seat holds past expires_at in batches and releases their seats
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Any, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Seat, SeatReservation
+from .seat_inventory import seat_inventory
+from .seat_map import seat_maps
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps of the in-process scheduler; 0 leaves sweeping to the management command
+RESERVATION_SWEEP_INTERVAL = getattr(settings, 'RESERVATION_SWEEP_INTERVAL', 60)
+
+# Reservations expired per transaction
+SWEEP_BATCH = getattr(settings, 'RESERVATION_SWEEP_BATCH', 500)
+
+# Recent batch sizes kept for the stats endpoint
+BATCH_HISTORY = 20
+
+
+class _RowsChanged(Exception):
+    """Rolls back a batch update that did not match every row it was meant for"""
+
+
+class ReservationSweeper:
+    """
+    Expires abandoned seat reservations.
+
+    A sweep reads RESERVED rows with expires_at in the past through the
+    (status, expires_at) index, oldest first, and expires them one batch per
+    transaction so a large backlog never holds a long write lock. The status
+    update is conditional on the row still being RESERVED, so a booking
+    confirmed in between keeps its seats, and only the seats, inventory
+    counts and seat map assignments of rows this sweep itself expired are
+    released. Sweep lag is how far past its expiry the oldest row was when
+    the sweep reached it.
+    """
+
+    def __init__(self, interval: float = RESERVATION_SWEEP_INTERVAL, batch_size: int = SWEEP_BATCH):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sweeps = 0
+        self.expired = 0
+        self.seats_released = 0
+        self.errors = 0
+        self.last_sweep_at = None
+        self.last_lag_seconds = None
+        self.max_lag_seconds = 0.0
+        self.last_sweep_seconds = None
+        self.batch_sizes = deque(maxlen=BATCH_HISTORY)
+
+    def start(self):
+        """Start the sweep thread unless the interval disables it or it is running"""
+        with self._lock:
+            if self._thread is not None or not self.interval:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='reservation-sweeper', daemon=True)
+            self._thread.start()
+            logger.info(f"[RESERVATION SWEEPER] Started (every {self.interval}s, batches of {self.batch_size})")
+
+    def stop(self, timeout: Optional[float] = None):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.error(f"[RESERVATION SWEEPER] Sweep failed: {e}")
+            finally:
+                close_old_connections()
+            self._stop.wait(self.interval)
+
+    def sweep(self) -> Dict[str, Any]:
+        """Expire every reservation past its expiry at the time the sweep starts"""
+        started = time.monotonic()
+        now = timezone.now()
+        lag = None
+        batches = []
+        seats_released = 0
+        while True:
+            rows = list(
+                SeatReservation.objects.filter(status='RESERVED', expires_at__lte=now)
+                .order_by('expires_at').values_list('id', 'expires_at')[:self.batch_size]
+            )
+            if not rows:
+                break
+            if lag is None:
+                lag = (timezone.now() - rows[0][1]).total_seconds()
+            ids = [row[0] for row in rows]
+            with transaction.atomic():
+                expired = self._expire(ids)
+                seats_released += Seat.objects.filter(
+                    reservations__id__in=expired, is_available=False
+                ).update(is_available=True)
+                held = (
+                    SeatReservation.objects.filter(id__in=expired, inventory__isnull=False)
+                    .values_list('inventory_id').annotate(seats=Sum('seat_count')).order_by()
+                )
+                for inventory_id, seats in held:
+                    seat_inventory.release(inventory_id, seats)
+                assigned = defaultdict(list)
+                for seat_map_id, seat_numbers in SeatReservation.objects.filter(
+                    id__in=expired, seat_map__isnull=False
+                ).values_list('seat_map_id', 'seat_numbers'):
+                    assigned[seat_map_id].extend(seat_numbers)
+                for seat_map_id, seat_numbers in assigned.items():
+                    seat_maps.release(seat_map_id, seat_numbers)
+            batches.append(len(expired))
+            if len(rows) < self.batch_size:
+                break
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.sweeps += 1
+            self.expired += sum(batches)
+            self.seats_released += seats_released
+            self.last_sweep_at = now
+            self.last_lag_seconds = round(lag, 3) if lag is not None else 0.0
+            self.max_lag_seconds = max(self.max_lag_seconds, self.last_lag_seconds)
+            self.last_sweep_seconds = round(elapsed, 3)
+            self.batch_sizes.extend(batches)
+        if batches:
+            logger.info(
+                f"[RESERVATION SWEEPER] Expired {sum(batches)} reservations in {len(batches)} batches, "
+                f"released {seats_released} seats (lag {lag:.1f}s)"
+            )
+        return {'expired': sum(batches), 'batches': batches, 'seats_released': seats_released,
+                'lag_seconds': self.last_lag_seconds, 'seconds': self.last_sweep_seconds}
+
+    @staticmethod
+    def _expire(ids: List[int]) -> List[int]:
+        """Expire the rows still RESERVED; returns the ids this call expired"""
+        try:
+            with transaction.atomic():
+                if SeatReservation.objects.filter(id__in=ids, status='RESERVED').update(status='EXPIRED') == len(ids):
+                    return ids
+                raise _RowsChanged()
+        except _RowsChanged:
+            # Some rows were confirmed, cancelled or swept by another process since
+            # they were read; go row by row so only our own expiries are released
+            return [
+                reservation_id for reservation_id in ids
+                if SeatReservation.objects.filter(id=reservation_id, status='RESERVED').update(status='EXPIRED')
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        now = timezone.now()
+        overdue = SeatReservation.objects.filter(status='RESERVED', expires_at__lte=now)
+        oldest = overdue.order_by('expires_at').values_list('expires_at', flat=True).first()
+        with self._lock:
+            return {
+                'running': self._thread is not None,
+                'interval_seconds': self.interval,
+                'batch_size': self.batch_size,
+                'overdue': overdue.count(),
+                'current_lag_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+                'sweeps': self.sweeps,
+                'expired': self.expired,
+                'seats_released': self.seats_released,
+                'errors': self.errors,
+                'last_sweep_at': self.last_sweep_at.isoformat() if self.last_sweep_at else None,
+                'last_sweep_seconds': self.last_sweep_seconds,
+                'last_lag_seconds': self.last_lag_seconds,
+                'max_lag_seconds': self.max_lag_seconds,
+                'recent_batch_sizes': list(self.batch_sizes)
+            }
+
+
+# Global instance
+reservation_sweeper = ReservationSweeper()
@@ -0,0 +1,169 @@
+"""
+Route Index for Flight Search
+Process-local index of pre-sorted, pre-serialized flights keyed by route, weekday and seat class
+"""
+import heapq
+import logging
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Place, Flight, Week
+from .flight_payloads import copy_payload, flight_payloads, serialize_place
+
+logger = logging.getLogger(__name__)
+
+SEAT_CLASSES = ('economy', 'business', 'first')
+
+# Carriers searched when a request does not name any
+DEFAULT_AIRLINE_CODES = ('AA',)
+
+RouteKey = Tuple[str, str, int, str]
+
+
+class RouteIndex:
+    """
+    In-memory route/schedule index.
+
+    Maps (origin code, destination code, weekday, seat class) to the flights
+    operating that day, already sorted by the seat class fare and serialized.
+    Flights are partitioned by airline code: each carrier's partition is
+    loaded on first use with an indexed airline_code filter, and
+    multi-carrier lookups merge the per-carrier lists. Everything is dropped
+    whenever Flight, Place or Week rows change, so a burst of writes costs a
+    single rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None  # (places, weekdays)
+        self._carriers: Dict[str, Dict[RouteKey, List[Dict[str, Any]]]] = {}
+        self.version = 0
+
+    def invalidate(self):
+        """Drop the index; it is rebuilt on the next lookup"""
+        self._snapshot = None
+        self._carriers = {}
+        self.version += 1
+        logger.debug(f"[ROUTE INDEX] Invalidated (version {self.version})")
+
+    def _build(self):
+        places = {}
+        for place in Place.objects.order_by('id'):
+            places.setdefault(place.code, serialize_place(place))
+
+        weekdays = set(Week.objects.values_list('number', flat=True))
+        return places, weekdays
+
+    def _build_carrier(self, airline_code: str) -> Dict[RouteKey, List[Dict[str, Any]]]:
+        routes: Dict[RouteKey, List[Dict[str, Any]]] = {}
+
+        flights = list(
+            Flight.objects.filter(airline_code=airline_code)
+            .exclude(operating_days=0)
+            .select_related('origin', 'destination')
+        )
+        payloads = flight_payloads.get_many(flights)
+
+        for flight in flights:
+            payload = payloads[flight.id]
+            for day in flight.operating_weekdays():
+                for seat_class in SEAT_CLASSES:
+                    if not payload[f'{seat_class}_fare']:
+                        continue
+                    key = (flight.origin.code, flight.destination.code, day, seat_class)
+                    routes.setdefault(key, []).append(payload)
+
+        for (_, _, _, seat_class), rows in routes.items():
+            fare_field = f'{seat_class}_fare'
+            rows.sort(key=lambda row: (row[fare_field], row['id']))
+
+        logger.info(f"[ROUTE INDEX] Built {len(routes)} route keys from {len(flights)} {airline_code} flights")
+        return routes
+
+    def snapshot(self):
+        """Current (places, weekdays), building them if needed"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            version = self.version
+            snapshot = self._build()
+            # A write during the build makes this snapshot stale: serve it
+            # to the current caller but let the next lookup rebuild
+            if version == self.version:
+                self._snapshot = snapshot
+            return snapshot
+
+    def carrier_routes(self, airline_code: str) -> Dict[RouteKey, List[Dict[str, Any]]]:
+        """Route keys to fare-sorted flights for one carrier, loading the partition if needed"""
+        routes = self._carriers.get(airline_code)
+        if routes is not None:
+            return routes
+        with self._lock:
+            carriers = self._carriers
+            if airline_code in carriers:
+                return carriers[airline_code]
+            version = self.version
+            routes = self._build_carrier(airline_code)
+            if version == self.version:
+                carriers[airline_code] = routes
+            return routes
+
+    def get_place(self, code: str) -> Optional[Dict[str, Any]]:
+        return self.snapshot()[0].get(code)
+
+    def has_weekday(self, weekday: int) -> bool:
+        return weekday in self.snapshot()[1]
+
+    def lookup(self, origin_code: str, destination_code: str, weekday: int, seat_class: str,
+               airline_codes: Iterable[str] = DEFAULT_AIRLINE_CODES) -> List[Dict[str, Any]]:
+        """Flights for a route on a weekday by the given carriers, cheapest first for the seat class; the caller owns the copies"""
+        key = (origin_code, destination_code, weekday, seat_class)
+        lists = [rows for rows in (self.carrier_routes(code).get(key) for code in airline_codes) if rows]
+        if len(lists) <= 1:
+            return [copy_payload(row) for row in lists[0]] if lists else []
+        fare_field = f'{seat_class}_fare'
+        return [copy_payload(row) for row in heapq.merge(*lists, key=lambda row: (row[fare_field], row['id']))]
+
+    def cheapest_by_weekday(self, origin_code: str, destination_code: str,
+                            airline_codes: Iterable[str] = DEFAULT_AIRLINE_CODES) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        """Cheapest flight per weekday and seat class for a route across the given carriers"""
+        partitions = [self.carrier_routes(code) for code in airline_codes]
+        cheapest = {}
+        for weekday in range(7):
+            for seat_class in SEAT_CLASSES:
+                key = (origin_code, destination_code, weekday, seat_class)
+                heads = [routes[key][0] for routes in partitions if key in routes]
+                if heads:
+                    fare_field = f'{seat_class}_fare'
+                    cheapest.setdefault(weekday, {})[seat_class] = min(heads, key=lambda row: (row[fare_field], row['id']))
+        return cheapest
+
+
+# Global instance
+route_index = RouteIndex()
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+@receiver(post_save, sender=Week)
+@receiver(post_delete, sender=Week)
+def invalidate_route_index(sender, **kwargs):
+    route_index.invalidate()
+    # Drop again once the write is visible, in case another thread rebuilt
+    # from the pre-commit state in between
+    transaction.on_commit(route_index.invalidate)
+
+
+@receiver(m2m_changed, sender=Flight.depart_day.through)
+def invalidate_route_index_on_schedule_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_route_index(sender)
@@ -0,0 +1,470 @@
+"""
+SAGA Benchmark Harness
+Drives booking SAGAs against in-process stub payment and loyalty services and reports throughput and latency
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from aiohttp import web
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from . import saga_views_complete
+from .models import Flight, SagaQueueItem, SeatInventory, SeatMap, SeatReservation
+from .saga_queue import saga_worker_pool
+from .saga_transport import InProcessTransport
+from .seat_inventory import next_departure_date, seat_inventory
+
+logger = logging.getLogger(__name__)
+
+# Answers of the real payment and loyalty services, trimmed to what the orchestrator reads
+PAYMENT_RESPONSES = {
+    'authorize-payment': {'message': 'Payment authorized', 'authorization_id': 'AUTH-BENCH', 'amount': 200.0},
+    'cancel-payment': {'message': 'Payment authorization cancelled', 'authorization_id': 'AUTH-BENCH', 'amount': 200.0},
+}
+LOYALTY_RESPONSES = {
+    'award-miles': {'message': 'Miles awarded', 'miles_awarded': 150, 'original_balance': 0, 'new_balance': 150},
+    'reverse-miles': {'message': 'Miles reversed', 'miles_reversed': 150, 'original_balance': 150, 'new_balance': 0},
+}
+
+# Original service port -> which benchmark server takes its calls
+SERVICE_PORTS = {8001: 'backend', 8002: 'payment', 8003: 'loyalty'}
+
+# How often async-mode drivers look for their queued SAGAs to finish
+COMPLETION_POLL_INTERVAL = 0.01
+
+# Longest wait for one SAGA before it is counted as an error
+SAGA_TIMEOUT = 120
+
+FINISHED_QUEUE_STATUSES = ('COMPLETED', 'FAILED', 'INTERRUPTED')
+
+# Distinct failure messages listed in a report
+MAX_FAILURE_REASONS = 5
+
+
+class StubService:
+    """
+    aiohttp stand-in for the payment or loyalty service on its own event loop thread.
+
+    Every call is answered after `latency` seconds. Forward actions fail with
+    probability `failure_rate`, the way a declined card or a loyalty outage
+    would; compensations always succeed.
+    """
+
+    def __init__(self, name: str, responses: Dict[str, Dict[str, Any]], failing_actions: tuple,
+                 latency: float = 0.0, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.name = name
+        self.responses = responses
+        self.failing_actions = failing_actions
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self.port = None
+
+    def start(self) -> 'StubService':
+        self._loop = asyncio.new_event_loop()
+        app = web.Application()
+        app.router.add_post('/api/saga/{action}/', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._thread = threading.Thread(target=self._loop.run_forever, name=f'{self.name}-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def origin(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def _handle(self, request):
+        action = request.match_info['action']
+        await request.read()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls += 1
+        if action in self.failing_actions and self._random.random() < self.failure_rate:
+            self.failures += 1
+            return web.json_response({'success': False, 'error': f'Stub {self.name} {action} failure'})
+        return web.json_response({'success': True, **self.responses.get(action, {'message': f'{action} done'})})
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+
+def payment_stub(latency: float = 0.0, failure_rate: float = 0.0, seed: Optional[int] = None) -> StubService:
+    return StubService('payment', PAYMENT_RESPONSES, ('authorize-payment',), latency, failure_rate, seed)
+
+
+def loyalty_stub(latency: float = 0.0, failure_rate: float = 0.0, seed: Optional[int] = None) -> StubService:
+    return StubService('loyalty', LOYALTY_RESPONSES, ('award-miles',), latency, failure_rate, seed)
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class BackendServer:
+    """This service's own Django app on a free local port, for the seat and booking steps"""
+
+    def __init__(self):
+        self._server = None
+        self._thread = None
+
+    def start(self) -> 'BackendServer':
+        self._server = ThreadedWSGIServer(('127.0.0.1', 0), _QuietRequestHandler, allow_reuse_address=False)
+        self._server.set_app(WSGIHandler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name='backend-bench', daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def origin(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+
+class QueryCounter:
+    """
+    Counts SQL statements run by every thread while installed.
+
+    Attaches itself to each database connection as it is opened, so work
+    done on request, worker and loop threads is all included; a thread can
+    leave its own queries out with `paused()`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wrappers = []
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not getattr(self._local, 'paused', False):
+            with self._lock:
+                self.count += 1
+        return execute(sql, params, many, context)
+
+    def _attach(self, sender=None, connection=None, **kwargs):
+        with self._lock:
+            if self not in connection.execute_wrappers:
+                connection.execute_wrappers.append(self)
+                self._wrappers.append(connection)
+
+    def install(self):
+        connection_created.connect(self._attach, weak=False)
+        for connection in connections.all():
+            self._attach(connection=connection)
+
+    def uninstall(self):
+        connection_created.disconnect(self._attach)
+        with self._lock:
+            for connection in self._wrappers:
+                if self in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(self)
+            self._wrappers = []
+
+    @contextlib.contextmanager
+    def paused(self):
+        self._local.paused = True
+        try:
+            yield
+        finally:
+            self._local.paused = False
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class SagaBenchmark:
+    """
+    End-to-end booking SAGAs on one box.
+
+    Starts the payment and loyalty stubs plus this service's own app on local
+    ports, points a fresh orchestrator's steps at them and installs it as the
+    one the booking views use. `run` then posts bookings to the synchronous or
+    the queued endpoint from `concurrency` client threads. With the
+    'inprocess' transport the backend's own steps skip the loopback HTTP hop.
+    The flight must exist in the database the views read.
+    """
+
+    def __init__(self, flight_id: int, orchestrator: str = 'threaded',
+                 payment_latency: float = 0.02, loyalty_latency: float = 0.02,
+                 payment_failure_rate: float = 0.0, loyalty_failure_rate: float = 0.0,
+                 seed: Optional[int] = None, transport: str = 'http'):
+        self.flight_id = flight_id
+        self.orchestrator_kind = orchestrator
+        self.transport_kind = transport
+        self.payment = payment_stub(payment_latency, payment_failure_rate, seed)
+        self.loyalty = loyalty_stub(loyalty_latency, loyalty_failure_rate, None if seed is None else seed + 1)
+        self.backend = BackendServer()
+        self.queries = QueryCounter()
+        self.orchestrator = None
+        self._previous_orchestrator = None
+        self._pool_was_running = False
+
+    def __enter__(self) -> 'SagaBenchmark':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self.payment.start()
+        self.loyalty.start()
+        self.backend.start()
+        transport = InProcessTransport([self.backend.origin]) if self.transport_kind == 'inprocess' else None
+        if self.orchestrator_kind == 'asyncio':
+            from .saga_orchestrator_async import AsyncBookingOrchestrator
+            self.orchestrator = AsyncBookingOrchestrator(transport=transport)
+        else:
+            from .saga_orchestrator_fixed import BookingOrchestrator
+            self.orchestrator = BookingOrchestrator(transport=transport)
+        origins = {'backend': self.backend.origin, 'payment': self.payment.origin, 'loyalty': self.loyalty.origin}
+        for step in self.orchestrator.steps:
+            step.action_url = self._rebase(step.action_url, origins)
+            step.compensation_url = self._rebase(step.compensation_url, origins)
+        self._previous_orchestrator = saga_views_complete.saga_orchestrator
+        saga_views_complete.saga_orchestrator = self.orchestrator
+        self._pool_was_running = saga_worker_pool.stats()['workers_started'] > 0
+        self.queries.install()
+
+    def stop(self):
+        self.queries.uninstall()
+        if not self._pool_was_running:
+            saga_worker_pool.stop(SAGA_TIMEOUT)
+        saga_views_complete.saga_orchestrator = self._previous_orchestrator
+        if hasattr(self.orchestrator, 'close'):
+            self.orchestrator.close()
+        self.backend.stop()
+        self.loyalty.stop()
+        self.payment.stop()
+
+    @staticmethod
+    def _rebase(url: str, origins: Dict[str, str]) -> str:
+        parts = urlsplit(url)
+        return f"{origins[SERVICE_PORTS[parts.port]]}{parts.path}"
+
+    def _booking(self, number: int) -> Dict[str, Any]:
+        return {
+            'flight_id': self.flight_id,
+            'passengers': [{'first_name': 'Bench', 'last_name': f'Passenger{number}', 'gender': 'female'}],
+            'contact_info': {'email': f'bench{number}@example.com', 'mobile': '2145550100'}
+        }
+
+    def _book_sync(self, number: int) -> tuple:
+        response = requests.post(f"{self.backend.origin}/api/saga/start-booking/",
+                                 json=self._booking(number), timeout=SAGA_TIMEOUT)
+        result = response.json()
+        return ('completed', None) if result.get('success') else ('failed', result.get('error'))
+
+    def _book_async(self, number: int) -> tuple:
+        response = requests.post(f"{self.backend.origin}/api/saga/start-booking-async/",
+                                 json=self._booking(number), timeout=SAGA_TIMEOUT)
+        if response.status_code != 202:
+            return 'rejected' if response.status_code == 503 else 'error', f"HTTP {response.status_code}"
+        correlation_id = response.json()['correlation_id']
+        deadline = time.monotonic() + SAGA_TIMEOUT
+        try:
+            with self.queries.paused():
+                while time.monotonic() < deadline:
+                    item = SagaQueueItem.objects.filter(correlation_id=correlation_id).values_list('status', 'error_message').first()
+                    if item and item[0] in FINISHED_QUEUE_STATUSES:
+                        return ('completed', None) if item[0] == 'COMPLETED' else ('failed', item[1])
+                    time.sleep(COMPLETION_POLL_INTERVAL)
+        finally:
+            close_old_connections()
+        return 'error', 'Timed out waiting for the SAGA'
+
+    def _timed(self, book, number: int) -> tuple:
+        started = time.monotonic()
+        try:
+            outcome, reason = book(number)
+        except Exception as e:
+            logger.error(f"[SAGA BENCH] Booking {number} raised: {e}")
+            outcome, reason = 'error', str(e)
+        return outcome, reason, time.monotonic() - started
+
+    def run(self, mode: str = 'sync', sagas: int = 100, concurrency: int = 10) -> Dict[str, Any]:
+        """Book `sagas` times through the 'sync' or 'async' endpoint and report the results"""
+        book = self._book_sync if mode == 'sync' else self._book_async
+        queries_before = self.queries.count
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='saga-bench') as clients:
+            results = list(clients.map(lambda number: self._timed(book, number), range(sagas)))
+        elapsed = time.monotonic() - started
+
+        outcomes = {'completed': 0, 'failed': 0, 'rejected': 0, 'error': 0}
+        reasons = Counter()
+        for outcome, reason, _ in results:
+            outcomes[outcome] += 1
+            if reason:
+                reasons[reason] += 1
+        finished = outcomes['completed'] + outcomes['failed']
+        latencies = sorted(latency for outcome, _, latency in results if outcome in ('completed', 'failed'))
+
+        def ms(q):
+            value = _percentile(latencies, q)
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            'mode': mode,
+            'orchestrator': self.orchestrator_kind,
+            'transport': self.transport_kind,
+            'sagas': sagas,
+            'concurrency': concurrency,
+            'seconds': round(elapsed, 3),
+            'throughput_per_second': round(finished / elapsed, 2) if elapsed else 0.0,
+            'latency_ms': {'p50': ms(0.5), 'p95': ms(0.95), 'p99': ms(0.99), 'max': ms(1.0)},
+            **outcomes,
+            'queries_per_saga': round((self.queries.count - queries_before) / finished, 1) if finished else None,
+            'failure_reasons': dict(reasons.most_common(MAX_FAILURE_REASONS))
+        }
+
+
+class SeatContentionBenchmark:
+    """
+    Concurrent ReserveSeat steps against one hot flight.
+
+    Resets the flight's inventory counter for its next departure to
+    `capacity` seats, then calls the real reserve-seat handler in-process
+    from `concurrency` threads, one fresh SAGA per call, so every call
+    competes for the same counter row. The report checks the counter against
+    the reservations that hold seats: nothing may be oversold, no seat
+    may go missing and no seat number may be assigned twice.
+    """
+
+    RESERVE_URL = 'http://localhost:8001/api/saga/reserve-seat/'
+
+    def __init__(self, flight_id: int, capacity: int = 144, seat_class: str = 'economy'):
+        self.flight_id = flight_id
+        self.capacity = capacity
+        self.seat_class = seat_class
+        self.transport = InProcessTransport(['http://localhost:8001'])
+
+    def _reset(self) -> int:
+        flight = Flight.objects.get(id=self.flight_id)
+        departure_date = next_departure_date(flight, timezone.now())
+        SeatInventory.objects.filter(flight=flight, departure_date=departure_date, seat_class=self.seat_class).delete()
+        SeatMap.objects.filter(flight=flight, departure_date=departure_date, seat_class=self.seat_class).delete()
+        seat_inventory.clear_cache()
+        inventory = SeatInventory.objects.create(
+            flight=flight, departure_date=departure_date, seat_class=self.seat_class,
+            capacity=self.capacity, remaining=self.capacity
+        )
+        return inventory.id
+
+    def _reserve(self, handler) -> tuple:
+        payload = {
+            'correlation_id': str(uuid.uuid4()),
+            'booking_data': {
+                'flight_id': self.flight_id,
+                'seat_class': self.seat_class,
+                'passengers': [{'first_name': 'Bench', 'last_name': 'Passenger', 'gender': 'female'}]
+            }
+        }
+        started = time.monotonic()
+        try:
+            status, text = self.transport.call(handler, self.RESERVE_URL, payload)
+            result = json.loads(text) if status == 200 else {'error': f"HTTP {status}"}
+        except Exception as e:
+            result = {'error': str(e)}
+        latency = time.monotonic() - started
+        if result.get('success'):
+            return 'held', None, latency
+        error = result.get('error', '')
+        return ('sold_out' if 'Not enough' in error else 'error'), error, latency
+
+    def run(self, sagas: int = 500, concurrency: int = 16) -> Dict[str, Any]:
+        """Make `sagas` reservations from `concurrency` threads and report throughput and consistency"""
+        inventory_id = self._reset()
+        handler = self.transport.handler(self.RESERVE_URL)
+        pending = iter(range(sagas))
+        pending_lock = threading.Lock()
+        results = []
+
+        def client():
+            try:
+                while True:
+                    with pending_lock:
+                        if next(pending, None) is None:
+                            return
+                    results.append(self._reserve(handler))
+            finally:
+                connections.close_all()
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=client, name=f'seat-bench-{i}') for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        outcomes = Counter(outcome for outcome, _, _ in results)
+        reasons = Counter(reason for outcome, reason, _ in results if outcome == 'error')
+        latencies = sorted(latency for _, _, latency in results)
+        remaining = SeatInventory.objects.values_list('remaining', flat=True).get(id=inventory_id)
+        held = SeatReservation.objects.filter(inventory_id=inventory_id, status='RESERVED').count()
+        assigned = [
+            seat for seat_numbers in SeatReservation.objects.filter(inventory_id=inventory_id, status='RESERVED')
+            .values_list('seat_numbers', flat=True) for seat in seat_numbers
+        ]
+
+        def ms(q):
+            value = _percentile(latencies, q)
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            'sagas': sagas,
+            'concurrency': concurrency,
+            'capacity': self.capacity,
+            'seconds': round(elapsed, 3),
+            'throughput_per_second': round(len(results) / elapsed, 1) if elapsed else 0.0,
+            'latency_ms': {'p50': ms(0.5), 'p95': ms(0.95), 'p99': ms(0.99), 'max': ms(1.0)},
+            'held': outcomes['held'],
+            'sold_out': outcomes['sold_out'],
+            'error': outcomes['error'],
+            'remaining': remaining,
+            'seats_assigned': len(assigned),
+            'consistent': (remaining >= 0 and held == outcomes['held'] and held + remaining == self.capacity
+                           and len(set(assigned)) == len(assigned)),
+            'failure_reasons': dict(reasons.most_common(MAX_FAILURE_REASONS))
+        }
@@ -0,0 +1,194 @@
+"""
+SAGA Service Circuit Breakers
+Per-service breakers with rolling latency percentiles and adaptive request timeouts
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Calls per service kept for failure rate and latency percentiles
+WINDOW_SIZE = 100
+
+# Calls in the window before the failure rate can open the breaker
+MIN_CALLS = 10
+
+# Failure rate over the window that opens the breaker
+FAILURE_RATE_THRESHOLD = 0.5
+
+# Back-to-back failures that open the breaker regardless of the window
+CONSECUTIVE_FAILURES = 5
+
+# Seconds an open breaker fails fast before letting one probe call through
+OPEN_SECONDS = 15.0
+
+# Successful calls needed before the timeout adapts; until then MAX_TIMEOUT applies
+MIN_LATENCY_SAMPLES = 20
+
+# Adaptive timeout is p99 latency times this, clamped to [MIN_TIMEOUT, MAX_TIMEOUT]
+TIMEOUT_MULTIPLIER = 3.0
+MIN_TIMEOUT = 1.0
+MAX_TIMEOUT = 30.0
+
+CLOSED = 'CLOSED'
+OPEN = 'OPEN'
+HALF_OPEN = 'HALF_OPEN'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose breaker is open"""
+
+    def __init__(self, service: str, retry_in: float):
+        super().__init__(f"Circuit open for {service}, retry in {retry_in:.0f}s")
+        self.service = service
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Breaker and latency tracker for one SAGA service.
+
+    Connection errors, timeouts and 5xx responses count as failures; any
+    other response, including a business-level failure, means the service
+    is up. When the breaker opens, calls fail immediately for OPEN_SECONDS,
+    then a single probe decides whether it closes again.
+    """
+
+    def __init__(self, service: str, clock=time.monotonic):
+        self.service = service
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = deque(maxlen=WINDOW_SIZE)  # True for a failed call
+        self._latencies = deque(maxlen=WINDOW_SIZE)  # seconds, successful calls only
+        self.state = CLOSED
+        self._opened_at = None
+        self._probe_started = None
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.failures = 0
+        self.rejections = 0
+        self.last_error = None
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = self._clock()
+            if self.state == OPEN:
+                waited = now - self._opened_at
+                if waited < OPEN_SECONDS:
+                    self.rejections += 1
+                    raise CircuitOpenError(self.service, OPEN_SECONDS - waited)
+                self.state = HALF_OPEN
+                self._probe_started = None
+            # Half-open: one probe at a time; a probe that never reports back
+            # is replaced after another cool-down
+            if self._probe_started is not None and now - self._probe_started < OPEN_SECONDS:
+                self.rejections += 1
+                raise CircuitOpenError(self.service, OPEN_SECONDS - (now - self._probe_started))
+            self._probe_started = now
+
+    def timeout(self) -> float:
+        """Request timeout from observed p99 latency"""
+        with self._lock:
+            if len(self._latencies) < MIN_LATENCY_SAMPLES:
+                return MAX_TIMEOUT
+            p99 = self._percentile(0.99)
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, p99 * TIMEOUT_MULTIPLIER))
+
+    def record_response(self, latency: float, status_code: int):
+        if status_code >= 500:
+            self.record_failure(latency, f"HTTP {status_code}")
+            return
+        with self._lock:
+            self.calls += 1
+            self._failures.append(False)
+            self._latencies.append(latency)
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                logger.info(f"[SAGA BREAKER] {self.service} recovered, closing breaker")
+                self.state = CLOSED
+                self._opened_at = self._probe_started = None
+
+    def record_failure(self, latency: float, error):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self._failures.append(True)
+            self.consecutive_failures += 1
+            self.last_error = str(error) or error.__class__.__name__
+            if self.state == HALF_OPEN or self._should_open():
+                if self.state != OPEN:
+                    logger.warning(f"[SAGA BREAKER] Opening breaker for {self.service}: {self.last_error}")
+                self.state = OPEN
+                self._opened_at = self._clock()
+                self._probe_started = None
+
+    def _should_open(self) -> bool:
+        if self.consecutive_failures >= CONSECUTIVE_FAILURES:
+            return True
+        if len(self._failures) < MIN_CALLS:
+            return False
+        return sum(self._failures) / len(self._failures) >= FAILURE_RATE_THRESHOLD
+
+    def _percentile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        timeout = self.timeout()
+        with self._lock:
+            window = len(self._failures)
+
+            def ms(q):
+                value = self._percentile(q)
+                return round(value * 1000, 1) if value is not None else None
+
+            return {
+                'service': self.service,
+                'state': self.state,
+                'timeout_seconds': round(timeout, 3),
+                'latency_ms': {'p50': ms(0.5), 'p95': ms(0.95), 'p99': ms(0.99)},
+                'window_calls': window,
+                'window_failure_rate': round(sum(self._failures) / window, 3) if window else 0.0,
+                'consecutive_failures': self.consecutive_failures,
+                'calls': self.calls,
+                'failures': self.failures,
+                'rejections': self.rejections,
+                'last_error': self.last_error,
+                'open_for_seconds': round(self._clock() - self._opened_at, 1) if self.state == OPEN else None
+            }
+
+
+class CircuitBreakers:
+    """Breakers keyed by service origin (host:port), created on first use"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def for_url(self, url: str) -> CircuitBreaker:
+        service = urlsplit(url).netloc
+        breaker = self._breakers.get(service)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(service, CircuitBreaker(service))
+        return breaker
+
+    def reset(self):
+        with self._lock:
+            self._breakers = {}
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [breaker.snapshot() for breaker in list(self._breakers.values())]
+
+
+# Global instance
+saga_breakers = CircuitBreakers()
@@ -3,12 +3,28 @@ SAGA Log Storage System
 Centralized logging for SAGA execution steps and compensation
 """
 import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, Any, List
+from django.db import close_old_connections
 from django.utils import timezone
 import pytz
 
 logger = logging.getLogger(__name__)
 
+# Buffered entries across all SAGAs that trigger an immediate flush
+FLUSH_MAX_ENTRIES = 100
+
+# Longest an entry waits in the buffer before the background flusher writes it
+FLUSH_INTERVAL = 0.5
+
+# In-flight SAGAs whose logs are also kept in memory
+MEMORY_MAX_SAGAS = 500
+
+# Seconds without a read or write after which a SAGA's memory copy is dropped
+MEMORY_MAX_AGE = 600
+
 class SagaLogEntry:
     def __init__(self, correlation_id: str, step_name: str, service: str,
                  log_level: str, message: str, is_compensation: bool = False, timestamp=None):
@@ -34,67 +50,267 @@ class SagaLogEntry:
         }
 
 class SagaLogStorage:
-    """Centralized storage for SAGA execution logs"""
+    """
+    Centralized storage for SAGA execution logs.
+
+    add_log only buffers the entry; buffered entries are written with one
+    bulk_create when FLUSH_MAX_ENTRIES are waiting, by a background flusher
+    every FLUSH_INTERVAL seconds, or when the orchestrator flushes its SAGA
+    at the end. Entries carry the time they were logged, and get_logs
+    flushes the SAGA it reads first, so readers always get a complete log in
+    logging order.
+    
+    SAGAs between begin() and complete() are also kept in an LRU bounded by
+    MEMORY_MAX_SAGAS and MEMORY_MAX_AGE, and get_logs serves them without a
+    query. Only entries logged by this process reach that copy; finished or
+    evicted SAGAs are read from the SagaLogEntry table.
+    
+    A batch that fails to write goes back into the buffer and is retried by
+    the background flusher. Until its entries are written, a SAGA keeps its
+    memory copy through complete() and eviction, so a failed write never
+    leaves the log readable nowhere.
+    """
     
     def __init__(self):
-        self.logs = {}  # correlation_id -> list of log entries
+        self.logs = OrderedDict()  # in-flight correlation_id -> log entries, least recently used first
+        self._touched = {}  # correlation_id -> monotonic time of last read or write
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pending = {}  # correlation_id -> entries not yet in the database
+        self._pending_count = 0
+        self._failed = set()  # SAGAs with entries requeued after a failed write
+        self._unflushed = set()  # completed SAGAs whose memory copy waits for their entries to be written
+        self._lock = threading.Lock()
+        # Bumped and notified on every add_log, complete and status change,
+        # for streaming readers
+        self._changed = threading.Condition(self._lock)
+        self.changes = 0
+        # Serializes flushes so batches reach the database in the order they were taken
+        self._flush_lock = threading.RLock()
+        self._flusher = None
     
     def add_log(self, correlation_id: str, step_name: str, service: str,
-                log_level: str, message: str, is_compensation: bool = False):
-        """Add a log entry for a SAGA transaction - now persisted to database"""
-        try:
-            # Import here to avoid circular imports
-            from .models import SagaLogEntry as SagaLogModel
-            
-            # Create database record
-            log_entry = SagaLogModel.objects.create(
-                correlation_id=correlation_id,
-                step_name=step_name,
-                service=service,
-                log_level=log_level,
-                message=message,
-                is_compensation=is_compensation
-            )
-            
-            # Enhanced logging with compensation indicator
-            comp_indicator = " [COMPENSATION]" if is_compensation else ""
-            logger.info(f"[SAGA LOG DB] {service} - {step_name}{comp_indicator}: {message}")
-            logger.info(f"[SAGA LOG DB] ✅ Persisted log entry ID {log_entry.id} to database")
-            
-            # BACKWARD COMPATIBILITY: Also store in memory for immediate access
-            if correlation_id not in self.logs:
-                self.logs[correlation_id] = []
-            
-            # Create in-memory entry for backward compatibility
-            memory_entry = SagaLogEntry(correlation_id, step_name, service, log_level, message, is_compensation)
-            self.logs[correlation_id].append(memory_entry)
-            
-        except Exception as e:
-            logger.error(f"[SAGA LOG DB] ❌ Failed to persist log to database: {e}")
-            # Fallback to memory-only storage
-            if correlation_id not in self.logs:
-                self.logs[correlation_id] = []
+                log_level: str, message: str, is_compensation: bool = False, timestamp=None):
+        """Add a log entry for a SAGA transaction; it is persisted on the next flush"""
+        entry = SagaLogEntry(correlation_id, step_name, service, log_level, message, is_compensation, timestamp)
+        with self._lock:
+            self._pending.setdefault(correlation_id, []).append(entry)
+            self._pending_count += 1
+            if correlation_id in self.logs:
+                self._insert_in_order(self.logs[correlation_id], entry)
+                self._touch(correlation_id)
+            full = self._pending_count >= FLUSH_MAX_ENTRIES
+            self._notify()
+        
+        comp_indicator = " [COMPENSATION]" if is_compensation else ""
+        logger.info(f"[SAGA LOG] {service} - {step_name}{comp_indicator}: {message}")
+        
+        if full:
+            self.flush()
+        else:
+            self._ensure_flusher()
+    
+    def flush(self, correlation_id: str = None) -> bool:
+        """Write buffered entries for one SAGA, or for all of them, in a single bulk_create; False if the write failed"""
+        with self._flush_lock:
+            with self._lock:
+                if correlation_id is None:
+                    entries = [entry for batch in self._pending.values() for entry in batch]
+                    self._pending = {}
+                else:
+                    entries = self._pending.pop(correlation_id, [])
+                self._pending_count -= len(entries)
+            if not entries:
+                return True
             
-            log_entry = SagaLogEntry(correlation_id, step_name, service, log_level, message, is_compensation)
-            self.logs[correlation_id].append(log_entry)
+            try:
+                # Import here to avoid circular imports
+                from .models import SagaLogEntry as SagaLogModel
+                
+                SagaLogModel.objects.bulk_create([
+                    SagaLogModel(
+                        correlation_id=entry.correlation_id,
+                        step_name=entry.step_name,
+                        service=entry.service,
+                        log_level=entry.log_level,
+                        message=entry.message,
+                        is_compensation=entry.is_compensation,
+                        timestamp=entry.timestamp
+                    ) for entry in entries
+                ])
+                logger.debug(f"[SAGA LOG DB] Persisted {len(entries)} log entries")
+            except Exception as e:
+                logger.error(f"[SAGA LOG DB] ❌ Failed to persist {len(entries)} log entries, will retry: {e}")
+                self._requeue(entries)
+                return False
             
-            comp_indicator = " [COMPENSATION]" if is_compensation else ""
-            logger.info(f"[SAGA LOG FALLBACK] {service} - {step_name}{comp_indicator}: {message}")
+            with self._lock:
+                for written in {entry.correlation_id for entry in entries}:
+                    if written in self._pending:
+                        continue
+                    self._failed.discard(written)
+                    # A completed SAGA whose last entries just landed can leave memory
+                    if written in self._unflushed:
+                        self._unflushed.discard(written)
+                        self._drop(written)
+            return True
+    
+    def _requeue(self, entries: list):
+        """Put entries back in front of anything logged since they were taken"""
+        restored = {}
+        for entry in entries:
+            restored.setdefault(entry.correlation_id, []).append(entry)
+        with self._lock:
+            for correlation_id, batch in restored.items():
+                self._pending[correlation_id] = batch + self._pending.get(correlation_id, [])
+                self._failed.add(correlation_id)
+            self._pending_count += len(entries)
+        self._ensure_flusher()
+    
+    def begin(self, correlation_id: str):
+        """Keep this SAGA's log in memory until complete(), seeded with what is already logged"""
+        from .models import SagaLogEntry as SagaLogModel
+        
+        # Holding the flush lock keeps entries from moving to the table
+        # between the read and the hand-over to memory
+        with self._flush_lock:
+            self.flush(correlation_id)
+            entries = [
+                SagaLogEntry(row.correlation_id, row.step_name, row.service, row.log_level,
+                             row.message, row.is_compensation, row.timestamp)
+                for row in SagaLogModel.objects.filter(correlation_id=correlation_id).order_by('timestamp', 'id')
+            ]
+            with self._lock:
+                # Anything logged while the rows were read is appended after them
+                for entry in self._pending.get(correlation_id, []):
+                    self._insert_in_order(entries, entry)
+                self.logs[correlation_id] = entries
+                self._touch(correlation_id)
+                self._evict()
+    
+    def complete(self, correlation_id: str):
+        """Persist a finished SAGA's log and drop its memory copy once it is written"""
+        flushed = self.flush(correlation_id)
+        with self._lock:
+            if flushed:
+                self._drop(correlation_id)
+            elif correlation_id in self.logs:
+                self._unflushed.add(correlation_id)
+            self._notify()
+    
+    def notify_change(self):
+        """Wake streaming readers after a SAGA status change recorded elsewhere"""
+        with self._lock:
+            self._notify()
+    
+    def _notify(self):
+        # Caller holds _lock
+        self.changes += 1
+        self._changed.notify_all()
+    
+    def wait_for_change(self, seen: int, timeout: float) -> int:
+        """Block until `changes` moves past `seen` or timeout; returns the current count"""
+        with self._changed:
+            if self.changes == seen:
+                self._changed.wait(timeout)
+            return self.changes
+    
+    @staticmethod
+    def _insert_in_order(entries: list, entry: SagaLogEntry):
+        # Entries stamped before they were added (e.g. the async accept log)
+        # go where the database ordering would put them
+        position = len(entries)
+        while position and entries[position - 1].timestamp > entry.timestamp:
+            position -= 1
+        entries.insert(position, entry)
+    
+    def _touch(self, correlation_id: str):
+        self.logs.move_to_end(correlation_id)
+        self._touched[correlation_id] = time.monotonic()
+    
+    def _drop(self, correlation_id: str):
+        self.logs.pop(correlation_id, None)
+        self._touched.pop(correlation_id, None)
+    
+    def _evict(self):
+        """Drop least recently used SAGAs over the size bound, then idle ones; caller holds _lock"""
+        # SAGAs whose entries failed to write keep their copy whatever its age
+        evictable = [correlation_id for correlation_id in self.logs if correlation_id not in self._failed]
+        excess = len(self.logs) - MEMORY_MAX_SAGAS
+        expired = time.monotonic() - MEMORY_MAX_AGE
+        for correlation_id in evictable:
+            if excess <= 0 and self._touched[correlation_id] > expired:
+                break
+            self._drop(correlation_id)
+            self._unflushed.discard(correlation_id)
+            self.evictions += 1
+            excess -= 1
+    
+    def _cached(self, correlation_id: str, include_compensation: bool):
+        with self._lock:
+            self._evict()
+            entries = self.logs.get(correlation_id)
+            if entries is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(correlation_id)
+            return [entry for entry in entries if include_compensation or not entry.is_compensation]
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """In-memory tier size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'in_flight_sagas': len(self.logs),
+                'max_sagas': MEMORY_MAX_SAGAS,
+                'max_age_seconds': MEMORY_MAX_AGE,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'pending_writes': self._pending_count
+            }
+    
+    def _ensure_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, name='saga-log-flusher', daemon=True)
+                self._flusher.start()
+    
+    def _flush_periodically(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            if not self._pending_count:
+                continue
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
     
     def get_logs(self, correlation_id: str, include_compensation: bool = True) -> List[Dict[str, Any]]:
         """Get all logs for a SAGA transaction - now from database with fallback"""
         logger.info(f"[SAGA LOG DB] ===== GET_LOGS REQUEST =====")
         logger.info(f"[SAGA LOG DB] Requested correlation_id: {correlation_id}")
         
+        cached = self._cached(correlation_id, include_compensation)
+        if cached is not None:
+            logger.info(f"[SAGA LOG DB] ✅ Served {len(cached)} in-flight logs from memory")
+            return [log.to_dict() for log in cached]
+        
         try:
-            # Try database first
+            # Try database first, after writing anything still buffered for this SAGA
+            self.flush(correlation_id)
             from .models import SagaLogEntry as SagaLogModel
             
             query = SagaLogModel.objects.filter(correlation_id=correlation_id)
             if not include_compensation:
                 query = query.filter(is_compensation=False)
             
-            db_logs = query.order_by('timestamp')
+            db_logs = query.order_by('timestamp', 'id')
             logs = [log.to_dict() for log in db_logs]
             
             if logs:
@@ -106,23 +322,27 @@ class SagaLogStorage:
         except Exception as e:
             logger.error(f"[SAGA LOG DB] Database query failed: {e}")
         
-        # Fallback to memory storage
-        logger.info(f"[SAGA LOG DB] Falling back to memory storage")
-        if correlation_id not in self.logs:
-            logger.warning(f"[SAGA LOG DB] ❌ Not found in memory either: {correlation_id}")
-            return []
+        return []
+    
+    def logs_since(self, correlation_id: str, offset: int) -> List[Dict[str, Any]]:
+        """Entries after the first `offset` in logging order; only those are serialized"""
+        with self._lock:
+            entries = self.logs.get(correlation_id)
+            if entries is not None:
+                self.hits += 1
+                self._touch(correlation_id)
+                return [entry.to_dict() for entry in entries[offset:]]
+            self.misses += 1
+        
+        from .models import SagaLogEntry as SagaLogModel
         
-        logs = [
-            log.to_dict() for log in self.logs[correlation_id]
-            if include_compensation or not log.is_compensation
-        ]
-        logger.info(f"[SAGA LOG DB] ✅ Found {len(logs)} logs in memory")
-        return logs
+        self.flush(correlation_id)
+        query = SagaLogModel.objects.filter(correlation_id=correlation_id).order_by('timestamp', 'id')
+        return [row.to_dict() for row in query[offset:]]
     
     def clear_logs(self, correlation_id: str):
         """Clear logs for a completed SAGA transaction"""
-        if correlation_id in self.logs:
-            del self.logs[correlation_id]
+        self.complete(correlation_id)
 
 # Global instance
 saga_log_storage = SagaLogStorage()
@@ -0,0 +1,185 @@
+"""
+SAGA Metrics
+Per-step and per-compensation latency histograms, outcome counters and in-flight gauges in Prometheus text format
+"""
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import SagaTransaction
+from .saga_queue import saga_worker_pool
+from .saga_state import IN_FLIGHT_STATUSES
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = tuple(getattr(settings, 'SAGA_METRICS_BUCKETS', (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)))
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Label of the histogram bucket every observation falls into
+INF_BUCKET = 'le="+Inf"'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], int] = {}
+
+    def inc(self, *labels: str):
+        self._values[labels] = self._values.get(labels, 0) + 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # Labels -> (observations per bucket, not cumulative; sum; count)
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, seconds: float, *labels: str):
+        value = self._values.get(labels)
+        if value is None:
+            value = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                value[0][i] += 1
+                break
+        value[1] += seconds
+        value[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, observed in zip(self.buckets, counts):
+                cumulative += observed
+                bucket = 'le="%s"' % _number(bound)
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, bucket)} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, INF_BUCKET)} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {_number(round(total, 6))}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {count}')
+        return lines
+
+
+def _gauge(name: str, help_text: str, samples: List[Tuple[str, float]]) -> List[str]:
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+    lines.extend(f'{name}{labels} {_number(value)}' for labels, value in samples)
+    return lines
+
+
+class SagaMetrics:
+    """
+    Numbers behind the SAGA log lines.
+
+    Both orchestrators report every step call, every compensation call and
+    the start and end of every SAGA here. Latencies go into fixed-bucket
+    histograms per step, so a scrape shows which step dominates booking
+    latency; outcomes go into counters. The SAGAs this process is running
+    are counted in memory, while in-flight transactions across processes and
+    the queue depth are read from the database when scraped. Everything is
+    kept per process, as Prometheus expects of a scrape target.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running: Dict[str, float] = {}
+        self.step_latency = Histogram(
+            'saga_step_duration_seconds', 'Time from calling a SAGA step to its answer.', ('step',))
+        self.steps = Counter(
+            'saga_steps_total', 'SAGA step calls by outcome.', ('step', 'outcome'))
+        self.compensation_latency = Histogram(
+            'saga_compensation_duration_seconds', 'Time from calling a SAGA compensation to its answer.', ('step',))
+        self.compensations = Counter(
+            'saga_compensations_total', 'SAGA compensation calls by outcome.', ('step', 'outcome'))
+        self.saga_latency = Histogram(
+            'saga_duration_seconds', 'Time from starting or resuming a SAGA to its final state.', ('outcome',))
+        self.sagas = Counter(
+            'saga_total', 'SAGAs finished by this process by outcome.', ('outcome',))
+
+    def saga_started(self, correlation_id: str):
+        with self._lock:
+            self._running[correlation_id] = time.monotonic()
+
+    def saga_finished(self, correlation_id: str, outcome: str):
+        with self._lock:
+            started = self._running.pop(correlation_id, None)
+            self.sagas.inc(outcome)
+            if started is not None:
+                self.saga_latency.observe(time.monotonic() - started, outcome)
+
+    def step_finished(self, step: str, seconds: float, succeeded: bool):
+        with self._lock:
+            self.step_latency.observe(seconds, step)
+            self.steps.inc(step, 'success' if succeeded else 'failure')
+
+    def compensation_finished(self, step: str, seconds: float, succeeded: bool):
+        with self._lock:
+            self.compensation_latency.observe(seconds, step)
+            self.compensations.inc(step, 'success' if succeeded else 'failure')
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        transactions = dict(
+            SagaTransaction.objects.filter(status__in=IN_FLIGHT_STATUSES)
+            .values_list('status').annotate(count=Count('id')).order_by()
+        )
+        queue = saga_worker_pool.stats()
+        with self._lock:
+            lines = [
+                *_gauge('saga_in_flight', 'SAGAs this process has started and not finished.',
+                        [('', len(self._running))]),
+                *_gauge('saga_transactions_in_flight', 'Unfinished SAGA transactions in the database by status.',
+                        [(_labels(('status',), (status,)), transactions.get(status, 0)) for status in IN_FLIGHT_STATUSES]),
+                *_gauge('saga_queue_depth', 'SAGA queue items by status.',
+                        [(_labels(('status',), ('queued',)), queue['queued']),
+                         (_labels(('status',), ('running',)), queue['running'])]),
+                *_gauge('saga_queue_max_depth', 'Queued SAGAs at which new bookings are refused.',
+                        [('', queue['max_depth'])]),
+                *_gauge('saga_queue_oldest_queued_seconds', 'Age of the oldest queued SAGA.',
+                        [('', queue['oldest_queued_seconds'])]),
+                *_gauge('saga_workers_busy', 'Queue workers of this process running a SAGA.',
+                        [('', queue['busy_workers'])]),
+                *self.sagas.render(),
+                *self.saga_latency.render(),
+                *self.steps.render(),
+                *self.step_latency.render(),
+                *self.compensations.render(),
+                *self.compensation_latency.render(),
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+# Global instance
+saga_metrics = SagaMetrics()
@@ -0,0 +1,292 @@
+"""
+Asyncio SAGA Orchestrator
+Runs booking SAGAs on one event loop with a keep-alive connection pool per service
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Any, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+from django.conf import settings
+from django.db import close_old_connections
+
+from .saga_breakers import saga_breakers
+from .saga_orchestrator_fixed import BookingOrchestrator, SagaStep
+from .saga_log_storage import saga_log_storage
+from .saga_metrics import saga_metrics
+
+logger = logging.getLogger(__name__)
+
+# Open connections kept per service origin, shared by every in-flight SAGA
+CONNECTIONS_PER_SERVICE = getattr(settings, 'SAGA_HTTP_CONNECTIONS_PER_SERVICE', 20)
+
+# Threads for log writes and booking records; the ORM is synchronous
+DB_WORKERS = getattr(settings, 'SAGA_DB_WORKERS', 1)
+
+# Session-wide ceiling; each request gets its service breaker's adaptive timeout
+REQUEST_TIMEOUT = 30
+
+
+class AsyncBookingOrchestrator(BookingOrchestrator):
+    """
+    BookingOrchestrator whose service calls run as coroutines.
+
+    A single background event loop drives every SAGA, so a waiting step costs
+    a suspended coroutine instead of a blocked thread, and calls to the same
+    service reuse pooled keep-alive connections instead of opening a new TCP
+    connection per step. Each step starts as soon as the steps it depends on
+    have succeeded, and compensation undoes independent steps together, so
+    the same steps, log entries and result dict as BookingOrchestrator take
+    about as long as the slowest dependency chain. Database work is handed
+    to a small thread pool and awaited.
+    """
+
+    def __init__(self, connections_per_service: int = CONNECTIONS_PER_SERVICE, db_workers: int = DB_WORKERS,
+                 transport=None):
+        super().__init__(transport=transport)
+        self.connections_per_service = connections_per_service
+        self._db_executor = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix='saga-db')
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='saga-event-loop', daemon=True
+                )
+                self._thread.start()
+                logger.info(f"[SAGA ASYNCIO] Event loop started ({self.connections_per_service} connections per service)")
+            return self._loop
+
+    def submit_booking_saga(self, booking_data: Dict[str, Any]) -> Future:
+        """Schedule a SAGA on the event loop and return a Future for its result dict"""
+        return asyncio.run_coroutine_threadsafe(self.run_booking_saga(booking_data), self._ensure_loop())
+
+    def start_booking_saga(self, booking_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a SAGA and wait for it; drop-in for BookingOrchestrator.start_booking_saga"""
+        return self.submit_booking_saga(booking_data).result()
+
+    def close(self):
+        """Close pooled connections and stop the event loop"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+            thread, self._thread = self._thread, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._close_sessions(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        self._db_executor.shutdown(wait=True)
+
+    async def _close_sessions(self):
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            await session.close()
+
+    def _session(self, url: str) -> aiohttp.ClientSession:
+        """Pooled session for the URL's service; must be called on the event loop"""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        session = self._sessions.get(origin)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connections_per_service)
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+            )
+            self._sessions[origin] = session
+        return session
+
+    async def _db(self, func, *args, **kwargs):
+        """Run an ORM-touching call on the database pool"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._db_executor, partial(self._run_db_call, func, *args, **kwargs)
+        )
+
+    @staticmethod
+    def _run_db_call(func, *args, **kwargs):
+        # Pool threads outlive requests, so apply the request-cycle connection
+        # housekeeping around each call
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    async def _post(self, url: str, payload: Dict[str, Any], compensation: bool = False) -> Tuple[int, str]:
+        handler = self._local_handler(url)
+        if handler is not None:
+            # In-process step views use the ORM, so they run on the database pool
+            return await self._db(self.local_transport.call, handler, url, payload)
+        breaker = saga_breakers.for_url(url)
+        if not compensation:
+            breaker.before_call()
+        timeout = aiohttp.ClientTimeout(total=breaker.timeout())
+        started = time.monotonic()
+        try:
+            async with self._session(url).post(url, json=payload, timeout=timeout) as response:
+                status, text = response.status, await response.text()
+        except Exception as e:
+            breaker.record_failure(time.monotonic() - started, e)
+            raise
+        breaker.record_response(time.monotonic() - started, status)
+        return status, text
+
+    async def run_booking_saga(self, booking_data: Dict[str, Any]) -> Dict[str, Any]:
+        # Callers that already logged or queued the SAGA pass their id along
+        correlation_id = booking_data.get('correlation_id') or str(uuid.uuid4())
+        await self._db(saga_log_storage.begin, correlation_id)
+        try:
+            return await self._run_saga_async(correlation_id, booking_data)
+        finally:
+            # Buffered log entries are written once per SAGA, which then
+            # leaves the in-memory log cache
+            await self._db(saga_log_storage.complete, correlation_id)
+
+    def resume_booking_saga(self, transaction, forward: bool = True) -> Dict[str, Any]:
+        return asyncio.run_coroutine_threadsafe(
+            self._resume_booking_saga_async(transaction, forward), self._ensure_loop()
+        ).result()
+
+    async def _resume_booking_saga_async(self, transaction, forward: bool) -> Dict[str, Any]:
+        correlation_id = transaction.correlation_id
+        booking_data, completed_steps, to_compensate = self._resume_plan(transaction)
+        await self._db(saga_log_storage.begin, correlation_id)
+        try:
+            if forward:
+                return await self._run_saga_async(correlation_id, booking_data, completed_steps)
+            compensation_result = await self._execute_compensation_async(to_compensate, correlation_id, booking_data)
+            return await self._db(self._abandoned_result, transaction, booking_data, compensation_result)
+        finally:
+            await self._db(saga_log_storage.complete, correlation_id)
+
+    async def _run_saga_async(self, correlation_id: str, booking_data: Dict[str, Any],
+                              completed_steps: list = None) -> Dict[str, Any]:
+        logger.info(f"[SAGA] Starting booking SAGA with correlation_id: {correlation_id}")
+        if completed_steps is None:
+            await self._db(self._record_saga_start, correlation_id, booking_data)
+            completed_steps = []
+        else:
+            await self._db(self._record_saga_resume, correlation_id, completed_steps)
+
+        # Steps start as soon as everything they depend on has succeeded, so a
+        # booking takes about as long as its slowest dependency chain
+        done = {step.name for step in completed_steps}
+        pending = [step for step in self.steps if step.name not in done]
+        running = {}
+        failure = None
+        try:
+            while running or (pending and failure is None):
+                if failure is None:
+                    for step in [step for step in pending if set(step.depends_on) <= done]:
+                        pending.remove(step)
+                        task = asyncio.ensure_future(self._run_step_async(correlation_id, step, booking_data))
+                        running[task] = step
+
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    step = running.pop(task)
+                    result = task.result()
+                    if result.get("success"):
+                        completed_steps.append(step)
+                        done.add(step.name)
+                    elif failure is None:
+                        # Stop starting steps; the ones in flight finish and are compensated
+                        failure = (step, result)
+
+            if failure is not None:
+                step, result = failure
+                compensation_result = await self._execute_compensation_async(completed_steps, correlation_id, booking_data)
+                return await self._db(
+                    self._step_failed_result, correlation_id, booking_data, step, result, compensation_result
+                )
+
+            return await self._db(self._completed_result, correlation_id)
+
+        except Exception as e:
+            logger.error(f"[SAGA] Unexpected error in SAGA execution: {e}")
+            # Steps still in flight may succeed and then need undoing as well
+            outcomes = await asyncio.gather(*running, return_exceptions=True)
+            completed_steps.extend(
+                step for step, result in zip(running.values(), outcomes)
+                if isinstance(result, dict) and result.get("success")
+            )
+            compensation_result = await self._execute_compensation_async(completed_steps, correlation_id, booking_data)
+            return await self._db(self._unexpected_error_result, correlation_id, booking_data, e, compensation_result)
+
+    async def _run_step_async(self, correlation_id: str, step: SagaStep, booking_data: Dict[str, Any]) -> Dict[str, Any]:
+        step_number = self.steps.index(step) + 1
+        logger.info(f"[SAGA] Executing step {step_number}/{len(self.steps)}: {step.name}")
+        await self._db(self._record_step_start, correlation_id, step)
+
+        step_data = self._step_data(correlation_id, step_number, step, booking_data)
+        started = time.monotonic()
+        result = await self._execute_step_async(step, step_data)
+        saga_metrics.step_finished(step.name, time.monotonic() - started, bool(result.get("success")))
+
+        if result.get("success"):
+            await self._db(self._record_step_success, correlation_id, step, result)
+        else:
+            await self._db(self._record_step_failure, correlation_id, step, result)
+        return result
+
+    async def _execute_step_async(self, step: SagaStep, step_data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            logger.info(f"[SAGA] Calling {step.action_url}")
+            status, text = await self._post(step.action_url, step_data)
+
+            if status == 200:
+                result = json.loads(text)
+                logger.info(f"[SAGA] Step {step.name} response: {result}")
+                return result
+            else:
+                logger.error(f"[SAGA] Step {step.name} HTTP error: {status}")
+                return {
+                    "success": False,
+                    "error": f"HTTP {status}: {text}"
+                }
+        except Exception as e:
+            logger.error(f"[SAGA] Step {step.name} error: {e!r}")
+            return {"success": False, "error": str(e) or e.__class__.__name__}
+
+    async def _execute_compensation_async(self, completed_steps: list, correlation_id: str,
+                                          booking_data: Dict[str, Any]) -> Dict[str, Any]:
+        logger.info(f"[SAGA COMPENSATION] 🔄 Starting compensation for {len(completed_steps)} completed steps")
+        await self._db(self._record_compensation_start, correlation_id, completed_steps)
+
+        # Independent steps are undone together, dependents before what they depend on
+        compensation_results = []
+        for wave in self._compensation_waves(completed_steps):
+            compensation_results.extend(await asyncio.gather(
+                *(self._compensate_step_async(correlation_id, step, booking_data) for step in wave)
+            ))
+
+        return self._compensation_summary(compensation_results)
+
+    async def _compensate_step_async(self, correlation_id: str, step: SagaStep,
+                                     booking_data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            logger.info(f"[SAGA COMPENSATION] ⚡ Executing compensation for step: {step.name}")
+            compensation_data = self._compensation_data(correlation_id, booking_data, step)
+            started, status = time.monotonic(), None
+            try:
+                status, text = await self._post(step.compensation_url, compensation_data, compensation=True)
+            finally:
+                saga_metrics.compensation_finished(step.name, time.monotonic() - started, status == 200)
+
+            if status == 200:
+                return await self._db(self._record_compensation_success, correlation_id, step, json.loads(text))
+            return await self._db(self._record_compensation_failure, correlation_id, step, status)
+        except Exception as e:
+            return await self._db(self._compensation_error, correlation_id, step, e)
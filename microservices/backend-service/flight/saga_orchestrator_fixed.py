@@ -1,23 +1,36 @@
 """
 SAGA Orchestrator for Flight Booking - Fixed Implementation
 """
+import json
 import logging
+import time
 import uuid
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+from .saga_breakers import saga_breakers
 from .saga_log_storage import saga_log_storage
+from .saga_state import saga_state, SUCCEEDED, STARTED, COMPENSATION_FAILED
+from .saga_metrics import saga_metrics
+from .saga_transport import InProcessTransport, SAGA_STEP_TRANSPORT
 from .failed_booking_handler import create_failed_booking_record
 
 logger = logging.getLogger(__name__)
 
 class SagaStep:
-    def __init__(self, name: str, action_url: str, compensation_url: str):
+    def __init__(self, name: str, action_url: str, compensation_url: str, depends_on: tuple = ()):
         self.name = name
         self.action_url = action_url
         self.compensation_url = compensation_url
+        # Steps that must succeed before this one runs
+        self.depends_on = tuple(depends_on)
 
 class BookingOrchestrator:
-    def __init__(self):
+    def __init__(self, transport: InProcessTransport = None):
+        # Steps served by this process are called directly when a transport is set
+        if transport is None and SAGA_STEP_TRANSPORT == 'inprocess':
+            transport = InProcessTransport()
+        self.local_transport = transport
+        # Declared in dependency order; the seat and the payment are independent
         self.steps = [
             SagaStep("ReserveSeat", 
                     "http://localhost:8001/api/saga/reserve-seat/", 
@@ -27,14 +40,82 @@ class BookingOrchestrator:
                     "http://localhost:8002/api/saga/cancel-payment/"),
             SagaStep("AwardMiles",
                     "http://localhost:8003/api/saga/award-miles/",
-                    "http://localhost:8003/api/saga/reverse-miles/"),
+                    "http://localhost:8003/api/saga/reverse-miles/",
+                    depends_on=("AuthorizePayment",)),
             SagaStep("ConfirmBooking", 
                     "http://localhost:8001/api/saga/confirm-booking/", 
-                    "http://localhost:8001/api/saga/cancel-booking/")
+                    "http://localhost:8001/api/saga/cancel-booking/",
+                    depends_on=("ReserveSeat", "AuthorizePayment", "AwardMiles"))
         ]
+        self._check_dependencies()
+    
+    def _check_dependencies(self):
+        """Every dependency must be declared earlier, which also rules out cycles"""
+        declared = set()
+        for step in self.steps:
+            missing = set(step.depends_on) - declared
+            if missing:
+                raise ValueError(f"SAGA step {step.name} depends on undeclared or later steps: {sorted(missing)}")
+            declared.add(step.name)
+    
+    def _compensation_waves(self, steps: list) -> list:
+        """
+        Group steps to undo into reverse-topological waves.
+        
+        A step is compensated only after every step depending on it has been,
+        so the steps in one wave can be undone at the same time.
+        """
+        names = {step.name for step in steps}
+        remaining = [step for step in reversed(self.steps) if step.name in names]
+        waves = []
+        while remaining:
+            wave = [step for step in remaining if not any(step.name in other.depends_on for other in remaining)]
+            waves.append(wave)
+            remaining = [step for step in remaining if step not in wave]
+        return waves
     
     def start_booking_saga(self, booking_data: Dict[str, Any]) -> Dict[str, Any]:
-        correlation_id = str(uuid.uuid4())
+        # Callers that already logged or queued the SAGA pass their id along
+        correlation_id = booking_data.get('correlation_id') or str(uuid.uuid4())
+        saga_log_storage.begin(correlation_id)
+        try:
+            return self._run_saga(correlation_id, booking_data)
+        finally:
+            # Buffered log entries are written once per SAGA, which then
+            # leaves the in-memory log cache
+            saga_log_storage.complete(correlation_id)
+    
+    def resume_booking_saga(self, transaction, forward: bool = True) -> Dict[str, Any]:
+        """
+        Finish a SAGA left in flight by a stopped process, from its recorded step outcomes.
+        
+        Going forward re-runs the step that was in progress and continues from
+        there; otherwise every step that succeeded, or may have, is compensated.
+        """
+        correlation_id = transaction.correlation_id
+        booking_data, completed_steps, to_compensate = self._resume_plan(transaction)
+        saga_log_storage.begin(correlation_id)
+        try:
+            if forward:
+                return self._run_saga(correlation_id, booking_data, completed_steps)
+            compensation_result = self._execute_compensation(to_compensate, correlation_id, booking_data)
+            return self._abandoned_result(transaction, booking_data, compensation_result)
+        finally:
+            saga_log_storage.complete(correlation_id)
+    
+    def _resume_plan(self, transaction) -> tuple:
+        """Booking data, the steps that succeeded, and the steps a rollback has to undo"""
+        outcomes = transaction.step_outcomes or {}
+        booking_data = {**transaction.booking_data, 'correlation_id': transaction.correlation_id}
+        completed_steps = [step for step in self.steps if outcomes.get(step.name) == SUCCEEDED]
+        # A STARTED step may have been applied before the crash
+        to_compensate = [
+            step for step in self.steps
+            if outcomes.get(step.name) in (SUCCEEDED, STARTED, COMPENSATION_FAILED)
+        ]
+        return booking_data, completed_steps, to_compensate
+    
+    def _run_saga(self, correlation_id: str, booking_data: Dict[str, Any], completed_steps: list = None) -> Dict[str, Any]:
         logger.info(f"[SAGA] Starting booking SAGA with correlation_id: {correlation_id}")
         
         # DIAGNOSTIC: Add comprehensive logging for debugging missing logs
@@ -43,15 +124,11 @@ class BookingOrchestrator:
         logger.info(f"[SAGA ORCHESTRATOR DEBUG] Flight ID: {booking_data.get('flight_id')}")
         logger.info(f"[SAGA ORCHESTRATOR DEBUG] User ID: {booking_data.get('user_id')}")
         
-        # Add initial log entry
-        saga_log_storage.add_log(
-            correlation_id, "SAGA_START", "UI Service", "info",
-            f"📝 Demo SAGA transaction created for correlation_id: {correlation_id}"
-        )
-        
-        # DIAGNOSTIC: Verify initial log was added
-        initial_logs = saga_log_storage.get_logs(correlation_id)
-        logger.info(f"[SAGA ORCHESTRATOR DEBUG] Initial logs count after SAGA_START: {len(initial_logs)}")
+        if completed_steps is None:
+            self._record_saga_start(correlation_id, booking_data)
+            completed_steps = []
+        else:
+            self._record_saga_resume(correlation_id, completed_steps)
         
         logger.info(f"[PAYMENT_FLOW_DEBUG] ===== SAGA ORCHESTRATOR ENTRY =====")
         logger.info(f"[PAYMENT_FLOW_DEBUG] Received booking_data keys: {list(booking_data.keys())}")
@@ -59,196 +136,269 @@ class BookingOrchestrator:
         logger.info(f"[PAYMENT_FLOW_DEBUG] user_id in booking_data: {booking_data.get('user_id')}")
         logger.info(f"[PAYMENT_FLOW_DEBUG] passengers count: {len(booking_data.get('passengers', []))}")
         
-        completed_steps = []
         try:
+            # One step at a time, in declaration order
             for i, step in enumerate(self.steps):
+                if step in completed_steps:
+                    continue
                 logger.info(f"[SAGA] Executing step {i+1}/{len(self.steps)}: {step.name}")
                 
                 # DIAGNOSTIC: Add comprehensive step logging
                 logger.info(f"[SAGA ORCHESTRATOR DEBUG] ===== STEP {i+1}: {step.name} =====")
                 logger.info(f"[SAGA ORCHESTRATOR DEBUG] Step URL: {step.action_url}")
                 
-                # Log step initiation with proper service name
-                saga_log_storage.add_log(
-                    correlation_id, step.name, f"{step.name} Service", "info",
-                    f"💺 {step.name} step initiated for correlation_id: {correlation_id}"
-                )
-                
-                # DIAGNOSTIC: Check logs count after step initiation
-                current_logs = saga_log_storage.get_logs(correlation_id)
-                logger.info(f"[SAGA ORCHESTRATOR DEBUG] Logs count after {step.name} initiation: {len(current_logs)}")
+                self._record_step_start(correlation_id, step)
                 
                 logger.info(f"[PAYMENT_FLOW_DEBUG] ===== SAGA STEP {i+1}: {step.name} =====")
                 logger.info(f"[PAYMENT_FLOW_DEBUG] Step URL: {step.action_url}")
                 
-                step_data = {
-                    "correlation_id": correlation_id,
-                    "step_number": i + 1,
-                    "booking_data": booking_data,
-                    "simulate_failure": booking_data.get(f"simulate_{step.name.lower()}_fail", False)
-                }
+                step_data = self._step_data(correlation_id, i + 1, step, booking_data)
                 
                 logger.info(f"[PAYMENT_FLOW_DEBUG] Step data flight_id: '{step_data['booking_data'].get('flight_id')}'")
                 logger.info(f"[PAYMENT_FLOW_DEBUG] Simulate failure: {step_data['simulate_failure']}")
                 
+                started = time.monotonic()
                 result = self._execute_step(step, step_data)
+                saga_metrics.step_finished(step.name, time.monotonic() - started, bool(result.get("success")))
                 
                 # DIAGNOSTIC: Log step execution result
                 logger.info(f"[SAGA ORCHESTRATOR DEBUG] Step {step.name} result: {result}")
                 
                 if result.get("success"):
                     completed_steps.append(step)
-                    logger.info(f"[SAGA] Step {step.name} completed successfully")
-                    
-                    # Log step success with detailed information from the actual response
-                    step_message = result.get('message', f'Step {step.name} completed successfully')
-                    saga_log_storage.add_log(
-                        correlation_id, step.name, f"{step.name} Service", "success",
-                        f"✅ {step_message}"
-                    )
-                    
-                    # DIAGNOSTIC: Check logs count after step success
-                    current_logs = saga_log_storage.get_logs(correlation_id)
-                    logger.info(f"[SAGA ORCHESTRATOR DEBUG] Logs count after {step.name} success: {len(current_logs)}")
-                    
-                    # Add specific step details based on step type
-                    if step.name == "ReserveSeat" and result.get('reservation_id'):
-                        saga_log_storage.add_log(
-                            correlation_id, step.name, "Backend Service", "info",
-                            f"💺 Created reservation record: {result.get('reservation_id')}"
-                        )
-                    elif step.name == "AuthorizePayment" and result.get('authorization_id'):
-                        saga_log_storage.add_log(
-                            correlation_id, step.name, "Payment Service", "info",
-                            f"💳 Authorization ID: {result.get('authorization_id')} - Amount: ${result.get('amount', 0)}"
-                        )
-                    elif step.name == "AwardMiles" and result.get('miles_awarded'):
-                        saga_log_storage.add_log(
-                            correlation_id, step.name, "Loyalty Service", "info",
-                            f"🏆 Miles awarded: {result.get('miles_awarded')} - Balance: {result.get('original_balance')} -> {result.get('new_balance')}"
-                        )
+                    self._record_step_success(correlation_id, step, result)
                 else:
-                    logger.error(f"[SAGA] Step {step.name} failed: {result.get('error', 'Unknown error')}")
-                    
-                    # Log step failure with clear indication
-                    saga_log_storage.add_log(
-                        correlation_id, step.name, "ORCHESTRATOR", "error",
-                        f"❌ Step {step.name} failed: {result.get('error', 'Unknown error')}"
-                    )
-                    
-                    # DIAGNOSTIC: Check logs count after step failure
-                    current_logs = saga_log_storage.get_logs(correlation_id)
-                    logger.info(f"[SAGA ORCHESTRATOR DEBUG] Logs count after {step.name} failure: {len(current_logs)}")
+                    self._record_step_failure(correlation_id, step, result)
                     
                     compensation_result = self._execute_compensation(completed_steps, correlation_id, booking_data)
                     
-                    # DIAGNOSTIC: Check logs count after compensation
-                    final_logs = saga_log_storage.get_logs(correlation_id)
-                    logger.info(f"[SAGA ORCHESTRATOR DEBUG] Final logs count after compensation: {len(final_logs)}")
-                    
                     # Create failed booking record for user to see in their bookings
-                    error_message = f"SAGA failed at step {step.name}: {result.get('error', 'Unknown error')}"
-                    logger.error(f"[SAGA ORCHESTRATOR] 🚨 SAGA FAILURE DETECTED - About to create failed booking record")
-                    logger.error(f"[SAGA ORCHESTRATOR] 📊 User ID: {booking_data.get('user_id')}")
-                    logger.error(f"[SAGA ORCHESTRATOR] 🎫 Flight ID: {booking_data.get('flight_id')}")
-                    logger.error(f"[SAGA ORCHESTRATOR] ❌ Failed step: {step.name}")
-                    logger.error(f"[SAGA ORCHESTRATOR] 💬 Error message: {error_message}")
-                    
-                    failed_ticket = create_failed_booking_record(
-                        correlation_id=correlation_id,
-                        booking_data=booking_data,
-                        failed_step=step.name,
-                        error_message=error_message,
-                        compensation_result=compensation_result
-                    )
-                    
-                    logger.info(f"[SAGA ORCHESTRATOR] 📝 Failed booking handler returned: {failed_ticket}")
-                    if failed_ticket:
-                        logger.info(f"[SAGA ORCHESTRATOR] ✅ Failed booking record created with ref: {failed_ticket.get('ref_no')}")
-                    else:
-                        logger.error(f"[SAGA ORCHESTRATOR] ❌ Failed booking handler returned None - no record created!")
-                    
-                    return {
-                        "success": False,
-                        "correlation_id": correlation_id,
-                        "error": error_message,
-                        "failed_step": step.name,
-                        "compensation_result": compensation_result,
-                        "failed_booking_ref": failed_ticket.get('ref_no') if failed_ticket else None
-                    }
-            
-            logger.info(f"[SAGA] All steps completed successfully for correlation_id: {correlation_id}")
+                    return self._step_failed_result(correlation_id, booking_data, step, result, compensation_result)
             
-            return {
-                "success": True,
-                "correlation_id": correlation_id,
-                "message": "SAGA completed successfully",
-                "steps_completed": len(self.steps)
-            }
+            return self._completed_result(correlation_id)
             
         except Exception as e:
             logger.error(f"[SAGA] Unexpected error in SAGA execution: {e}")
             compensation_result = self._execute_compensation(completed_steps, correlation_id, booking_data)
-            
-            # Create failed booking record for unexpected errors too
-            error_message = f"SAGA execution error: {str(e)}"
-            failed_ticket = create_failed_booking_record(
-                correlation_id=correlation_id,
-                booking_data=booking_data,
-                failed_step="UNEXPECTED_ERROR",
-                error_message=error_message,
-                compensation_result=compensation_result
+            return self._unexpected_error_result(correlation_id, booking_data, e, compensation_result)
+    
+    def _record_saga_start(self, correlation_id: str, booking_data: Dict[str, Any]):
+        saga_state.begin(correlation_id, booking_data)
+        saga_metrics.saga_started(correlation_id)
+        # Add initial log entry
+        saga_log_storage.add_log(
+            correlation_id, "SAGA_START", "UI Service", "info",
+            f"📝 Demo SAGA transaction created for correlation_id: {correlation_id}"
+        )
+    
+    def _record_saga_resume(self, correlation_id: str, completed_steps: list):
+        logger.warning(f"[SAGA] Resuming {correlation_id} after {len(completed_steps)} completed steps")
+        saga_metrics.saga_started(correlation_id)
+        saga_log_storage.add_log(
+            correlation_id, "SAGA_RESUME", "ORCHESTRATOR", "warning",
+            f"🔁 SAGA resumed after an interruption with {len(completed_steps)}/{len(self.steps)} steps completed"
+        )
+    
+    def _record_step_start(self, correlation_id: str, step: SagaStep):
+        saga_state.step_started(correlation_id, self.steps.index(step), step.name)
+        # Log step initiation with proper service name
+        saga_log_storage.add_log(
+            correlation_id, step.name, f"{step.name} Service", "info",
+            f"💺 {step.name} step initiated for correlation_id: {correlation_id}"
+        )
+    
+    def _step_data(self, correlation_id: str, step_number: int, step: SagaStep, booking_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "correlation_id": correlation_id,
+            "step_number": step_number,
+            "booking_data": booking_data,
+            "simulate_failure": booking_data.get(f"simulate_{step.name.lower()}_fail", False)
+        }
+    
+    def _record_step_success(self, correlation_id: str, step: SagaStep, result: Dict[str, Any]):
+        logger.info(f"[SAGA] Step {step.name} completed successfully")
+        saga_state.step_succeeded(correlation_id, step.name)
+        
+        # Log step success with detailed information from the actual response
+        step_message = result.get('message', f'Step {step.name} completed successfully')
+        saga_log_storage.add_log(
+            correlation_id, step.name, f"{step.name} Service", "success",
+            f"✅ {step_message}"
+        )
+        
+        # Add specific step details based on step type
+        if step.name == "ReserveSeat" and result.get('reservation_id'):
+            saga_log_storage.add_log(
+                correlation_id, step.name, "Backend Service", "info",
+                f"💺 Created reservation record: {result.get('reservation_id')}"
+            )
+        elif step.name == "AuthorizePayment" and result.get('authorization_id'):
+            saga_log_storage.add_log(
+                correlation_id, step.name, "Payment Service", "info",
+                f"💳 Authorization ID: {result.get('authorization_id')} - Amount: ${result.get('amount', 0)}"
+            )
+        elif step.name == "AwardMiles" and result.get('miles_awarded'):
+            saga_log_storage.add_log(
+                correlation_id, step.name, "Loyalty Service", "info",
+                f"🏆 Miles awarded: {result.get('miles_awarded')} - Balance: {result.get('original_balance')} -> {result.get('new_balance')}"
             )
-            
-            logger.info(f"[SAGA] Created failed booking record for exception: {failed_ticket.get('ref_no') if failed_ticket else 'None'}")
-            
-            return {
-                "success": False,
-                "correlation_id": correlation_id,
-                "error": error_message,
-                "compensation_result": compensation_result,
-                "failed_booking_ref": failed_ticket.get('ref_no') if failed_ticket else None
-            }
+    
+    def _record_step_failure(self, correlation_id: str, step: SagaStep, result: Dict[str, Any]):
+        logger.error(f"[SAGA] Step {step.name} failed: {result.get('error', 'Unknown error')}")
+        saga_state.step_failed(correlation_id, step.name, result.get('error', 'Unknown error'))
+        
+        # Log step failure with clear indication
+        saga_log_storage.add_log(
+            correlation_id, step.name, "ORCHESTRATOR", "error",
+            f"❌ Step {step.name} failed: {result.get('error', 'Unknown error')}"
+        )
+    
+    def _step_failed_result(self, correlation_id: str, booking_data: Dict[str, Any], step: SagaStep,
+                            result: Dict[str, Any], compensation_result: Dict[str, Any]) -> Dict[str, Any]:
+        error_message = f"SAGA failed at step {step.name}: {result.get('error', 'Unknown error')}"
+        logger.error(f"[SAGA ORCHESTRATOR] 🚨 SAGA FAILURE DETECTED - About to create failed booking record")
+        logger.error(f"[SAGA ORCHESTRATOR] 📊 User ID: {booking_data.get('user_id')}")
+        logger.error(f"[SAGA ORCHESTRATOR] 🎫 Flight ID: {booking_data.get('flight_id')}")
+        logger.error(f"[SAGA ORCHESTRATOR] ❌ Failed step: {step.name}")
+        logger.error(f"[SAGA ORCHESTRATOR] 💬 Error message: {error_message}")
+        
+        failed_ticket = create_failed_booking_record(
+            correlation_id=correlation_id,
+            booking_data=booking_data,
+            failed_step=step.name,
+            error_message=error_message,
+            compensation_result=compensation_result
+        )
+        
+        saga_state.finish(correlation_id, self._failure_status(compensation_result),
+                          failed_step=step.name, error_message=error_message)
+        saga_metrics.saga_finished(correlation_id, 'failed')
+        logger.info(f"[SAGA ORCHESTRATOR] 📝 Failed booking handler returned: {failed_ticket}")
+        if failed_ticket:
+            logger.info(f"[SAGA ORCHESTRATOR] ✅ Failed booking record created with ref: {failed_ticket.get('ref_no')}")
+        else:
+            logger.error(f"[SAGA ORCHESTRATOR] ❌ Failed booking handler returned None - no record created!")
+        
+        return {
+            "success": False,
+            "correlation_id": correlation_id,
+            "error": error_message,
+            "failed_step": step.name,
+            "compensation_result": compensation_result,
+            "failed_booking_ref": failed_ticket.get('ref_no') if failed_ticket else None
+        }
+    
+    def _unexpected_error_result(self, correlation_id: str, booking_data: Dict[str, Any], error: Exception,
+                                 compensation_result: Dict[str, Any]) -> Dict[str, Any]:
+        # Create failed booking record for unexpected errors too
+        error_message = f"SAGA execution error: {str(error)}"
+        failed_ticket = create_failed_booking_record(
+            correlation_id=correlation_id,
+            booking_data=booking_data,
+            failed_step="UNEXPECTED_ERROR",
+            error_message=error_message,
+            compensation_result=compensation_result
+        )
+        
+        saga_state.finish(correlation_id, self._failure_status(compensation_result), error_message=error_message)
+        saga_metrics.saga_finished(correlation_id, 'failed')
+        logger.info(f"[SAGA] Created failed booking record for exception: {failed_ticket.get('ref_no') if failed_ticket else 'None'}")
+        
+        return {
+            "success": False,
+            "correlation_id": correlation_id,
+            "error": error_message,
+            "compensation_result": compensation_result,
+            "failed_booking_ref": failed_ticket.get('ref_no') if failed_ticket else None
+        }
+    
+    @staticmethod
+    def _failure_status(compensation_result: Dict[str, Any]) -> str:
+        """FAILED once every compensation went through; otherwise COMPENSATING, so the recovery worker retries the rollback"""
+        if compensation_result and compensation_result.get('successful_compensations', 0) < compensation_result.get('total_compensations', 0):
+            return 'COMPENSATING'
+        return 'FAILED'
+    
+    def _completed_result(self, correlation_id: str) -> Dict[str, Any]:
+        logger.info(f"[SAGA] All steps completed successfully for correlation_id: {correlation_id}")
+        saga_state.finish(correlation_id, 'COMPLETED', steps_completed=len(self.steps))
+        saga_metrics.saga_finished(correlation_id, 'completed')
+        
+        return {
+            "success": True,
+            "correlation_id": correlation_id,
+            "message": "SAGA completed successfully",
+            "steps_completed": len(self.steps)
+        }
+    
+    def _abandoned_result(self, transaction, booking_data: Dict[str, Any],
+                          compensation_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Failure result for a recovered SAGA that was rolled back instead of resumed"""
+        error = transaction.error_message or "SAGA interrupted before it finished"
+        outcomes = transaction.step_outcomes or {}
+        failed_step = next(
+            (step for step in self.steps if step.name == transaction.failed_step or outcomes.get(step.name) == STARTED),
+            None
+        )
+        if failed_step is not None:
+            return self._step_failed_result(transaction.correlation_id, booking_data, failed_step, {"error": error}, compensation_result)
+        return self._unexpected_error_result(transaction.correlation_id, booking_data, RuntimeError(error), compensation_result)
     
     def _execute_step(self, step: SagaStep, step_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             logger.info(f"[SAGA] Calling {step.action_url}")
-            response = requests.post(step.action_url, json=step_data, timeout=30)
+            status, text = self._post(step.action_url, step_data)
             
-            if response.status_code == 200:
-                result = response.json()
+            if status == 200:
+                result = json.loads(text)
                 logger.info(f"[SAGA] Step {step.name} response: {result}")
                 return result
             else:
-                logger.error(f"[SAGA] Step {step.name} HTTP error: {response.status_code}")
+                logger.error(f"[SAGA] Step {step.name} HTTP error: {status}")
                 return {
                     "success": False,
-                    "error": f"HTTP {response.status_code}: {response.text}"
+                    "error": f"HTTP {status}: {text}"
                 }
         except Exception as e:
             logger.error(f"[SAGA] Step {step.name} error: {e}")
             return {"success": False, "error": str(e)}
     
+    def _post(self, url: str, payload: Dict[str, Any], compensation: bool = False) -> Tuple[int, str]:
+        """
+        POST to a SAGA service through its circuit breaker, using the breaker's adaptive timeout.
+        
+        Compensations are never failed fast: undoing a step is always worth a
+        try, and their outcome still feeds the breaker like any other call.
+        """
+        handler = self._local_handler(url)
+        if handler is not None:
+            return self.local_transport.call(handler, url, payload)
+        breaker = saga_breakers.for_url(url)
+        if not compensation:
+            breaker.before_call()
+        started = time.monotonic()
+        try:
+            response = requests.post(url, json=payload, timeout=breaker.timeout())
+        except Exception as e:
+            breaker.record_failure(time.monotonic() - started, e)
+            raise
+        breaker.record_response(time.monotonic() - started, response.status_code)
+        return response.status_code, response.text
+    
+    def _local_handler(self, url: str):
+        """In-process view for a step URL, or None to call it over HTTP"""
+        if self.local_transport is None:
+            return None
+        return self.local_transport.handler(url)
+    
     def _execute_compensation(self, completed_steps: list, correlation_id: str, booking_data: Dict[str, Any]) -> Dict[str, Any]:
         logger.info(f"[SAGA COMPENSATION] 🔄 Starting compensation for {len(completed_steps)} completed steps")
         logger.info(f"[SAGA COMPENSATION] 📋 Steps to compensate: {[step.name for step in completed_steps]}")
         
-        # DIAGNOSTIC: Check logs before compensation
-        pre_comp_logs = saga_log_storage.get_logs(correlation_id)
-        logger.info(f"[SAGA ORCHESTRATOR DEBUG] Logs count before compensation: {len(pre_comp_logs)}")
-        
-        # Log compensation initiation
-        saga_log_storage.add_log(
-            correlation_id, "COMPENSATION", "ORCHESTRATOR", "warning",
-            f"🔄 Starting compensation for {len(completed_steps)} completed steps"
-        )
-        
-        # DIAGNOSTIC: Check logs after compensation initiation
-        post_init_logs = saga_log_storage.get_logs(correlation_id)
-        logger.info(f"[SAGA ORCHESTRATOR DEBUG] Logs count after compensation initiation: {len(post_init_logs)}")
+        self._record_compensation_start(correlation_id, completed_steps)
         
         compensation_results = []
-        for step in reversed(completed_steps):
+        for step in [step for wave in self._compensation_waves(completed_steps) for step in wave]:
             try:
                 logger.info(f"[SAGA COMPENSATION] ⚡ Executing compensation for step: {step.name}")
                 logger.info(f"[SAGA COMPENSATION] 🌐 Calling compensation URL: {step.compensation_url}")
@@ -258,92 +408,120 @@ class BookingOrchestrator:
                 logger.info(f"[COMPENSATION_DEBUG] Step: {step.name}")
                 logger.info(f"[COMPENSATION_DEBUG] URL: {step.compensation_url}")
                 logger.info(f"[COMPENSATION_DEBUG] Correlation ID: {correlation_id}")
-                logger.info(f"[COMPENSATION_DEBUG] Timeout: 30 seconds")
+                logger.info(f"[COMPENSATION_DEBUG] Timeout: {saga_breakers.for_url(step.compensation_url).timeout():.1f} seconds")
                 
-                compensation_data = {
-                    "correlation_id": correlation_id,
-                    "booking_data": booking_data,
-                    "compensation_reason": f"SAGA failure - rolling back {step.name}"
-                }
+                compensation_data = self._compensation_data(correlation_id, booking_data, step)
                 
                 logger.info(f"[COMPENSATION_DEBUG] Request payload: {compensation_data}")
                 
                 # Add connection test before actual request
-                import time
                 start_time = time.time()
+                status = None
                 
                 try:
-                    response = requests.post(step.compensation_url, json=compensation_data, timeout=30)
+                    status, text = self._post(step.compensation_url, compensation_data, compensation=True)
                     end_time = time.time()
                     logger.info(f"[COMPENSATION_DEBUG] Request completed in {end_time - start_time:.2f} seconds")
-                    logger.info(f"[COMPENSATION_DEBUG] Response status: {response.status_code}")
-                    logger.info(f"[COMPENSATION_DEBUG] Response text: {response.text}")
+                    logger.info(f"[COMPENSATION_DEBUG] Response status: {status}")
+                    logger.info(f"[COMPENSATION_DEBUG] Response text: {text}")
                 except requests.exceptions.RequestException as req_error:
                     logger.error(f"[COMPENSATION_DEBUG] Request failed: {req_error}")
                     raise req_error
+                finally:
+                    saga_metrics.compensation_finished(step.name, time.time() - start_time, status == 200)
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    logger.info(f"[SAGA COMPENSATION] ✅ Compensation for {step.name} successful: {result.get('message', 'No message')}")
-                    
-                    # Log detailed compensation with actual results
-                    comp_message = result.get('message', f'Compensation for {step.name} completed successfully')
-                    saga_log_storage.add_log(
-                        correlation_id, f"COMPENSATE_{step.name}", f"{step.name} Compensation", "success",
-                        f"🔄 {comp_message}", is_compensation=True
+                if status == 200:
+                    compensation_results.append(
+                        self._record_compensation_success(correlation_id, step, json.loads(text))
                     )
-                    
-                    # DIAGNOSTIC: Check logs count after each compensation
-                    comp_logs = saga_log_storage.get_logs(correlation_id)
-                    logger.info(f"[SAGA ORCHESTRATOR DEBUG] Logs count after {step.name} compensation: {len(comp_logs)}")
-                    
-                    # Add specific compensation details
-                    if step.name == "AwardMiles" and result.get('miles_reversed'):
-                        saga_log_storage.add_log(
-                            correlation_id, f"COMPENSATE_{step.name}", "Loyalty Compensation", "info",
-                            f"↩️ Miles reversed: {result.get('miles_reversed')} - Balance: {result.get('original_balance')} -> {result.get('new_balance')}", is_compensation=True
-                        )
-                    elif step.name == "AuthorizePayment" and result.get('authorization_id'):
-                        saga_log_storage.add_log(
-                            correlation_id, f"COMPENSATE_{step.name}", "Payment Compensation", "info",
-                            f"💳 Cancelled authorization: {result.get('authorization_id')} - Amount: ${result.get('amount', 0)}", is_compensation=True
-                        )
-                    elif step.name == "ReserveSeat":
-                        saga_log_storage.add_log(
-                            correlation_id, f"COMPENSATE_{step.name}", "Backend Compensation", "info",
-                            f"💺 Seat reservation cancelled successfully", is_compensation=True
-                        )
-                    
-                    compensation_results.append({
-                        "step": step.name,
-                        "success": True,
-                        "result": result,
-                        "timestamp": str(uuid.uuid4())[:8]  # Simple timestamp for demo
-                    })
                 else:
-                    logger.error(f"[SAGA COMPENSATION] ❌ Compensation for {step.name} failed: HTTP {response.status_code}")
-                    
-                    # Log failed compensation
-                    saga_log_storage.add_log(
-                        correlation_id, f"COMPENSATE_{step.name}", "ORCHESTRATOR", "error",
-                        f"Compensation for {step.name} failed: HTTP {response.status_code}", is_compensation=True
+                    compensation_results.append(
+                        self._record_compensation_failure(correlation_id, step, status)
                     )
                     
-                    compensation_results.append({
-                        "step": step.name,
-                        "success": False,
-                        "error": f"HTTP {response.status_code}",
-                        "timestamp": str(uuid.uuid4())[:8]
-                    })
-                    
             except Exception as e:
-                logger.error(f"[SAGA] Compensation for {step.name} error: {e}")
-                compensation_results.append({
-                    "step": step.name,
-                    "success": False,
-                    "error": str(e)
-                })
+                compensation_results.append(self._compensation_error(correlation_id, step, e))
+        
+        return self._compensation_summary(compensation_results)
+    
+    def _record_compensation_start(self, correlation_id: str, completed_steps: list):
+        saga_state.compensating(correlation_id)
+        # Log compensation initiation
+        saga_log_storage.add_log(
+            correlation_id, "COMPENSATION", "ORCHESTRATOR", "warning",
+            f"🔄 Starting compensation for {len(completed_steps)} completed steps"
+        )
+    
+    def _compensation_data(self, correlation_id: str, booking_data: Dict[str, Any], step: SagaStep) -> Dict[str, Any]:
+        return {
+            "correlation_id": correlation_id,
+            "booking_data": booking_data,
+            "compensation_reason": f"SAGA failure - rolling back {step.name}"
+        }
+    
+    def _record_compensation_success(self, correlation_id: str, step: SagaStep, result: Dict[str, Any]) -> Dict[str, Any]:
+        logger.info(f"[SAGA COMPENSATION] ✅ Compensation for {step.name} successful: {result.get('message', 'No message')}")
+        saga_state.step_compensated(correlation_id, step.name, True)
+        
+        # Log detailed compensation with actual results
+        comp_message = result.get('message', f'Compensation for {step.name} completed successfully')
+        saga_log_storage.add_log(
+            correlation_id, f"COMPENSATE_{step.name}", f"{step.name} Compensation", "success",
+            f"🔄 {comp_message}", is_compensation=True
+        )
+        
+        # Add specific compensation details
+        if step.name == "AwardMiles" and result.get('miles_reversed'):
+            saga_log_storage.add_log(
+                correlation_id, f"COMPENSATE_{step.name}", "Loyalty Compensation", "info",
+                f"↩️ Miles reversed: {result.get('miles_reversed')} - Balance: {result.get('original_balance')} -> {result.get('new_balance')}", is_compensation=True
+            )
+        elif step.name == "AuthorizePayment" and result.get('authorization_id'):
+            saga_log_storage.add_log(
+                correlation_id, f"COMPENSATE_{step.name}", "Payment Compensation", "info",
+                f"💳 Cancelled authorization: {result.get('authorization_id')} - Amount: ${result.get('amount', 0)}", is_compensation=True
+            )
+        elif step.name == "ReserveSeat":
+            saga_log_storage.add_log(
+                correlation_id, f"COMPENSATE_{step.name}", "Backend Compensation", "info",
+                f"💺 Seat reservation cancelled successfully", is_compensation=True
+            )
+        
+        return {
+            "step": step.name,
+            "success": True,
+            "result": result,
+            "timestamp": str(uuid.uuid4())[:8]  # Simple timestamp for demo
+        }
+    
+    def _record_compensation_failure(self, correlation_id: str, step: SagaStep, status_code: int) -> Dict[str, Any]:
+        logger.error(f"[SAGA COMPENSATION] ❌ Compensation for {step.name} failed: HTTP {status_code}")
+        saga_state.step_compensated(correlation_id, step.name, False)
         
+        # Log failed compensation
+        saga_log_storage.add_log(
+            correlation_id, f"COMPENSATE_{step.name}", "ORCHESTRATOR", "error",
+            f"Compensation for {step.name} failed: HTTP {status_code}", is_compensation=True
+        )
+        
+        return {
+            "step": step.name,
+            "success": False,
+            "error": f"HTTP {status_code}",
+            "timestamp": str(uuid.uuid4())[:8]
+        }
+    
+    def _compensation_error(self, correlation_id: str, step: SagaStep, error: Exception) -> Dict[str, Any]:
+        logger.error(f"[SAGA] Compensation for {step.name} error: {error}")
+        saga_state.step_compensated(correlation_id, step.name, False)
+        return {
+            "step": step.name,
+            "success": False,
+            "error": str(error)
+        }
+    
+    @staticmethod
+    def _compensation_summary(compensation_results: list) -> Dict[str, Any]:
         return {
             "total_compensations": len(compensation_results),
             "successful_compensations": len([r for r in compensation_results if r.get("success")]),
@@ -0,0 +1,245 @@
+"""
+SAGA Worker Pool
+Persistent queue of pending booking SAGAs drained by a fixed number of worker threads
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import SagaQueueItem
+from .saga_log_storage import saga_log_storage
+
+logger = logging.getLogger(__name__)
+
+# SAGAs run at once; each one holds a worker thread and a DB connection
+SAGA_WORKERS = getattr(settings, 'SAGA_WORKERS', 2)
+
+# Waiting SAGAs accepted before new bookings are turned away
+SAGA_QUEUE_MAX_DEPTH = getattr(settings, 'SAGA_QUEUE_MAX_DEPTH', 200)
+
+# Idle workers also re-check the table, for rows queued by other processes
+POLL_INTERVAL = 1.0
+
+# Sent as Retry-After when the queue is full
+RETRY_AFTER_SECONDS = 5
+
+# Seconds after which a RUNNING row whose worker cannot be checked is taken as abandoned
+RUNNING_LEASE_SECONDS = getattr(settings, 'SAGA_QUEUE_LEASE_SECONDS', 900)
+
+ACTIVE_STATUSES = ('QUEUED', 'RUNNING')
+
+# Recorded on every row this process claims
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SagaQueueFull(Exception):
+    """Raised by enqueue when SAGA_QUEUE_MAX_DEPTH bookings are already waiting"""
+
+    def __init__(self, depth: int):
+        super().__init__(f"SAGA queue is full ({depth} waiting)")
+        self.depth = depth
+
+
+class SagaWorkerPool:
+    """
+    Bounded execution service for booking SAGAs.
+
+    Bookings are written to the SagaQueueItem table and picked up oldest
+    first by at most `workers` threads, so a traffic spike grows the queue
+    instead of the thread count. Once `max_depth` rows are waiting, enqueue
+    refuses new work and the caller answers 503. Rows still QUEUED after a
+    restart are run when the pool starts again. Each claimed row records the
+    host and pid of its worker; a RUNNING row whose process has died, or
+    that another host has held past RUNNING_LEASE_SECONDS, is marked
+    INTERRUPTED rather than replayed, since its steps may have partly run,
+    and the recovery worker finishes the SAGA from the recorded step state.
+    Rows run by live workers in other processes are left alone.
+    """
+
+    def __init__(self, workers: int = SAGA_WORKERS, max_depth: int = SAGA_QUEUE_MAX_DEPTH,
+                 orchestrator_factory=None):
+        self.workers = workers
+        self.max_depth = max_depth
+        self._orchestrator_factory = orchestrator_factory
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self._busy = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _orchestrator(self):
+        if self._orchestrator_factory is not None:
+            return self._orchestrator_factory()
+        from .saga_views_complete import get_orchestrator
+        return get_orchestrator()
+
+    def start(self):
+        """Start the worker threads if they are not running yet"""
+        with self._lock:
+            if self._threads:
+                return
+            interrupted = SagaQueueItem.objects.filter(id__in=self._abandoned(), status='RUNNING').update(
+                status='INTERRUPTED',
+                error_message='Worker stopped before the SAGA finished',
+                finished_at=timezone.now()
+            )
+            if interrupted:
+                logger.warning(f"[SAGA QUEUE] Marked {interrupted} SAGAs interrupted by the last shutdown")
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'saga-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"[SAGA QUEUE] Started {self.workers} saga workers (max depth {self.max_depth})")
+
+    @staticmethod
+    def _abandoned() -> list:
+        """Ids of RUNNING rows whose worker process is gone"""
+        host = socket.gethostname()
+        lease_expired = timezone.now() - timedelta(seconds=RUNNING_LEASE_SECONDS)
+        abandoned = []
+        for item_id, owner, started_at in SagaQueueItem.objects.filter(status='RUNNING').values_list('id', 'owner', 'started_at'):
+            owner_host, _, pid = owner.rpartition(':')
+            if owner_host == host and pid.isdigit() and os.name == 'posix':
+                if not _process_alive(int(pid)):
+                    abandoned.append(item_id)
+            elif started_at is None or started_at < lease_expired:
+                abandoned.append(item_id)
+        return abandoned
+
+    def stop(self, timeout: Optional[float] = None):
+        """Let running SAGAs finish, then stop the workers"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            with self._wakeup:
+                self._stopping = True
+                self._wakeup.notify_all()
+        for thread in threads:
+            thread.join(timeout)
+
+    def enqueue(self, booking_data: Dict[str, Any], correlation_id: str) -> SagaQueueItem:
+        """Queue a booking SAGA, or raise SagaQueueFull when the queue is at capacity"""
+        with self._lock:
+            depth = SagaQueueItem.objects.filter(status='QUEUED').count()
+            if depth >= self.max_depth:
+                self.rejected += 1
+                logger.warning(f"[SAGA QUEUE] Rejected {correlation_id}: {depth} SAGAs already waiting")
+                raise SagaQueueFull(depth)
+            item = SagaQueueItem.objects.create(
+                correlation_id=correlation_id,
+                booking_data={**booking_data, 'correlation_id': correlation_id}
+            )
+            self.accepted += 1
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        logger.info(f"[SAGA QUEUE] Queued {correlation_id} at depth {depth + 1}")
+        return item
+
+    def _claim(self) -> Optional[SagaQueueItem]:
+        """Take the oldest queued row; the conditional update keeps two workers off the same row"""
+        candidates = SagaQueueItem.objects.filter(status='QUEUED').order_by('created_at', 'id')
+        for item in candidates[:self.workers]:
+            claimed = SagaQueueItem.objects.filter(pk=item.pk, status='QUEUED').update(
+                status='RUNNING', started_at=timezone.now(), owner=WORKER_ID
+            )
+            if claimed:
+                return item
+        return None
+
+    def _work(self):
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+            item = None
+            try:
+                item = self._claim()
+                if item is not None:
+                    self._run(item)
+            except Exception as e:
+                logger.error(f"[SAGA QUEUE] Worker error: {e}")
+            finally:
+                close_old_connections()
+            if item is None:
+                with self._wakeup:
+                    if not self._stopping:
+                        self._wakeup.wait(POLL_INTERVAL)
+
+    def _run(self, item: SagaQueueItem):
+        with self._lock:
+            self._busy += 1
+        try:
+            orchestrator = self._orchestrator()
+            if orchestrator is None:
+                raise RuntimeError('SAGA orchestrator not available')
+            result = orchestrator.start_booking_saga(item.booking_data)
+            status = 'COMPLETED' if result.get('success') else 'FAILED'
+            error_message = result.get('error')
+            logger.info(f"[SAGA QUEUE] {item.correlation_id} finished: {status}")
+        except Exception as e:
+            status, error_message = 'FAILED', str(e)
+            logger.error(f"[SAGA QUEUE] {item.correlation_id} raised: {e}")
+        finally:
+            with self._lock:
+                self._busy -= 1
+
+        SagaQueueItem.objects.filter(pk=item.pk).update(
+            status=status, error_message=error_message, finished_at=timezone.now()
+        )
+        saga_log_storage.notify_change()
+        with self._lock:
+            if status == 'COMPLETED':
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth from the table plus this process's worker counters"""
+        counts = dict(
+            SagaQueueItem.objects.filter(status__in=ACTIVE_STATUSES)
+            .values_list('status').annotate(count=Count('id'))
+        )
+        oldest = SagaQueueItem.objects.filter(status='QUEUED').aggregate(oldest=Min('created_at'))['oldest']
+        queued = counts.get('QUEUED', 0)
+        with self._lock:
+            return {
+                'queued': queued,
+                'running': counts.get('RUNNING', 0),
+                'max_depth': self.max_depth,
+                'queue_utilization': round(queued / self.max_depth, 3) if self.max_depth else 1.0,
+                'oldest_queued_seconds': round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0.0,
+                'workers': self.workers,
+                'workers_started': len(self._threads),
+                'busy_workers': self._busy,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'failed': self.failed
+            }
+
+
+# Global instance
+saga_worker_pool = SagaWorkerPool()
@@ -0,0 +1,183 @@
+"""
+SAGA Recovery Worker
+Finds SAGAs left in flight by a stopped process and resumes or compensates them
+"""
+import logging
+import threading
+from datetime import timedelta
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SagaQueueItem, SagaTransaction
+from .saga_log_storage import saga_log_storage
+from .saga_state import IN_FLIGHT_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# An in-flight SAGA whose row has not changed for this long is considered orphaned;
+# must stay well above the longest single step call
+SAGA_RECOVERY_STALE_SECONDS = getattr(settings, 'SAGA_RECOVERY_STALE_SECONDS', 120)
+
+# Seconds between scans after the one run at startup
+SAGA_RECOVERY_INTERVAL = getattr(settings, 'SAGA_RECOVERY_INTERVAL', 60)
+
+# Recovery runs that retry a SAGA forward before rolling it back instead
+MAX_FORWARD_ATTEMPTS = 2
+
+# Recovery runs that retry a failed rollback before the SAGA is left FAILED for manual follow-up
+MAX_ROLLBACK_ATTEMPTS = getattr(settings, 'SAGA_MAX_ROLLBACK_ATTEMPTS', 10)
+
+# SAGAs older than this are rolled back; the customer has long stopped waiting
+FORWARD_MAX_AGE = timedelta(minutes=15)
+
+# Orphaned SAGAs handled per scan
+SCAN_BATCH = 50
+
+
+class SagaRecoveryWorker:
+    """
+    Background thread that finishes orphaned SAGAs.
+
+    A scan reads in-flight SagaTransaction rows not updated for `stale_seconds`
+    through the (status, updated_at) index. Each one is claimed with a
+    conditional update on updated_at, so two processes never recover the same
+    SAGA, and then either resumed from its first unfinished step or, once it is
+    compensating, too old or already retried, rolled back. A rollback whose
+    compensations did not all go through leaves the SAGA COMPENSATING for the
+    next scan, up to MAX_ROLLBACK_ATTEMPTS runs. A queue row left INTERRUPTED
+    for the SAGA gets its final status too.
+    """
+
+    def __init__(self, stale_seconds: float = SAGA_RECOVERY_STALE_SECONDS,
+                 interval: float = SAGA_RECOVERY_INTERVAL, orchestrator_factory=None):
+        self.stale_seconds = stale_seconds
+        self.interval = interval
+        self._orchestrator_factory = orchestrator_factory
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.resumed = 0
+        self.rolled_back = 0
+        self.errors = 0
+
+    def _orchestrator(self):
+        if self._orchestrator_factory is not None:
+            return self._orchestrator_factory()
+        from .saga_views_complete import get_orchestrator
+        return get_orchestrator()
+
+    def start(self):
+        """Start the scan thread if it is not running yet"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='saga-recovery', daemon=True)
+            self._thread.start()
+            logger.info(f"[SAGA RECOVERY] Started (stale after {self.stale_seconds}s, scan every {self.interval}s)")
+
+    def stop(self, timeout: Optional[float] = None):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.recover_stale()
+            except Exception as e:
+                logger.error(f"[SAGA RECOVERY] Scan failed: {e}")
+            finally:
+                close_old_connections()
+            self._stop.wait(self.interval)
+
+    def recover_stale(self) -> int:
+        """Recover every orphaned SAGA found by one scan; returns how many were handled"""
+        cutoff = timezone.now() - timedelta(seconds=self.stale_seconds)
+        candidates = list(
+            SagaTransaction.objects.filter(status__in=IN_FLIGHT_STATUSES, updated_at__lt=cutoff)
+            .order_by('updated_at')[:SCAN_BATCH]
+        )
+        recovered = 0
+        for transaction in candidates:
+            if self._claim(transaction):
+                self._recover(transaction)
+                recovered += 1
+        return recovered
+
+    @staticmethod
+    def _claim(transaction: SagaTransaction) -> bool:
+        claimed = SagaTransaction.objects.filter(
+            pk=transaction.pk, status=transaction.status, updated_at=transaction.updated_at
+        ).update(updated_at=timezone.now(), recovery_attempts=F('recovery_attempts') + 1)
+        if claimed:
+            transaction.refresh_from_db()
+        return bool(claimed)
+
+    def _recover(self, transaction: SagaTransaction):
+        correlation_id = transaction.correlation_id
+        forward = (
+            transaction.status != 'COMPENSATING'
+            and transaction.recovery_attempts <= MAX_FORWARD_ATTEMPTS
+            and timezone.now() - transaction.created_at <= FORWARD_MAX_AGE
+        )
+        logger.warning(
+            f"[SAGA RECOVERY] {'Resuming' if forward else 'Rolling back'} {correlation_id} "
+            f"(status {transaction.status}, step {transaction.current_step + 1}, attempt {transaction.recovery_attempts})"
+        )
+        try:
+            orchestrator = self._orchestrator()
+            if orchestrator is None:
+                raise RuntimeError('SAGA orchestrator not available')
+            result = orchestrator.resume_booking_saga(transaction, forward=forward)
+        except Exception as e:
+            # The row stays in flight and is picked up again by a later scan
+            with self._lock:
+                self.errors += 1
+            logger.error(f"[SAGA RECOVERY] {correlation_id} recovery raised: {e}")
+            return
+
+        if not forward and transaction.recovery_attempts >= MAX_ROLLBACK_ATTEMPTS:
+            given_up = SagaTransaction.objects.filter(pk=transaction.pk, status='COMPENSATING').update(
+                status='FAILED', updated_at=timezone.now()
+            )
+            if given_up:
+                logger.error(
+                    f"[SAGA RECOVERY] {correlation_id} still not rolled back after "
+                    f"{transaction.recovery_attempts} attempts, needs manual compensation"
+                )
+
+        status = 'COMPLETED' if result.get('success') else 'FAILED'
+        SagaQueueItem.objects.filter(correlation_id=correlation_id, status='INTERRUPTED').update(
+            status=status, error_message=result.get('error'), finished_at=timezone.now()
+        )
+        saga_log_storage.notify_change()
+        with self._lock:
+            if forward:
+                self.resumed += 1
+            else:
+                self.rolled_back += 1
+        logger.info(f"[SAGA RECOVERY] {correlation_id} finished: {status}")
+
+    def stats(self) -> Dict[str, Any]:
+        cutoff = timezone.now() - timedelta(seconds=self.stale_seconds)
+        orphaned = SagaTransaction.objects.filter(status__in=IN_FLIGHT_STATUSES, updated_at__lt=cutoff).count()
+        with self._lock:
+            return {
+                'running': self._thread is not None,
+                'stale_after_seconds': self.stale_seconds,
+                'orphaned': orphaned,
+                'resumed': self.resumed,
+                'rolled_back': self.rolled_back,
+                'errors': self.errors
+            }
+
+
+# Global instance
+saga_recovery_worker = SagaRecoveryWorker()
@@ -0,0 +1,126 @@
+"""
+SAGA Step State
+Durable record of each SAGA's current step and per-step outcomes on its SagaTransaction row
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+from .db_retry import retry_when_locked
+from .models import Flight, SagaTransaction, User
+from .saga_log_storage import saga_log_storage
+
+logger = logging.getLogger(__name__)
+
+# Statuses of a SAGA that has not reached its final state yet
+IN_FLIGHT_STATUSES = ('STARTED', 'IN_PROGRESS', 'COMPENSATING')
+
+# Per-step outcomes kept in SagaTransaction.step_outcomes
+STARTED = 'STARTED'
+SUCCEEDED = 'SUCCEEDED'
+FAILED = 'FAILED'
+COMPENSATED = 'COMPENSATED'
+COMPENSATION_FAILED = 'COMPENSATION_FAILED'
+
+
+class SagaStateStore:
+    """
+    Writes every SAGA step transition to SagaTransaction.
+
+    A step is marked STARTED before its service is called and SUCCEEDED or
+    FAILED once it answers, so after a crash the row tells which steps
+    definitely ran and which one may have. Each write also bumps updated_at,
+    which the recovery worker reads as the SAGA's heartbeat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Steps of one SAGA can finish at the same time on different threads;
+        # updates of its outcome map must not overwrite each other, while
+        # different SAGAs write their rows in parallel
+        self._saga_locks: Dict[str, list] = {}  # correlation_id -> [lock, threads using it]
+
+    def begin(self, correlation_id: str, booking_data: Dict[str, Any]) -> bool:
+        """Create the SAGA's transaction row unless the caller already did; False if it cannot be recorded"""
+        if SagaTransaction.objects.filter(correlation_id=correlation_id).exists():
+            return True
+        flight = Flight.objects.filter(id=booking_data.get('flight_id')).first()
+        if flight is None:
+            logger.warning(f"[SAGA STATE] Flight {booking_data.get('flight_id')} not found, {correlation_id} will not be recoverable")
+            return False
+        user_id = booking_data.get('user_id')
+        SagaTransaction.objects.get_or_create(
+            correlation_id=correlation_id,
+            defaults={
+                'user': User.objects.filter(id=user_id).first() if user_id else None,
+                'flight': flight,
+                'booking_data': booking_data,
+                'status': 'STARTED'
+            }
+        )
+        return True
+
+    def step_started(self, correlation_id: str, index: int, step_name: str):
+        self._update(correlation_id, (step_name, STARTED), status='IN_PROGRESS', current_step=index)
+
+    def step_succeeded(self, correlation_id: str, step_name: str):
+        # Steps of a DAG finish out of order, so the count comes from the outcomes
+        self._update(correlation_id, (step_name, SUCCEEDED), count_succeeded=True)
+
+    def step_failed(self, correlation_id: str, step_name: str, error: str):
+        self._update(correlation_id, (step_name, FAILED), status='COMPENSATING',
+                     failed_step=step_name, error_message=error)
+
+    def compensating(self, correlation_id: str):
+        self._update(correlation_id, status='COMPENSATING')
+
+    def step_compensated(self, correlation_id: str, step_name: str, succeeded: bool):
+        outcome = COMPENSATED if succeeded else COMPENSATION_FAILED
+        self._update(correlation_id, (step_name, outcome), compensation_executed=True)
+
+    def finish(self, correlation_id: str, status: str, **fields):
+        # Buffered log entries land before the final status, so a reader in
+        # another process that sees the status also finds the whole log
+        saga_log_storage.flush(correlation_id)
+        self._update(correlation_id, status=status, **fields)
+        saga_log_storage.notify_change()
+
+    @contextmanager
+    def _saga_lock(self, correlation_id: str):
+        with self._lock:
+            entry = self._saga_locks.setdefault(correlation_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._saga_locks[correlation_id]
+
+    def _update(self, correlation_id: str, outcome: Optional[tuple] = None, count_succeeded: bool = False, **fields):
+        with self._saga_lock(correlation_id):
+            retry_when_locked(self._write, correlation_id, outcome, count_succeeded, fields)
+
+    @staticmethod
+    def _write(correlation_id: str, outcome: Optional[tuple], count_succeeded: bool, fields: Dict[str, Any]):
+        # Rebuilt from the arguments on every attempt, so a retry writes the same fields
+        fields = dict(fields)
+        transaction = SagaTransaction.objects.filter(correlation_id=correlation_id).first()
+        if transaction is None:
+            return
+        if outcome is not None:
+            step_name, state = outcome
+            transaction.step_outcomes = {**transaction.step_outcomes, step_name: state}
+            fields['step_outcomes'] = transaction.step_outcomes
+        if count_succeeded:
+            fields['steps_completed'] = sum(1 for state in transaction.step_outcomes.values() if state == SUCCEEDED)
+        for name, value in fields.items():
+            setattr(transaction, name, value)
+        transaction.save(update_fields=[*fields, 'updated_at'])
+
+
+# Global instance
+saga_state = SagaStateStore()
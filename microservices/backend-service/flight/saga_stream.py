@@ -0,0 +1,156 @@
+"""
+SAGA Progress Stream
+Server-Sent Events carrying new SAGA log entries and status changes for one correlation_id
+"""
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from django.conf import settings
+
+from .models import SagaQueueItem, SagaTransaction
+from .saga_log_storage import saga_log_storage
+
+logger = logging.getLogger(__name__)
+
+# Longest wait for new entries before checking status and the database again
+STREAM_POLL_INTERVAL = 1.0
+
+# Comment line sent when nothing happened, so proxies keep the connection open
+STREAM_KEEPALIVE_SECONDS = 15
+
+# A stream ends after this long; EventSource reconnects with Last-Event-ID
+STREAM_MAX_SECONDS = 300
+
+TERMINAL_STATUSES = {'COMPLETED', 'FAILED', 'COMPENSATED', 'INTERRUPTED'}
+
+# Client retry delay sent with the first event, in milliseconds
+RETRY_MS = 2000
+
+# Streams served at once by this process; each one holds a server thread for up to
+# STREAM_MAX_SECONDS, so this must stay well below the server's thread count
+STREAM_MAX_CONNECTIONS = getattr(settings, 'SAGA_STREAM_MAX_CONNECTIONS', 20)
+
+# Sent as Retry-After when every stream slot is taken
+STREAM_RETRY_AFTER_SECONDS = 5
+
+
+def saga_status(correlation_id: str) -> Optional[str]:
+    """Queue status for async SAGAs, transaction status for synchronous or interrupted ones"""
+    status = SagaQueueItem.objects.filter(correlation_id=correlation_id).values_list('status', flat=True).first()
+    if status is None or status == 'INTERRUPTED':
+        # An interrupted SAGA keeps going once the recovery worker picks it up
+        status = SagaTransaction.objects.filter(correlation_id=correlation_id).values_list('status', flat=True).first() or status
+    return status
+
+
+def _event(event: str, data, event_id=None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def saga_event_stream(correlation_id: str, after: int = 0) -> Iterator[str]:
+    """
+    Yield SSE frames for a SAGA, starting after the first `after` log entries.
+
+    Each `log` event carries one entry and its position as the event id, so
+    a reconnecting client resumes where it stopped. A `status` event is sent
+    whenever the SAGA status changes and `end` once it is final and every
+    entry has been sent. Entries logged by this process wake the stream
+    immediately; others are picked up every STREAM_POLL_INTERVAL. A SAGA's
+    log is written to the database before its final status, so `end` never
+    goes out ahead of entries logged by another process.
+    """
+    sent = after
+    status = None
+    started = last_write = time.monotonic()
+    yield f"retry: {RETRY_MS}\n\n"
+
+    while time.monotonic() - started < STREAM_MAX_SECONDS:
+        # Taken before reading, so a change made during the reads ends the wait below
+        seen = saga_log_storage.changes
+        current = saga_status(correlation_id)
+        for entry in saga_log_storage.logs_since(correlation_id, sent):
+            sent += 1
+            last_write = time.monotonic()
+            yield _event('log', entry, sent)
+
+        if current != status:
+            status = current
+            last_write = time.monotonic()
+            yield _event('status', {'correlation_id': correlation_id, 'status': status})
+
+        if status in TERMINAL_STATUSES:
+            logger.info(f"[SAGA STREAM] {correlation_id} finished as {status} after {sent} entries")
+            yield _event('end', {'correlation_id': correlation_id, 'status': status, 'total_logs': sent})
+            return
+
+        if time.monotonic() - last_write >= STREAM_KEEPALIVE_SECONDS:
+            last_write = time.monotonic()
+            yield ": keep-alive\n\n"
+
+        saga_log_storage.wait_for_change(seen, STREAM_POLL_INTERVAL)
+
+
+class SagaEventStream:
+    """SSE frames of one stream; closing it, as the response does when the client leaves, frees its slot"""
+
+    def __init__(self, frames: Iterator[str], slots: 'SagaStreamSlots'):
+        self._frames = frames
+        self._slots = slots
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return next(self._frames)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._frames.close()
+        self._slots.release()
+
+
+class SagaStreamSlots:
+    """
+    Bounds the streams this process serves at once.
+
+    Every open stream keeps a WSGI thread and polls the database for as long
+    as STREAM_MAX_SECONDS, so past `limit` open streams new ones are refused
+    with a 503 instead of starving ordinary requests of threads.
+    """
+
+    def __init__(self, limit: int = STREAM_MAX_CONNECTIONS):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self.open = 0
+        self.rejected = 0
+
+    def open_stream(self, correlation_id: str, after: int = 0) -> Optional[SagaEventStream]:
+        """A stream for the SAGA, or None when every slot is taken"""
+        with self._lock:
+            if self.open >= self.limit:
+                self.rejected += 1
+                return None
+            self.open += 1
+        return SagaEventStream(saga_event_stream(correlation_id, after), self)
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'open': self.open, 'limit': self.limit, 'rejected': self.rejected}
+
+
+# Global instance
+saga_stream_slots = SagaStreamSlots()
@@ -0,0 +1,80 @@
+"""
+SAGA Step Transport
+Calls SAGA step handlers mounted in this process directly instead of over loopback HTTP
+"""
+import json
+import logging
+import threading
+from typing import Dict, Any, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import HttpRequest
+from django.urls import Resolver404, ResolverMatch, resolve
+
+logger = logging.getLogger(__name__)
+
+# 'http' calls every step over HTTP; 'inprocess' calls handlers served by this process directly
+SAGA_STEP_TRANSPORT = getattr(settings, 'SAGA_STEP_TRANSPORT', 'http')
+
+# Step URL origins that are this process, so their paths resolve against our own URLconf
+SAGA_INPROCESS_ORIGINS = getattr(settings, 'SAGA_INPROCESS_ORIGINS', ['http://localhost:8001'])
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class InProcessTransport:
+    """
+    Invokes SAGA step views in the calling thread.
+
+    A step URL whose origin is one of `origins` is resolved against this
+    process's URLconf once and cached; calling it builds a POST request in
+    memory and runs the view, so a self-call costs neither a socket nor a
+    server thread. The step views still read the payload from request.body,
+    so it is encoded once, but nothing goes over the wire. URLs on any other
+    origin, or paths this process does not serve, return no handler and are
+    left to the HTTP transport.
+    """
+
+    def __init__(self, origins: Iterable[str] = SAGA_INPROCESS_ORIGINS):
+        self.origins = {origin.rstrip('/') for origin in origins}
+        self._lock = threading.Lock()
+        self._handlers: Dict[str, Optional[ResolverMatch]] = {}
+        self.calls = 0
+
+    def handler(self, url: str) -> Optional[ResolverMatch]:
+        """Resolved view for a step URL, or None when it has to go over HTTP"""
+        if url in self._handlers:
+            return self._handlers[url]
+        match = None
+        if _origin(url) in self.origins:
+            try:
+                match = resolve(urlsplit(url).path)
+            except Resolver404:
+                logger.warning(f"[SAGA TRANSPORT] {url} is not served by this process, using HTTP")
+        with self._lock:
+            self._handlers[url] = match
+        return match
+
+    def call(self, match: ResolverMatch, url: str, payload: Dict[str, Any]) -> Tuple[int, str]:
+        """POST the payload to a resolved view and return (status, body text)"""
+        parts = urlsplit(url)
+        request = HttpRequest()
+        request.method = 'POST'
+        request.path = request.path_info = parts.path
+        request.META = {
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': 'application/json',
+            'SERVER_NAME': parts.hostname or 'localhost',
+            'SERVER_PORT': str(parts.port or 80),
+            'REMOTE_ADDR': '127.0.0.1',
+        }
+        request._body = json.dumps(payload).encode()
+        request.resolver_match = match
+        with self._lock:
+            self.calls += 1
+        response = match.func(request, *match.args, **match.kwargs)
+        return response.status_code, response.content.decode(response.charset)
@@ -8,15 +8,26 @@ import logging
 import json
 import uuid
 import requests
-import threading
 from typing import Dict, Any
-from django.http import JsonResponse
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from .models import Flight, Place, Week, SagaTransaction, SagaPaymentAuthorization, SagaMilesAward, SeatReservation, Ticket, Passenger
 from .simple_views import stored_tickets
 from .saga_log_storage import saga_log_storage
 from .failed_booking_handler import create_failed_booking_record
+from .saga_queue import saga_worker_pool, SagaQueueFull, RETRY_AFTER_SECONDS
+from .saga_stream import STREAM_RETRY_AFTER_SECONDS, saga_stream_slots
+from .saga_breakers import saga_breakers
+from .saga_recovery import saga_recovery_worker
+from .saga_idempotency import idempotent_step
+from .reservation_sweeper import reservation_sweeper
+from .seat_inventory import seat_inventory, next_departure_date
+from .seat_map import seat_maps
+from .saga_metrics import saga_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .db_retry import retry_when_locked
 from django.utils import timezone
 from datetime import timedelta
 
@@ -48,19 +59,47 @@ def get_or_create_seat_reservation(correlation_id: str, booking_data: Dict[str,
                 logger.error(f"[PAYMENT_FLOW_DEBUG] ❌ User {user_id} not found - creating seat reservation without user")
                 user = None
         
-        reservation, created = SeatReservation.objects.get_or_create(
-            correlation_id=correlation_id,
-            defaults={
-                'flight': flight,
-                'user': user,  # Use user object instead of user_id
-                'status': 'RESERVED',
-                'expires_at': timezone.now() + timedelta(minutes=30)  # 30 min expiry
-            }
-        )
+        existing = SeatReservation.objects.filter(correlation_id=correlation_id).first()
+        if existing is not None:
+            logger.info(f"[SAGA DB] Found existing seat reservation: {correlation_id}")
+            return existing
+        
+        # Take the seats off the flight's counter first; raises SeatsUnavailable when sold out
+        seat_class = booking_data.get('seat_class', 'economy')
+        seat_count = max(1, len(booking_data.get('passengers') or []))
+        departure_date = next_departure_date(flight, timezone.now())
+        inventory_id = seat_inventory.hold(flight, departure_date, seat_class, seat_count)
+        seat_map, seat_numbers = None, []
+        try:
+            # Seat numbers are best effort: the counter decides whether the party flies
+            seat_map, seat_numbers = seat_maps.allocate(flight, departure_date, seat_class, seat_count)
+            reservation, created = SeatReservation.objects.get_or_create(
+                correlation_id=correlation_id,
+                defaults={
+                    'flight': flight,
+                    'user': user,  # Use user object instead of user_id
+                    'status': 'RESERVED',
+                    'expires_at': timezone.now() + timedelta(minutes=30),  # 30 min expiry
+                    'inventory_id': inventory_id,
+                    'seat_count': seat_count,
+                    'seat_map': seat_map if seat_numbers else None,
+                    'seat_numbers': seat_numbers,
+                    'departure_date': departure_date
+                }
+            )
+        except Exception:
+            seat_inventory.release(inventory_id, seat_count)
+            if seat_numbers:
+                seat_maps.release(seat_map.id, seat_numbers)
+            raise
         
         if created:
-            logger.info(f"[SAGA DB] Created seat reservation in database: {correlation_id}")
+            logger.info(f"[SAGA DB] Created seat reservation in database: {correlation_id} ({seat_count} {seat_class} seats on {departure_date}: {', '.join(seat_numbers) or 'unassigned'})")
         else:
+            # A concurrent call for the same SAGA created it first
+            seat_inventory.release(inventory_id, seat_count)
+            if seat_numbers:
+                seat_maps.release(seat_map.id, seat_numbers)
             logger.info(f"[SAGA DB] Found existing seat reservation: {correlation_id}")
             
         return reservation
@@ -75,8 +114,14 @@ def cancel_seat_reservation(correlation_id: str) -> bool:
     """
     try:
         reservation = SeatReservation.objects.get(correlation_id=correlation_id)
-        reservation.status = 'CANCELLED'
-        reservation.save()
+        # Only the call that moves a holding reservation to CANCELLED gives its seats back
+        cancelled = SeatReservation.objects.filter(
+            pk=reservation.pk, status__in=('RESERVED', 'CONFIRMED')
+        ).update(status='CANCELLED')
+        if cancelled and reservation.inventory_id:
+            seat_inventory.release(reservation.inventory_id, reservation.seat_count)
+        if cancelled and reservation.seat_map_id:
+            seat_maps.release(reservation.seat_map_id, reservation.seat_numbers)
         logger.info(f"[SAGA DB] Cancelled seat reservation in database: {correlation_id}")
         return True
     except SeatReservation.DoesNotExist:
@@ -91,6 +136,14 @@ def get_orchestrator():
     global saga_orchestrator
     if saga_orchestrator is None:
         try:
+            if getattr(settings, 'SAGA_ORCHESTRATOR', 'threaded') == 'asyncio':
+                try:
+                    from .saga_orchestrator_async import AsyncBookingOrchestrator
+                    saga_orchestrator = AsyncBookingOrchestrator()
+                    logger.info("[SAGA] Asyncio orchestrator initialized successfully")
+                    return saga_orchestrator
+                except ImportError as e:
+                    logger.warning(f"[SAGA] Asyncio orchestrator unavailable, using threaded: {e}")
             from .saga_orchestrator_fixed import BookingOrchestrator
             saga_orchestrator = BookingOrchestrator()
             logger.info("[SAGA] Orchestrator initialized successfully")
@@ -206,21 +259,10 @@ def start_booking_saga(request):
             # Update booking data with correlation ID
             booking_data['correlation_id'] = saga_transaction.correlation_id
             
-            # Start SAGA process
+            # Start SAGA process; the orchestrator records each step and the
+            # final status on the transaction row
             result = orchestrator.start_booking_saga(booking_data)
             
-            # Update SAGA transaction status based on result
-            if result.get('success'):
-                saga_transaction.status = 'COMPLETED'
-                saga_transaction.steps_completed = result.get('steps_completed', 0)
-            else:
-                saga_transaction.status = 'FAILED'
-                saga_transaction.failed_step = result.get('failed_step')
-                saga_transaction.error_message = result.get('error')
-                saga_transaction.compensation_executed = bool(result.get('compensation_result'))
-            
-            saga_transaction.save()
-            
             return JsonResponse(result)
             
         except Exception as e:
@@ -239,6 +281,7 @@ def start_booking_saga(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent_step("ReserveSeat")
 def reserve_seat(request):
     """SAGA Step 1: Reserve seat for booking"""
     try:
@@ -291,6 +334,9 @@ def reserve_seat(request):
                 "success": True,
                 "correlation_id": correlation_id,
                 "reservation_id": reservation.id,
+                "seat_numbers": reservation.seat_numbers,
+                "seat_map": seat_maps.serialize(reservation.seat_map) if reservation.seat_map_id else None,
+                "departure_date": reservation.departure_date.isoformat() if reservation.departure_date else None,
                 "message": "Seat reserved successfully in database"
             })
         except Exception as e:
@@ -309,6 +355,7 @@ def reserve_seat(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent_step("ConfirmBooking")
 def confirm_booking(request):
     """SAGA Step 4: Confirm booking and create proper Ticket record"""
     try:
@@ -368,30 +415,15 @@ def confirm_booking(request):
         from datetime import datetime, timedelta, time
         booking_date = timezone.now()
         
-        # Get actual flight departure date from flight schedule
-        # Business Rule: Use flight's actual schedule, not arbitrary dates
-        if hasattr(flight, 'depart_day') and flight.depart_day.exists():
-            # Find next occurrence of flight's scheduled day
-            today_weekday = booking_date.weekday()  # 0=Monday, 6=Sunday
-            flight_days = [day.number for day in flight.depart_day.all()]
-            
-            # Find next available flight day (minimum 2 hours advance booking)
-            days_ahead = 1
-            for i in range(7):  # Check next 7 days
-                check_date = booking_date + timedelta(days=i)
-                check_weekday = check_date.weekday()
-                
-                # Check if flight operates on this day and booking is at least 2 hours in advance
-                if check_weekday in flight_days:
-                    flight_datetime = timezone.make_aware(datetime.combine(check_date.date(), flight.depart_time))
-                    if flight_datetime > booking_date + timedelta(hours=2):
-                        days_ahead = i
-                        break
-            
-            flight_ddate = (booking_date + timedelta(days=days_ahead)).date()
+        # Issue the ticket for the departure the seats were held on at ReserveSeat;
+        # recomputing it here would move the booking to the next departure whenever
+        # the schedule rolls over between the two steps
+        reservation = SeatReservation.objects.filter(correlation_id=correlation_id).first()
+        if reservation is not None and reservation.departure_date:
+            flight_ddate = reservation.departure_date
         else:
-            # Fallback: Next day if no schedule defined
-            flight_ddate = (booking_date + timedelta(days=1)).date()
+            # Business Rule: Use flight's actual schedule, not arbitrary dates
+            flight_ddate = next_departure_date(flight, booking_date)
         
         # Calculate arrival date based on flight duration
         if flight.duration:
@@ -434,7 +466,7 @@ def confirm_booking(request):
                 "error": "At least one passenger is required"
             })
         
-        passenger_objects = []
+        passenger_fields = []
         for i, passenger_data in enumerate(passengers_data):
             # Business validation for passenger data
             first_name = passenger_data.get('first_name', '').strip()
@@ -446,12 +478,11 @@ def confirm_booking(request):
                     "error": f"Passenger {i+1}: First name and last name are required"
                 })
             
-            passenger = Passenger.objects.create(
-                first_name=first_name,
-                last_name=last_name,
-                gender=passenger_data.get('gender', 'male')
-            )
-            passenger_objects.append(passenger)
+            passenger_fields.append({
+                'first_name': first_name,
+                'last_name': last_name,
+                'gender': passenger_data.get('gender', 'male')
+            })
         
         # Calculate business-appropriate pricing
         contact_info = booking_data.get('contact_info', {})
@@ -467,7 +498,7 @@ def confirm_booking(request):
             seat_class = 'economy'  # Default to economy if class not available
         
         # Calculate total fare with business charges
-        passenger_count = len(passenger_objects)
+        passenger_count = len(passenger_fields)
         flight_fare = base_fare * passenger_count
         
         # Business charges (taxes, fees, etc.)
@@ -492,25 +523,35 @@ def confirm_booking(request):
                 "error": "Valid mobile number is required"
             })
         
-        # Create proper Ticket record with business validation
-        ticket = Ticket.objects.create(
-            user=user,  # Proper user association
-            ref_no=ref_no,
-            flight=flight,
-            flight_ddate=flight_ddate,
-            flight_adate=flight_adate,
-            flight_fare=flight_fare,
-            other_charges=other_charges,
-            total_fare=total_fare,
-            seat_class=seat_class,
-            booking_date=booking_date,
-            mobile=mobile,
-            email=email,
-            status='CONFIRMED'
-        )
+        def write_ticket():
+            # The ticket insert comes first so the transaction takes SQLite's write lock
+            # straight away; one that read first is refused when another writer is active
+            with transaction.atomic():
+                # Create proper Ticket record with business validation
+                ticket = Ticket.objects.create(
+                    user=user,  # Proper user association
+                    ref_no=ref_no,
+                    flight=flight,
+                    flight_ddate=flight_ddate,
+                    flight_adate=flight_adate,
+                    flight_fare=flight_fare,
+                    other_charges=other_charges,
+                    total_fare=total_fare,
+                    seat_class=seat_class,
+                    booking_date=booking_date,
+                    mobile=mobile,
+                    email=email,
+                    status='CONFIRMED'
+                )
+                
+                # Add passengers to ticket
+                ticket.passengers.set([Passenger.objects.create(**fields) for fields in passenger_fields])
+                
+                # The held seats now belong to the ticket; keeps the expiry sweeper off them
+                SeatReservation.objects.filter(correlation_id=correlation_id, status='RESERVED').update(status='CONFIRMED')
+            return ticket
         
-        # Add passengers to ticket
-        ticket.passengers.set(passenger_objects)
+        ticket = retry_when_locked(write_ticket)
         
         # Calculate cancellation policy (business rule)
         cancellation_deadline = flight_datetime - timedelta(hours=24)  # 24 hours before flight
@@ -551,6 +592,7 @@ def confirm_booking(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent_step("CancelSeat")
 def cancel_seat(request):
     """SAGA Compensation: Cancel seat reservation"""
     try:
@@ -612,6 +654,7 @@ def cancel_seat(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent_step("CancelBooking")
 def cancel_booking(request):
     """SAGA Compensation: Cancel booking"""
     try:
@@ -700,6 +743,34 @@ def get_saga_logs(request, correlation_id):
             "error": str(e)
         })
 
+@require_http_methods(["GET"])
+def stream_saga_logs(request, correlation_id):
+    """Stream new SAGA log entries and status changes as Server-Sent Events"""
+    # EventSource resends the last event id on reconnect; ?after= is for other clients
+    try:
+        after = max(int(request.headers.get('Last-Event-ID') or request.GET.get('after') or 0), 0)
+    except ValueError:
+        return JsonResponse({
+            "success": False,
+            "error": "after must be an integer"
+        }, status=400)
+    
+    stream = saga_stream_slots.open_stream(correlation_id, after)
+    if stream is None:
+        logger.warning(f"[SAGA STREAM] Refusing stream for {correlation_id}: {saga_stream_slots.limit} streams open")
+        response = JsonResponse({
+            "success": False,
+            "error": "Too many open SAGA streams, please retry shortly"
+        }, status=503)
+        response['Retry-After'] = str(STREAM_RETRY_AFTER_SECONDS)
+        return response
+    
+    logger.info(f"[SAGA STREAM] Streaming {correlation_id} after {after} entries")
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def demo_saga_failure(request):
@@ -840,7 +911,36 @@ def start_booking_saga_async(request):
         correlation_id = str(uuid.uuid4())
         logger.info(f"[SAGA ASYNC] Generated correlation_id: {correlation_id}")
         
+        booking_data = {
+            'flight_id': flight_id,
+            'user_id': data.get('user_id', 1),
+            'passengers': passengers,
+            'contact_info': contact_info,
+            'flight_fare': float(flight.economy_fare),
+            'correlation_id': correlation_id,
+            'simulate_reserveseat_fail': data.get('simulate_reserveseat_fail', False),
+            'simulate_authorizepayment_fail': data.get('simulate_authorizepayment_fail', False),
+            'simulate_awardmiles_fail': data.get('simulate_awardmiles_fail', False),
+            'simulate_confirmbooking_fail': data.get('simulate_confirmbooking_fail', False)
+        }
+        
+        accepted_at = timezone.now()
+        
+        # Bounded worker pool: a full queue is answered now instead of
+        # piling up threads and DB connections
+        try:
+            saga_worker_pool.enqueue(booking_data, correlation_id)
+        except SagaQueueFull as e:
+            response = JsonResponse({
+                'success': False,
+                'error': 'Booking service is busy, please retry shortly',
+                'queue_depth': e.depth
+            }, status=503)
+            response['Retry-After'] = str(RETRY_AFTER_SECONDS)
+            return response
+        
         # CRITICAL FIX: Create initial log entry immediately so UI sees logs right away
+        # (stamped before enqueue so it sorts ahead of the worker's entries)
         try:
             saga_log_storage.add_log(
                 correlation_id=correlation_id,
@@ -848,7 +948,8 @@ def start_booking_saga_async(request):
                 service="SAGA BACKEND",
                 log_level="info",
                 message=f"🚀 Async SAGA accepted for correlation_id: {correlation_id}",
-                is_compensation=False
+                is_compensation=False,
+                timestamp=accepted_at
             )
             logger.info(f"[SAGA ASYNC] Initial log entry created for {correlation_id}")
         except Exception as e:
@@ -857,33 +958,6 @@ def start_booking_saga_async(request):
         # Return 202 Accepted immediately with correlation_id
         logger.info(f"[SAGA ASYNC] Returning 202 Accepted immediately for correlation_id: {correlation_id}")
         
-        # Start background SAGA (simplified for immediate response)
-        def run_saga_background():
-            try:
-                orchestrator = get_orchestrator()
-                if orchestrator:
-                    booking_data = {
-                        'flight_id': flight_id,
-                        'user_id': data.get('user_id', 1),
-                        'passengers': passengers,
-                        'contact_info': contact_info,
-                        'flight_fare': float(flight.economy_fare),
-                        'correlation_id': correlation_id,
-                        'simulate_reserveseat_fail': data.get('simulate_reserveseat_fail', False),
-                        'simulate_authorizepayment_fail': data.get('simulate_authorizepayment_fail', False),
-                        'simulate_awardmiles_fail': data.get('simulate_awardmiles_fail', False),
-                        'simulate_confirmbooking_fail': data.get('simulate_confirmbooking_fail', False)
-                    }
-                    result = orchestrator.start_booking_saga(booking_data)
-                    logger.info(f"[SAGA ASYNC] Background SAGA completed: {result.get('success')}")
-            except Exception as e:
-                logger.error(f"[SAGA ASYNC] Background SAGA error: {e}")
-        
-        # Start background thread
-        thread = threading.Thread(target=run_saga_background)
-        thread.daemon = True
-        thread.start()
-        
         return JsonResponse({
             'accepted': True,
             'correlation_id': correlation_id,
@@ -895,4 +969,43 @@ def start_booking_saga_async(request):
         return JsonResponse({
             'success': False,
             'error': str(e)
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+@require_http_methods(["GET"])
+def get_saga_queue_stats(request):
+    """Saga queue depth, worker pool, crash recovery, reservation sweeper and log stream counters"""
+    try:
+        return JsonResponse({
+            **saga_worker_pool.stats(),
+            'recovery': saga_recovery_worker.stats(),
+            'reservations': reservation_sweeper.stats(),
+            'streams': saga_stream_slots.stats()
+        })
+    except Exception as e:
+        logger.error(f"[SAGA QUEUE] Error reading queue stats: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def get_saga_metrics(request):
+    """Saga step and compensation latency histograms, outcome counters and in-flight gauges for Prometheus"""
+    try:
+        return HttpResponse(saga_metrics.render(), content_type=METRICS_CONTENT_TYPE)
+    except Exception as e:
+        logger.error(f"[SAGA METRICS] Error rendering metrics: {e}")
+        return HttpResponse(f"# error: {e}\n", status=500, content_type=METRICS_CONTENT_TYPE)
+
+
+@require_http_methods(["GET"])
+def get_saga_breakers(request):
+    """Circuit breaker state, latency percentiles and current timeout per SAGA service"""
+    try:
+        services = saga_breakers.snapshot()
+        return JsonResponse({
+            'services': services,
+            'open': [service['service'] for service in services if service['state'] != 'CLOSED']
+        })
+    except Exception as e:
+        logger.error(f"[SAGA BREAKER] Error reading breaker state: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
@@ -0,0 +1,121 @@
+"""
+Seat Inventory Counters
+Seats left per flight, departure date and class, held and released with conditional updates
+"""
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Tuple
+
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Flight, Seat, SeatInventory
+from .seat_map import seat_maps
+
+logger = logging.getLogger(__name__)
+
+# Bookings close this long before departure
+MIN_ADVANCE = timedelta(hours=2)
+
+
+class SeatsUnavailable(Exception):
+    """Raised when a flight has fewer seats left in a class than a booking needs"""
+
+    def __init__(self, flight_id: int, departure_date: date, seat_class: str, requested: int):
+        super().__init__(f"Not enough {seat_class} seats left on flight {flight_id} for {departure_date} ({requested} requested)")
+        self.flight_id = flight_id
+        self.departure_date = departure_date
+        self.seat_class = seat_class
+        self.requested = requested
+
+
+def next_departure_date(flight: Flight, now: datetime) -> date:
+    """First date the flight operates on that is still bookable at `now`"""
+    if flight.operating_days:
+        # Find next available flight day (minimum 2 hours advance booking)
+        days_ahead = 1
+        for i in range(7):
+            check_date = now + timedelta(days=i)
+            if flight.operates_on(check_date.weekday()):
+                flight_datetime = timezone.make_aware(datetime.combine(check_date.date(), flight.depart_time))
+                if flight_datetime > now + MIN_ADVANCE:
+                    days_ahead = i
+                    break
+        return (now + timedelta(days=days_ahead)).date()
+    # Fallback: Next day if no schedule defined
+    return (now + timedelta(days=1)).date()
+
+
+class SeatInventoryCounters:
+    """
+    One counter row per (flight, departure date, seat class).
+
+    A hold is a single `UPDATE ... SET remaining = remaining - n WHERE
+    remaining >= n`, so concurrent SAGAs on the same flight never oversell
+    and never scan Seat rows; whoever finds too few seats left gets
+    SeatsUnavailable. A release adds the seats back. Rows are created on
+    first use with the capacity of the flight's Seat rows, or that of
+    its plane's seat layout when it has none, and their ids are cached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: Dict[Tuple[int, date, str], int] = {}
+
+    def inventory_id(self, flight: Flight, departure_date: date, seat_class: str) -> int:
+        key = (flight.id, departure_date, seat_class)
+        inventory_id = self._ids.get(key)
+        if inventory_id is None:
+            capacity = self.capacity(flight, seat_class)
+            inventory, _ = SeatInventory.objects.get_or_create(
+                flight=flight, departure_date=departure_date, seat_class=seat_class,
+                defaults={'capacity': capacity, 'remaining': capacity}
+            )
+            inventory_id = inventory.id
+            with self._lock:
+                self._ids[key] = inventory_id
+        return inventory_id
+
+    @staticmethod
+    def capacity(flight: Flight, seat_class: str) -> int:
+        seats = Seat.objects.filter(flight=flight).aggregate(
+            total=Count('id'), in_class=Count('id', filter=Q(seat_class=seat_class))
+        )
+        if seats['total']:
+            return seats['in_class']
+        return seat_maps.layout(flight.plane).capacity(seat_class)
+
+    def hold(self, flight: Flight, departure_date: date, seat_class: str, count: int) -> int:
+        """Take `count` seats; returns the inventory id to release them with"""
+        inventory_id = self.inventory_id(flight, departure_date, seat_class)
+        held = self._take(inventory_id, count)
+        if not held and not SeatInventory.objects.filter(id=inventory_id).exists():
+            # The cached row was deleted with its flight's inventory; start a new one
+            with self._lock:
+                self._ids.pop((flight.id, departure_date, seat_class), None)
+            inventory_id = self.inventory_id(flight, departure_date, seat_class)
+            held = self._take(inventory_id, count)
+        if not held:
+            logger.warning(f"[SEAT INVENTORY] Flight {flight.id} {departure_date} {seat_class} cannot hold {count} seats")
+            raise SeatsUnavailable(flight.id, departure_date, seat_class, count)
+        return inventory_id
+
+    @staticmethod
+    def _take(inventory_id: int, count: int) -> bool:
+        return SeatInventory.objects.filter(id=inventory_id, remaining__gte=count).update(
+            remaining=F('remaining') - count
+        ) > 0
+
+    @staticmethod
+    def release(inventory_id: int, count: int):
+        if count:
+            SeatInventory.objects.filter(id=inventory_id).update(remaining=F('remaining') + count)
+
+    def clear_cache(self):
+        with self._lock:
+            self._ids = {}
+
+
+# Global instance
+seat_inventory = SeatInventoryCounters()
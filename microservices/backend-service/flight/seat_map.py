@@ -0,0 +1,247 @@
+"""
+Seat Maps
+Seat availability per flight departure and cabin as a packed bitmap over the plane's seat layout
+"""
+import base64
+import logging
+import threading
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import Flight, SeatMap
+
+logger = logging.getLogger(__name__)
+
+# Cabins per plane type as (seat class, first row, last row, seat letters with '-' at each aisle);
+# 'default' is the cabin plan create_flight_seats builds, and a plane without one of its cabins gets the default's
+SEAT_LAYOUTS = getattr(settings, 'SEAT_LAYOUTS', {
+    'default': [('first', 1, 2, 'ABC-DEF'), ('business', 3, 3, 'ABC-DEF'), ('economy', 4, 27, 'ABC-DEF')],
+    'A321': [('first', 1, 5, 'AC-DF'), ('business', 6, 7, 'ABC-DEF'), ('economy', 8, 33, 'ABC-DEF')],
+    'Boeing 737-800': [('first', 1, 4, 'AC-DF'), ('business', 5, 6, 'ABC-DEF'), ('economy', 7, 30, 'ABC-DEF')],
+})
+
+# Compare-and-swap attempts before an allocation gives up on a busy seat map
+MAX_ATTEMPTS = 10
+
+
+def _unpack(occupied) -> int:
+    return int.from_bytes(bytes(occupied), 'little')
+
+
+def _pack(bits: int, size: int) -> bytes:
+    return bits.to_bytes((size + 7) // 8, 'little')
+
+
+def _count(bits: int) -> int:
+    return bin(bits).count('1')
+
+
+class CabinLayout:
+    """
+    Seat order of one cabin.
+
+    Bit i of a cabin bitmap is seats[i], numbered row by row and left to
+    right, so the seats between two aisles are consecutive bits and a
+    search for adjacent seats is a few shifts and ands over the whole cabin.
+    """
+
+    def __init__(self, seat_class: str, first_row: int, last_row: int, letters: str):
+        self.seat_class = seat_class
+        self.first_row = first_row
+        self.last_row = last_row
+        self.letters = letters
+        self.seats: List[str] = []
+        self._blocks: List[Tuple[int, int]] = []
+        blocks = letters.split('-')
+        for row in range(first_row, last_row + 1):
+            for number, block in enumerate(blocks):
+                for letter in block:
+                    self.seats.append(f"{row}{letter}")
+                    self._blocks.append((row, number))
+        self.index = {seat: i for i, seat in enumerate(self.seats)}
+        self.size = len(self.seats)
+        self.all_seats = (1 << self.size) - 1
+        self.widest_block = max(len(block) for block in blocks)
+        self._run_starts: Dict[int, int] = {}
+
+    def run_starts(self, count: int) -> int:
+        """Bits of the seats that have `count - 1` more seats after them before the next aisle"""
+        mask = self._run_starts.get(count)
+        if mask is None:
+            mask = 0
+            for i in range(self.size - count + 1):
+                if self._blocks[i] == self._blocks[i + count - 1]:
+                    mask |= 1 << i
+            self._run_starts[count] = mask
+        return mask
+
+    def find_adjacent(self, occupied: int, count: int) -> Optional[int]:
+        """Bits of the first `count` free seats side by side, or None"""
+        if count < 1 or count > self.widest_block:
+            return None
+        free = ~occupied & self.all_seats
+        starts = free & self.run_starts(count)
+        for shift in range(1, count):
+            starts &= free >> shift
+        if not starts:
+            return None
+        return ((1 << count) - 1) << ((starts & -starts).bit_length() - 1)
+
+    def find_free(self, occupied: int, count: int) -> Optional[int]:
+        """Bits of the first `count` free seats anywhere in the cabin, or None"""
+        free = ~occupied & self.all_seats
+        if _count(free) < count:
+            return None
+        picked = 0
+        for _ in range(count):
+            lowest = free & -free
+            picked |= lowest
+            free ^= lowest
+        return picked
+
+    def mask(self, seats: Iterable[str]) -> int:
+        bits = 0
+        for seat in seats:
+            if seat in self.index:
+                bits |= 1 << self.index[seat]
+        return bits
+
+    def labels(self, bits: int) -> List[str]:
+        return [seat for i, seat in enumerate(self.seats) if bits >> i & 1]
+
+
+class SeatLayout:
+    """Cabins of one plane type"""
+
+    def __init__(self, name: str, cabins: List[Tuple[str, int, int, str]]):
+        self.name = name
+        self.cabins = {cabin[0]: CabinLayout(*cabin) for cabin in cabins}
+
+    def cabin(self, seat_class: str) -> Optional[CabinLayout]:
+        return self.cabins.get(seat_class)
+
+    def capacity(self, seat_class: str) -> int:
+        cabin = self.cabins.get(seat_class)
+        return cabin.size if cabin else 0
+
+
+class SeatMapStore:
+    """
+    One bitmap row per (flight, departure date, seat class).
+
+    Allocating reads the row, picks seats with bit operations and writes the
+    new bitmap back with an update conditional on the version it read, so
+    two SAGAs can never be given the same seat; the loser re-reads and picks
+    again. A party is seated side by side within an aisle block when one has
+    room and otherwise on the first free seats. Releases retry until they
+    land, since every conflict means another change went through. Which
+    seats exist comes from SEAT_LAYOUTS by the flight's plane, with the
+    default layout's cabin for any class the plane's layout leaves out, and
+    each map keeps the key of the layout it was created with.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._layouts: Dict[str, SeatLayout] = {}
+        self.conflicts = 0
+
+    def layout(self, plane: str) -> SeatLayout:
+        name = plane if plane in SEAT_LAYOUTS else 'default'
+        layout = self._layouts.get(name)
+        if layout is None:
+            cabins = {cabin[0]: cabin for cabin in SEAT_LAYOUTS['default']}
+            cabins.update((cabin[0], cabin) for cabin in SEAT_LAYOUTS[name])
+            layout = SeatLayout(name, list(cabins.values()))
+            with self._lock:
+                self._layouts[name] = layout
+        return layout
+
+    def seat_map(self, flight: Flight, departure_date: date, seat_class: str) -> Optional[SeatMap]:
+        """The cabin's seat map, created empty on first use; None if the plane has no such cabin"""
+        layout = self.layout(flight.plane)
+        cabin = layout.cabin(seat_class)
+        if cabin is None:
+            return None
+        seat_map, _ = SeatMap.objects.get_or_create(
+            flight=flight, departure_date=departure_date, seat_class=seat_class,
+            defaults={'layout': layout.name, 'occupied': _pack(0, cabin.size)}
+        )
+        return seat_map
+
+    def allocate(self, flight: Flight, departure_date: date, seat_class: str,
+                 count: int) -> Tuple[Optional[SeatMap], List[str]]:
+        """Assign `count` seats; returns the seat map and seat numbers, or no seats if none could be assigned"""
+        for _ in range(MAX_ATTEMPTS):
+            seat_map = self.seat_map(flight, departure_date, seat_class)
+            if seat_map is None:
+                return None, []
+            cabin = self.layout(seat_map.layout).cabin(seat_class)
+            occupied = _unpack(seat_map.occupied)
+            picked = cabin.find_adjacent(occupied, count) or cabin.find_free(occupied, count)
+            if picked is None:
+                logger.warning(f"[SEAT MAP] Flight {flight.id} {departure_date} {seat_class} has no {count} free seats to assign")
+                return seat_map, []
+            if self._swap(seat_map, occupied | picked, cabin.size):
+                return seat_map, cabin.labels(picked)
+        logger.warning(f"[SEAT MAP] Flight {flight.id} {departure_date} {seat_class} too busy to assign {count} seats")
+        return None, []
+
+    def release(self, seat_map_id: int, seats: Iterable[str]):
+        seats = list(seats)
+        while seats:
+            seat_map = SeatMap.objects.filter(id=seat_map_id).first()
+            if seat_map is None:
+                return
+            cabin = self.layout(seat_map.layout).cabin(seat_map.seat_class)
+            occupied = _unpack(seat_map.occupied)
+            if self._swap(seat_map, occupied & ~cabin.mask(seats), cabin.size):
+                return
+
+    def _swap(self, seat_map: SeatMap, bits: int, size: int) -> bool:
+        occupied = _pack(bits, size)
+        swapped = SeatMap.objects.filter(id=seat_map.id, version=seat_map.version).update(
+            occupied=occupied, version=F('version') + 1
+        ) > 0
+        if swapped:
+            seat_map.occupied = occupied
+            seat_map.version += 1
+        else:
+            with self._lock:
+                self.conflicts += 1
+        return swapped
+
+    def snapshot(self, flight: Flight, departure_date: date, seat_class: str) -> Optional[Dict[str, Any]]:
+        """Serialized seat map of a cabin, all free if nothing was assigned yet; None if the plane has no such cabin"""
+        seat_map = SeatMap.objects.filter(flight=flight, departure_date=departure_date, seat_class=seat_class).first()
+        if seat_map is None:
+            layout = self.layout(flight.plane)
+            cabin = layout.cabin(seat_class)
+            if cabin is None:
+                return None
+            seat_map = SeatMap(flight=flight, departure_date=departure_date, seat_class=seat_class,
+                               layout=layout.name, occupied=_pack(0, cabin.size))
+        return self.serialize(seat_map)
+
+    def serialize(self, seat_map: SeatMap) -> Dict[str, Any]:
+        """Compact form of a seat map: the cabin plan and the bitmap in base64"""
+        cabin = self.layout(seat_map.layout).cabin(seat_map.seat_class)
+        occupied = _unpack(seat_map.occupied)
+        return {
+            'flight_id': seat_map.flight_id,
+            'departure_date': seat_map.departure_date.isoformat(),
+            'seat_class': seat_map.seat_class,
+            'layout': seat_map.layout,
+            'rows': [cabin.first_row, cabin.last_row],
+            'letters': cabin.letters,
+            'seats': cabin.size,
+            'available': cabin.size - _count(occupied),
+            'occupied': base64.b64encode(_pack(occupied, cabin.size)).decode('ascii'),
+            'version': seat_map.version
+        }
+
+
+# Global instance
+seat_maps = SeatMapStore()
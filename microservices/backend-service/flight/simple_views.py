@@ -1,19 +1,47 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-from django.db.models import Q
-from datetime import datetime
+from django.views.decorators.http import require_http_methods, etag
+from django.utils import timezone
+from datetime import datetime, date, timedelta
 import json
 import uuid
 
-from .models import Place, Flight, Week
+from .models import Flight
+from .route_index import route_index, SEAT_CLASSES, DEFAULT_AIRLINE_CODES
+from .flight_payloads import copy_payload, flight_payloads, serialize_tickets
+from .place_index import place_index
+from .fare_calendar import fare_calendar, FARE_CALENDAR_DAYS
+from .flight_etags import flight_data_etag
+from .seat_map import seat_maps
+from .seat_inventory import next_departure_date
+from .connections import connection_graph, SORT_KEYS, DEFAULT_MIN_LAYOVER, DEFAULT_MAX_LAYOVER, MAX_LAYOVER_LIMIT
 
 # Simple in-memory storage for demo purposes
 # In production, this would be a database
 stored_tickets = {}
 
 
+def price_range(flights_data, seat_class):
+    """Min/max fare of a fare-sorted flight list"""
+    if not flights_data:
+        return {'min': 0, 'max': 0}
+    fare_field = f'{seat_class}_fare'
+    return {'min': flights_data[0][fare_field], 'max': flights_data[-1][fare_field]}
+
+
+def parse_airline_codes(request):
+    """Airline codes from a comma-separated `airlines` parameter, or None if malformed"""
+    value = request.GET.get('airlines', '')
+    if not value.strip():
+        return list(DEFAULT_AIRLINE_CODES)
+    codes = [code.strip().upper() for code in value.split(',') if code.strip()]
+    if any(len(code) not in (2, 3) or not code.isalnum() for code in codes):
+        return None
+    return list(dict.fromkeys(codes))
+
+
 @require_http_methods(["GET"])
+@etag(flight_data_etag)
 def flight_search(request):
     """Simple flight search API without DRF"""
     try:
@@ -22,86 +50,77 @@ def flight_search(request):
         destination_code = request.GET.get('destination', '').upper()
         depart_date_str = request.GET.get('depart_date', '')
         seat_class = request.GET.get('seat_class', 'economy')
+        trip_type = request.GET.get('trip_type', '1')
+        return_date_str = request.GET.get('return_date', '')
+        airline_codes = parse_airline_codes(request)
         
-        print(f"[DEBUG] Flight search params: origin={origin_code}, dest={destination_code}, date={depart_date_str}, class={seat_class}")
+        print(f"[DEBUG] Flight search params: origin={origin_code}, dest={destination_code}, date={depart_date_str}, class={seat_class}, trip_type={trip_type}, return={return_date_str}, airlines={airline_codes}")
         
         # Basic validation
         if not origin_code or not destination_code or not depart_date_str:
             return JsonResponse({'error': 'Missing required parameters'}, status=400)
+        if airline_codes is None:
+            return JsonResponse({'error': 'airlines must be comma-separated IATA airline codes'}, status=400)
+        if seat_class not in SEAT_CLASSES:
+            return JsonResponse({'error': f'seat_class must be one of {", ".join(SEAT_CLASSES)}'}, status=400)
         
         # Parse date
-        depart_date = datetime.strptime(depart_date_str, '%Y-%m-%d').date()
-        
-        # Get places
         try:
-            origin = Place.objects.get(code=origin_code)
-            destination = Place.objects.get(code=destination_code)
-        except Place.DoesNotExist:
+            depart_date = datetime.strptime(depart_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return JsonResponse({'error': 'Invalid depart_date'}, status=400)
+        
+        # Resolve places and weekday from the in-memory route index
+        origin = route_index.get_place(origin_code)
+        destination = route_index.get_place(destination_code)
+        if origin is None or destination is None:
             return JsonResponse({'error': 'Invalid origin or destination'}, status=400)
         
-        # Get flight day
-        try:
-            flight_day = Week.objects.get(number=depart_date.weekday())
-        except Week.DoesNotExist:
+        if not route_index.has_weekday(depart_date.weekday()):
             return JsonResponse({'error': 'Invalid date'}, status=400)
         
-        # Search flights - limit to American Airlines only
-        flights = Flight.objects.filter(
-            origin=origin,
-            destination=destination,
-            depart_day=flight_day,
-            airline__icontains='American Airlines'
-        )
+        # Pre-sorted, pre-serialized flights for this route/day/class, merged across the requested carriers
+        flights_data = route_index.lookup(origin_code, destination_code, depart_date.weekday(), seat_class, airline_codes)
         
-        # Filter by seat class
-        if seat_class == 'economy':
-            flights = flights.exclude(economy_fare=0).order_by('economy_fare')
-        elif seat_class == 'business':
-            flights = flights.exclude(business_fare=0).order_by('business_fare')
-        elif seat_class == 'first':
-            flights = flights.exclude(first_fare=0).order_by('first_fare')
+        response_data = {
+            'flights': flights_data,
+            'origin': origin,
+            'destination': destination,
+            'depart_date': str(depart_date),
+            'seat_class': seat_class,
+            'trip_type': trip_type,
+            'airlines': airline_codes,
+            'price_summary': {'outbound': price_range(flights_data, seat_class)}
+        }
         
-        # Convert to JSON
-        flights_data = []
-        for flight in flights:
-            flights_data.append({
-                'id': flight.id,
-                'plane': flight.plane,
-                'airline': flight.airline,
-                'flight_number': flight.flight_number,  # Added flight number
-                'origin': {
-                    'code': flight.origin.code,
-                    'city': flight.origin.city,
-                    'airport': flight.origin.airport
-                },
-                'destination': {
-                    'code': flight.destination.code,
-                    'city': flight.destination.city,
-                    'airport': flight.destination.airport
-                },
-                'depart_time': str(flight.depart_time),
-                'arrival_time': str(flight.arrival_time),
-                'economy_fare': float(flight.economy_fare),
-                'business_fare': float(flight.business_fare),
-                'first_fare': float(flight.first_fare),
-                'duration': str(flight.duration)
+        # Round trip: the return leg is the reversed route, answered in the same call
+        if trip_type == '2':
+            if not return_date_str:
+                return JsonResponse({'error': 'Missing return_date for round trip'}, status=400)
+            try:
+                return_date = datetime.strptime(return_date_str, '%Y-%m-%d').date()
+            except ValueError:
+                return JsonResponse({'error': 'Invalid return_date'}, status=400)
+            if not route_index.has_weekday(return_date.weekday()):
+                return JsonResponse({'error': 'Invalid return date'}, status=400)
+            
+            return_flights = route_index.lookup(destination_code, origin_code, return_date.weekday(), seat_class, airline_codes)
+            outbound_range = response_data['price_summary']['outbound']
+            return_range = price_range(return_flights, seat_class)
+            
+            response_data.update({
+                'return_flights': return_flights,
+                'return_date': str(return_date),
+                'return_origin': destination,
+                'return_destination': origin
+            })
+            response_data['price_summary'].update({
+                'return': return_range,
+                'min_total': outbound_range['min'] + return_range['min'] if outbound_range['min'] and return_range['min'] else 0,
+                'max_total': outbound_range['max'] + return_range['max'] if outbound_range['max'] and return_range['max'] else 0
             })
         
-        return JsonResponse({
-            'flights': flights_data,
-            'origin': {
-                'code': origin.code,
-                'city': origin.city,
-                'airport': origin.airport
-            },
-            'destination': {
-                'code': destination.code,
-                'city': destination.city,
-                'airport': destination.airport
-            },
-            'depart_date': str(depart_date),
-            'seat_class': seat_class
-        })
+        return JsonResponse(response_data)
         
     except Exception as e:
         print(f"[ERROR] Flight search exception: {e}")
@@ -110,6 +129,183 @@ def flight_search(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+# Largest +/- window accepted by the flexible date search
+MAX_FLEX_DAYS = 15
+
+
+@require_http_methods(["GET"])
+def flight_search_flex(request):
+    """Cheapest fare per day and seat class for a route over a +/- N day window"""
+    try:
+        origin_code = request.GET.get('origin', '').upper()
+        destination_code = request.GET.get('destination', '').upper()
+        depart_date_str = request.GET.get('depart_date', '')
+        airline_codes = parse_airline_codes(request)
+        
+        if not origin_code or not destination_code or not depart_date_str:
+            return JsonResponse({'error': 'Missing required parameters'}, status=400)
+        if airline_codes is None:
+            return JsonResponse({'error': 'airlines must be comma-separated IATA airline codes'}, status=400)
+        
+        try:
+            depart_date = datetime.strptime(depart_date_str, '%Y-%m-%d').date()
+            days = int(request.GET.get('days', 3))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid depart_date or days'}, status=400)
+        
+        if days < 0 or days > MAX_FLEX_DAYS:
+            return JsonResponse({'error': f'days must be between 0 and {MAX_FLEX_DAYS}'}, status=400)
+        
+        origin = route_index.get_place(origin_code)
+        destination = route_index.get_place(destination_code)
+        if origin is None or destination is None:
+            return JsonResponse({'error': 'Invalid origin or destination'}, status=400)
+        
+        # One pass over the route: the schedule repeats weekly, so every date
+        # in the window maps onto one of seven precomputed weekday minimums
+        cheapest = route_index.cheapest_by_weekday(origin_code, destination_code, airline_codes)
+        
+        today = date.today()
+        calendar = []
+        overall = {}
+        for offset in range(-days, days + 1):
+            day = depart_date + timedelta(days=offset)
+            if day < today:
+                continue
+            fares = {}
+            for seat_class in SEAT_CLASSES:
+                flight = cheapest.get(day.weekday(), {}).get(seat_class)
+                if flight is None:
+                    fares[seat_class] = None
+                    continue
+                fare = flight[f'{seat_class}_fare']
+                fares[seat_class] = {
+                    'fare': fare,
+                    'flight_id': flight['id'],
+                    'flight_number': flight['flight_number']
+                }
+                best = overall.get(seat_class)
+                if best is None or fare < best['fare']:
+                    overall[seat_class] = {'date': str(day), 'fare': fare}
+            calendar.append({'date': str(day), 'weekday': day.weekday(), 'fares': fares})
+        
+        return JsonResponse({
+            'origin': origin,
+            'destination': destination,
+            'depart_date': str(depart_date),
+            'days': days,
+            'airlines': airline_codes,
+            'calendar': calendar,
+            'cheapest': overall
+        })
+        
+    except Exception as e:
+        print(f"[ERROR] Flexible flight search exception: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def fare_calendar_view(request):
+    """Lowest fare per day and seat class for a route across the bookable window"""
+    try:
+        origin_code = request.GET.get('origin', '').upper()
+        destination_code = request.GET.get('destination', '').upper()
+        
+        if not origin_code or not destination_code:
+            return JsonResponse({'error': 'Missing required parameters'}, status=400)
+        
+        today = date.today()
+        try:
+            start_date_str = request.GET.get('start_date')
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else today
+            days = int(request.GET.get('days', FARE_CALENDAR_DAYS))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid start_date or days'}, status=400)
+        
+        window_end = today + timedelta(days=FARE_CALENDAR_DAYS)
+        if start_date < today or start_date >= window_end:
+            return JsonResponse({'error': f'start_date must be within the next {FARE_CALENDAR_DAYS} days'}, status=400)
+        if days < 1:
+            return JsonResponse({'error': 'days must be positive'}, status=400)
+        days = min(days, (window_end - start_date).days)
+        
+        origin = route_index.get_place(origin_code)
+        destination = route_index.get_place(destination_code)
+        if origin is None or destination is None:
+            return JsonResponse({'error': 'Invalid origin or destination'}, status=400)
+        
+        calendar = fare_calendar.lowest_fares(origin_code, destination_code, start=start_date, days=days)
+        
+        cheapest = {}
+        for entry in calendar:
+            for seat_class, fare in entry['fares'].items():
+                if fare is not None and (seat_class not in cheapest or fare < cheapest[seat_class]['fare']):
+                    cheapest[seat_class] = {'date': entry['date'], 'fare': fare}
+        
+        return JsonResponse({
+            'origin': origin,
+            'destination': destination,
+            'start_date': str(start_date),
+            'days': days,
+            'calendar': calendar,
+            'cheapest': cheapest
+        })
+        
+    except Exception as e:
+        print(f"[ERROR] Fare calendar exception: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def flight_search_connections(request):
+    """One-stop connecting itineraries for a route without relying on a direct flight"""
+    try:
+        origin_code = request.GET.get('origin', '').upper()
+        destination_code = request.GET.get('destination', '').upper()
+        depart_date_str = request.GET.get('depart_date', '')
+        seat_class = request.GET.get('seat_class', 'economy')
+        sort = request.GET.get('sort', 'fare')
+        
+        if not origin_code or not destination_code or not depart_date_str:
+            return JsonResponse({'error': 'Missing required parameters'}, status=400)
+        
+        try:
+            depart_date = datetime.strptime(depart_date_str, '%Y-%m-%d').date()
+            min_layover = timedelta(minutes=int(request.GET.get('min_layover', DEFAULT_MIN_LAYOVER.total_seconds() // 60)))
+            max_layover = timedelta(minutes=int(request.GET.get('max_layover', DEFAULT_MAX_LAYOVER.total_seconds() // 60)))
+            limit = int(request.GET.get('limit', 20))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid depart_date, layover or limit'}, status=400)
+        
+        if seat_class not in SEAT_CLASSES or sort not in SORT_KEYS:
+            return JsonResponse({'error': f'seat_class must be one of {list(SEAT_CLASSES)} and sort one of {list(SORT_KEYS)}'}, status=400)
+        if min_layover < timedelta(0) or max_layover < min_layover or max_layover > MAX_LAYOVER_LIMIT:
+            return JsonResponse({'error': 'Layover window must satisfy 0 <= min_layover <= max_layover <= 1440 minutes'}, status=400)
+        
+        origin = route_index.get_place(origin_code)
+        destination = route_index.get_place(destination_code)
+        if origin is None or destination is None:
+            return JsonResponse({'error': 'Invalid origin or destination'}, status=400)
+        
+        itineraries = connection_graph.one_stop(
+            origin_code, destination_code, depart_date, seat_class,
+            min_layover=min_layover, max_layover=max_layover, sort=sort, limit=max(limit, 0)
+        )
+        
+        return JsonResponse({
+            'itineraries': itineraries,
+            'origin': origin,
+            'destination': destination,
+            'depart_date': str(depart_date),
+            'seat_class': seat_class,
+            'sort': sort
+        })
+        
+    except Exception as e:
+        print(f"[ERROR] Connection search exception: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def book_flight(request):
@@ -136,9 +332,8 @@ def book_flight(request):
             return JsonResponse({'error': 'Contact email and mobile are required'}, status=400)
         
         # Get flight details
-        try:
-            flight = Flight.objects.get(id=flight_id)
-        except Flight.DoesNotExist:
+        flight_data = flight_payloads.get(flight_id)
+        if flight_data is None:
             return JsonResponse({'error': 'Flight not found'}, status=404)
         
         # Validate passengers
@@ -151,30 +346,6 @@ def book_flight(request):
         # Generate booking reference
         booking_reference = f"BK{uuid.uuid4().hex[:8].upper()}"
         
-        # Prepare flight data for response
-        flight_data = {
-            'id': flight.id,
-            'plane': flight.plane,
-            'airline': flight.airline,
-            'flight_number': flight.flight_number,  # Added flight number
-            'origin': {
-                'code': flight.origin.code,
-                'city': flight.origin.city,
-                'airport': flight.origin.airport
-            },
-            'destination': {
-                'code': flight.destination.code,
-                'city': flight.destination.city,
-                'airport': flight.destination.airport
-            },
-            'depart_time': str(flight.depart_time),
-            'arrival_time': str(flight.arrival_time),
-            'economy_fare': float(flight.economy_fare),
-            'business_fare': float(flight.business_fare),
-            'first_fare': float(flight.first_fare),
-            'duration': str(flight.duration)
-        }
-        
         print(f"[DEBUG] Booking successful - Reference: {booking_reference}")
         
         # Store the ticket for later retrieval
@@ -187,7 +358,7 @@ def book_flight(request):
         # Create ticket record
         ticket_record = {
             'booking_reference': booking_reference,
-            'flight': flight_data,
+            'flight': copy_payload(flight_data),
             'passengers': passengers,
             'contact_info': contact_info,
             'booking_date': '2026-01-15',  # Simplified for demo
@@ -240,7 +411,7 @@ def get_user_tickets_with_saga(request, user_id):
         from .models import Ticket, SagaTransaction
         
         # Get stored tickets for the user (simple bookings)
-        user_tickets = stored_tickets.get(str(user_id), [])
+        user_tickets = list(stored_tickets.get(str(user_id), []))
         print(f"[DEBUG] SAGA FIX - Simple bookings for user {user_id}: {len(user_tickets)} tickets")
         
         # Get SAGA bookings from database
@@ -260,48 +431,10 @@ def get_user_tickets_with_saga(request, user_id):
                 # Also check for tickets that might have been created without user association
                 saga_tickets = Ticket.objects.filter(user__isnull=True)
             
-            print(f"[DEBUG] BOOKING DISPLAY FIX - Database tickets for user {user_id}: {len(saga_tickets)} tickets")
-            
             # Convert database tickets to the same format as simple tickets
-            for ticket in saga_tickets:
-                ticket_data = {
-                    'booking_reference': ticket.ref_no,
-                    'flight': {
-                        'id': ticket.flight.id,
-                        'plane': ticket.flight.plane,
-                        'airline': ticket.flight.airline,
-                        'flight_number': ticket.flight.flight_number,
-                        'origin': {
-                            'code': ticket.flight.origin.code,
-                            'city': ticket.flight.origin.city,
-                            'airport': ticket.flight.origin.airport
-                        },
-                        'destination': {
-                            'code': ticket.flight.destination.code,
-                            'city': ticket.flight.destination.city,
-                            'airport': ticket.flight.destination.airport
-                        },
-                        'depart_time': str(ticket.flight.depart_time),
-                        'arrival_time': str(ticket.flight.arrival_time),
-                        'economy_fare': float(ticket.flight.economy_fare),
-                        'business_fare': float(ticket.flight.business_fare),
-                        'first_fare': float(ticket.flight.first_fare),
-                    },
-                    'passengers': [
-                        {
-                            'first_name': p.first_name,
-                            'last_name': p.last_name,
-                            'gender': p.gender
-                        } for p in ticket.passengers.all()
-                    ],
-                    'contact_info': {
-                        'email': ticket.email,
-                        'mobile': ticket.mobile
-                    },
-                    'booking_date': ticket.booking_date.strftime('%Y-%m-%d'),
-                    'status': ticket.status.lower()
-                }
-                user_tickets.append(ticket_data)
+            saga_tickets_data = serialize_tickets(saga_tickets)
+            print(f"[DEBUG] BOOKING DISPLAY FIX - Database tickets for user {user_id}: {len(saga_tickets_data)} tickets")
+            user_tickets.extend(saga_tickets_data)
                 
         except Exception as db_error:
             print(f"[DEBUG] SAGA FIX - Database query error: {db_error}")
@@ -325,24 +458,19 @@ def places_search(request):
             # Return empty list if no query
             return JsonResponse([], safe=False)
         
-        # Search places by city, airport, code, or country
-        places = Place.objects.filter(
-            Q(city__icontains=query) |
-            Q(airport__icontains=query) |
-            Q(code__icontains=query) |
-            Q(country__icontains=query)
-        )[:10]  # Limit to 10 results
+        # Ranked autocomplete from the in-memory place index (exact code, code/city prefix, infix)
+        places = place_index.search(query, limit=10)
         
         # Convert to JSON
         places_data = []
         for place in places:
             places_data.append({
-                'id': place.id,
-                'city': place.city,
-                'airport': place.airport,
-                'code': place.code,
-                'country': place.country,
-                'display_name': f"{place.city}, {place.country} ({place.code})"
+                'id': place['id'],
+                'city': place['city'],
+                'airport': place['airport'],
+                'code': place['code'],
+                'country': place['country'],
+                'display_name': f"{place['city']}, {place['country']} ({place['code']})"
             })
         
         print(f"[DEBUG] Found {len(places_data)} places for query '{query}'")
@@ -362,43 +490,48 @@ def health_check(request):
 
 
 @require_http_methods(["GET"])
+@etag(flight_data_etag)
 def get_flight_detail(request, flight_id):
     """Get detailed information about a specific flight"""
     try:
-        flight = Flight.objects.get(id=flight_id)
-        
-        flight_data = {
-            'id': flight.id,
-            'plane': flight.plane,
-            'airline': flight.airline,
-            'flight_number': flight.flight_number,  # Added flight number
-            'origin': {
-                'code': flight.origin.code,
-                'city': flight.origin.city,
-                'airport': flight.origin.airport
-            },
-            'destination': {
-                'code': flight.destination.code,
-                'city': flight.destination.city,
-                'airport': flight.destination.airport
-            },
-            'depart_time': str(flight.depart_time),
-            'arrival_time': str(flight.arrival_time) if flight.arrival_time else '00:00:00',
-            'economy_fare': float(flight.economy_fare) if flight.economy_fare else 0.0,
-            'business_fare': float(flight.business_fare) if flight.business_fare else 0.0,
-            'first_fare': float(flight.first_fare) if flight.first_fare else 0.0,
-            'duration': str(flight.duration)
-        }
+        flight_data = flight_payloads.get(flight_id)
+        if flight_data is None:
+            return JsonResponse({'error': 'Flight not found'}, status=404)
         
         return JsonResponse(flight_data)
         
-    except Flight.DoesNotExist:
-        return JsonResponse({'error': 'Flight not found'}, status=404)
     except Exception as e:
         print(f"[ERROR] Flight detail exception: {e}")
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@require_http_methods(["GET"])
+def get_seat_map(request, flight_id):
+    """Seat map of one cabin on one departure (default: the next bookable one)"""
+    try:
+        flight = Flight.objects.filter(id=flight_id).first()
+        if flight is None:
+            return JsonResponse({'error': 'Flight not found'}, status=404)
+        
+        seat_class = request.GET.get('seat_class', 'economy')
+        if seat_class not in SEAT_CLASSES:
+            return JsonResponse({'error': f'seat_class must be one of {", ".join(SEAT_CLASSES)}'}, status=400)
+        date_param = request.GET.get('date')
+        try:
+            departure_date = datetime.strptime(date_param, '%Y-%m-%d').date() if date_param else next_departure_date(flight, timezone.now())
+        except ValueError:
+            return JsonResponse({'error': 'date must be YYYY-MM-DD'}, status=400)
+        
+        seat_map = seat_maps.snapshot(flight, departure_date, seat_class)
+        if seat_map is None:
+            return JsonResponse({'error': f'{flight.plane} has no {seat_class} cabin'}, status=404)
+        return JsonResponse(seat_map)
+        
+    except Exception as e:
+        print(f"[ERROR] Seat map exception: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def update_ticket_status(request, booking_ref):
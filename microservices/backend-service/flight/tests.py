@@ -0,0 +1,1836 @@
+import asyncio
+import base64
+import importlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time as clock
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlsplit
+from aiohttp import web
+from django.apps import apps
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .models import (Place, Week, Flight, User, Passenger, Ticket, FlightDataVersion, SagaLogEntry, SagaQueueItem,
+                     SagaTransaction, Seat, SeatInventory, SeatMap, SeatReservation, SagaIdempotencyRecord)
+from .route_index import route_index
+from .flight_payloads import flight_payloads
+from .simple_views import stored_tickets
+from .fare_calendar import fare_calendar
+from . import saga_breakers as breakers_module
+from . import db_retry as db_retry_module
+from .db_retry import retry_when_locked
+from .saga_breakers import CircuitBreaker, CircuitOpenError, saga_breakers
+from .saga_orchestrator_fixed import BookingOrchestrator
+from .saga_orchestrator_async import AsyncBookingOrchestrator
+from . import saga_queue as queue_module
+from .saga_queue import SagaWorkerPool, SagaQueueFull, saga_worker_pool
+from .saga_recovery import SagaRecoveryWorker
+from .saga_state import saga_state
+from .saga_benchmark import SagaBenchmark, SeatContentionBenchmark
+from .saga_transport import InProcessTransport
+from .saga_metrics import Histogram, SagaMetrics
+from .saga_idempotency import saga_idempotency
+from .reservation_sweeper import ReservationSweeper
+from .seat_inventory import seat_inventory
+from .seat_map import CabinLayout, seat_maps
+from . import saga_log_storage as log_storage_module
+from .saga_log_storage import SagaLogStorage, saga_log_storage
+from . import saga_stream as stream_module
+from .saga_stream import saga_event_stream, saga_stream_slots
+
+
+class FlightSearchTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.search_url = reverse('flight_search')
+        self.origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        self.destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.monday = Week.objects.create(number=0, name='Monday')
+        self.tuesday = Week.objects.create(number=1, name='Tuesday')
+
+        self.cheap = self.create_flight('AA100', economy_fare=150, business_fare=600)
+        self.pricey = self.create_flight('AA200', economy_fare=250, business_fare=0)
+        self.cheap.depart_day.add(self.monday)
+        self.pricey.depart_day.add(self.monday, self.tuesday)
+
+    def create_flight(self, flight_number, **fares):
+        return Flight.objects.create(
+            origin=self.origin,
+            destination=self.destination,
+            depart_time=time(8, 0),
+            arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30),
+            plane='A321',
+            airline='American Airlines',
+            flight_number=flight_number,
+            first_fare=0,
+            **fares
+        )
+
+    def search(self, depart_date='2026-01-05', seat_class='economy'):
+        return self.client.get(self.search_url, {
+            'origin': 'dfw',
+            'destination': 'ORD',
+            'depart_date': depart_date,
+            'seat_class': seat_class
+        })
+
+    def test_search_sorted_by_fare(self):
+        """Flights for the weekday come back cheapest first"""
+        response = self.search()
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([f['flight_number'] for f in data['flights']], ['AA100', 'AA200'])
+        self.assertEqual(data['origin']['code'], 'DFW')
+        self.assertEqual(data['flights'][0]['destination']['city'], 'Chicago')
+
+    def test_search_filters_weekday_and_seat_class(self):
+        """Only flights operating that day with a fare for the class are returned"""
+        tuesday = self.search(depart_date='2026-01-06').json()
+        self.assertEqual([f['flight_number'] for f in tuesday['flights']], ['AA200'])
+        business = self.search(seat_class='business').json()
+        self.assertEqual([f['flight_number'] for f in business['flights']], ['AA100'])
+
+    def test_index_invalidated_on_flight_change(self):
+        """Fare and schedule edits are visible to the next search"""
+        self.search()
+        self.pricey.economy_fare = 99
+        self.pricey.save()
+        data = self.search().json()
+        self.assertEqual([f['flight_number'] for f in data['flights']], ['AA200', 'AA100'])
+
+        version = route_index.version
+        self.cheap.depart_day.remove(self.monday)
+        self.assertGreater(route_index.version, version)
+        data = self.search().json()
+        self.assertEqual([f['flight_number'] for f in data['flights']], ['AA200'])
+
+    def test_operating_days_follow_depart_day(self):
+        """The weekday bitmask mirrors the depart_day M2M from either side"""
+        self.pricey.refresh_from_db()
+        self.assertEqual(self.pricey.operating_weekdays(), [0, 1])
+
+        self.tuesday.flights_of_the_day.add(self.cheap)
+        self.cheap.refresh_from_db()
+        self.assertTrue(self.cheap.operates_on(1))
+
+        self.tuesday.flights_of_the_day.clear()
+        self.assertEqual(
+            list(Flight.objects.operating_on(1).values_list('flight_number', flat=True)), []
+        )
+        self.assertEqual(
+            sorted(Flight.objects.operating_on(0).values_list('flight_number', flat=True)), ['AA100', 'AA200']
+        )
+
+    def test_airline_code_filter_and_multi_carrier_merge(self):
+        """Carriers are matched by code, default AA only, and merged by fare when several are asked for"""
+        united = self.create_flight('UA300', economy_fare=200, business_fare=0)
+        united.depart_day.add(self.monday)
+        self.assertEqual(united.airline_code, 'UA')
+
+        default = self.search().json()
+        self.assertEqual([f['flight_number'] for f in default['flights']], ['AA100', 'AA200'])
+        self.assertEqual(default['airlines'], ['AA'])
+
+        both = self.client.get(self.search_url, {
+            'origin': 'DFW', 'destination': 'ORD', 'depart_date': '2026-01-05', 'airlines': 'ua, aa'
+        }).json()
+        self.assertEqual([f['flight_number'] for f in both['flights']], ['AA100', 'UA300', 'AA200'])
+        self.assertEqual(both['flights'][1]['airline_code'], 'UA')
+
+        invalid = self.client.get(self.search_url, {
+            'origin': 'DFW', 'destination': 'ORD', 'depart_date': '2026-01-05', 'airlines': 'American'
+        })
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_search_rejects_unknown_seat_class(self):
+        response = self.search(seat_class='premium')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('seat_class', response.json()['error'])
+
+    def test_search_rejects_malformed_dates(self):
+        self.assertEqual(self.search(depart_date='05/01/2026').json(), {'error': 'Invalid depart_date'})
+        response = self.client.get(self.search_url, {
+            'origin': 'DFW', 'destination': 'ORD', 'depart_date': '2026-01-05',
+            'trip_type': '2', 'return_date': '2026-13-01'
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Invalid return_date'})
+
+    def test_lookup_hands_out_copies(self):
+        rows = route_index.lookup('DFW', 'ORD', 0, 'economy')
+        rows[0]['economy_fare'] = 1
+        rows[0]['origin']['city'] = 'Changed'
+        rows.clear()
+        again = route_index.lookup('DFW', 'ORD', 0, 'economy')
+        self.assertEqual([(f['flight_number'], f['economy_fare'], f['origin']['city']) for f in again],
+                         [('AA100', 150.0, 'Dallas'), ('AA200', 250.0, 'Dallas')])
+
+    def test_search_unknown_place(self):
+        response = self.client.get(self.search_url, {
+            'origin': 'XXX',
+            'destination': 'ORD',
+            'depart_date': '2026-01-05'
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class FlexSearchTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.flex_url = reverse('flight_search_flex')
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Miami', airport='Miami International', code='MIA', country='USA')
+        weeks = [Week.objects.create(number=n, name=f'Day {n}') for n in range(7)]
+
+        def create_flight(flight_number, economy_fare, days):
+            flight = Flight.objects.create(
+                origin=origin, destination=destination,
+                depart_time=time(9, 0), arrival_time=time(12, 0), duration=timedelta(hours=3),
+                plane='B738', airline='American Airlines', flight_number=flight_number,
+                economy_fare=economy_fare, business_fare=0, first_fare=900
+            )
+            flight.depart_day.set([weeks[n] for n in days])
+            return flight
+
+        self.daily = create_flight('AA300', 200, range(7))
+        self.weekend = create_flight('AA301', 120, [5, 6])
+        self.center = date.today() + timedelta(days=10)
+
+    def test_flex_window(self):
+        """Each day in the window carries the cheapest fare per class"""
+        response = self.client.get(self.flex_url, {
+            'origin': 'DFW', 'destination': 'MIA', 'depart_date': str(self.center), 'days': 3
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['calendar']), 7)
+        for day in data['calendar']:
+            expected = 120 if day['weekday'] in (5, 6) else 200
+            self.assertEqual(day['fares']['economy']['fare'], expected)
+            self.assertIsNone(day['fares']['business'])
+            self.assertEqual(day['fares']['first']['fare'], 900)
+        self.assertEqual(data['cheapest']['economy']['fare'], 120)
+
+    def test_flex_skips_past_dates(self):
+        response = self.client.get(self.flex_url, {
+            'origin': 'DFW', 'destination': 'MIA', 'depart_date': str(date.today()), 'days': 2
+        })
+        self.assertEqual(len(response.json()['calendar']), 3)
+
+    def test_flex_rejects_large_window(self):
+        response = self.client.get(self.flex_url, {
+            'origin': 'DFW', 'destination': 'MIA', 'depart_date': str(self.center), 'days': 100
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class RoundTripSearchTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.search_url = reverse('flight_search')
+        dfw = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        lax = Place.objects.create(city='Los Angeles', airport='LAX International', code='LAX', country='USA')
+        monday = Week.objects.create(number=0, name='Monday')
+        friday = Week.objects.create(number=4, name='Friday')
+
+        for number, origin, destination, fare, day in [
+            ('AA10', dfw, lax, 300, monday),
+            ('AA11', dfw, lax, 200, monday),
+            ('AA20', lax, dfw, 250, friday),
+        ]:
+            flight = Flight.objects.create(
+                origin=origin, destination=destination,
+                depart_time=time(7, 0), arrival_time=time(8, 30), duration=timedelta(hours=3, minutes=30),
+                plane='A321', airline='American Airlines', flight_number=number,
+                economy_fare=fare, business_fare=0, first_fare=0
+            )
+            flight.depart_day.add(day)
+
+    def test_round_trip_returns_both_legs(self):
+        response = self.client.get(self.search_url, {
+            'origin': 'DFW', 'destination': 'LAX', 'depart_date': '2026-01-05',
+            'seat_class': 'economy', 'trip_type': '2', 'return_date': '2026-01-09'
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([f['flight_number'] for f in data['flights']], ['AA11', 'AA10'])
+        self.assertEqual([f['flight_number'] for f in data['return_flights']], ['AA20'])
+        self.assertEqual(data['return_origin']['code'], 'LAX')
+        self.assertEqual(data['price_summary']['outbound'], {'min': 200.0, 'max': 300.0})
+        self.assertEqual(data['price_summary']['min_total'], 450.0)
+
+    def test_round_trip_requires_return_date(self):
+        response = self.client.get(self.search_url, {
+            'origin': 'DFW', 'destination': 'LAX', 'depart_date': '2026-01-05', 'trip_type': '2'
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class ConnectionSearchTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.connections_url = reverse('flight_search_connections')
+        places = {
+            code: Place.objects.create(city=code, airport=f'{code} Airport', code=code, country='USA')
+            for code in ('DFW', 'ORD', 'CLT', 'BOS')
+        }
+        weeks = [Week.objects.create(number=n, name=f'Day {n}') for n in range(7)]
+
+        def create_flight(flight_number, origin, destination, depart, hours, fare, days=range(7)):
+            flight = Flight.objects.create(
+                origin=places[origin], destination=places[destination],
+                depart_time=depart, arrival_time=time((depart.hour + hours) % 24, depart.minute),
+                duration=timedelta(hours=hours), plane='A321', airline='American Airlines',
+                flight_number=flight_number, economy_fare=fare, business_fare=0, first_fare=0
+            )
+            flight.depart_day.set([weeks[n] for n in days])
+
+        create_flight('AA1', 'DFW', 'ORD', time(8, 0), 2, 100)    # lands 10:00
+        create_flight('AA2', 'ORD', 'BOS', time(11, 30), 2, 150)  # 90 min layover
+        create_flight('AA3', 'ORD', 'BOS', time(10, 15), 2, 50)   # 15 min layover, too short
+        create_flight('AA4', 'DFW', 'CLT', time(6, 0), 2, 200)    # lands 08:00
+        create_flight('AA5', 'CLT', 'BOS', time(9, 30), 1, 40)    # 90 min layover, quicker trip
+        create_flight('AA6', 'CLT', 'BOS', time(23, 0), 1, 10, days=[])  # never operates
+        create_flight('AA7', 'DFW', 'ORD', time(20, 0), 2, 90)    # lands 22:00, connects next morning
+
+    def search(self, **params):
+        query = {'origin': 'DFW', 'destination': 'BOS', 'depart_date': '2026-01-05'}
+        query.update(params)
+        return self.client.get(self.connections_url, query)
+
+    def test_ranked_by_fare(self):
+        response = self.search()
+        self.assertEqual(response.status_code, 200)
+        itineraries = response.json()['itineraries']
+        self.assertEqual(
+            [[leg['flight']['flight_number'] for leg in item['legs']] for item in itineraries],
+            [['AA4', 'AA5'], ['AA1', 'AA2']]
+        )
+        self.assertEqual(itineraries[0]['total_fare'], 240.0)
+        self.assertEqual(itineraries[1]['layover_minutes'], 90)
+        self.assertEqual(itineraries[0]['via']['code'], 'CLT')
+
+    def test_ranked_by_duration_and_layover_window(self):
+        itineraries = self.search(sort='duration').json()['itineraries']
+        self.assertEqual(itineraries[0]['total_duration_minutes'], 270)
+        short = self.search(min_layover=10, max_layover=30).json()['itineraries']
+        self.assertEqual([item['legs'][1]['flight']['flight_number'] for item in short], ['AA3'])
+
+    def test_overnight_connection(self):
+        itineraries = self.search(min_layover=60, max_layover=24 * 60).json()['itineraries']
+        next_day = [item for item in itineraries if item['legs'][1]['depart_datetime'].startswith('2026-01-06')]
+        self.assertEqual([item['legs'][0]['flight']['flight_number'] for item in next_day], ['AA7', 'AA7'])
+
+    def test_invalid_layover_window(self):
+        self.assertEqual(self.search(min_layover=120, max_layover=60).status_code, 400)
+
+
+class PlacesSearchTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.places_url = reverse('places_search')
+        Place.objects.create(city='Philadelphia', airport='Philadelphia International', code='PHL', country='USA')
+        Place.objects.create(city='Delhi', airport='Indira Gandhi International', code='DEL', country='India')
+        Place.objects.create(city='Adelaide', airport='Adelaide Airport', code='ADL', country='Australia')
+
+    def codes(self, q):
+        return [place['code'] for place in self.client.get(self.places_url, {'q': q}).json()]
+
+    def test_exact_code_then_city_prefix_then_infix(self):
+        self.assertEqual(self.codes('del'), ['DEL', 'ADL', 'PHL'])
+        self.assertEqual(self.codes('ade'), ['ADL', 'PHL'])
+
+    def test_index_refreshed_on_place_change(self):
+        self.assertEqual(self.codes('dallas'), [])
+        Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        self.assertEqual(self.codes('dallas'), ['DFW'])
+
+    def test_monolith_copy_stays_identical(self):
+        module = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'place_index.py')
+        copy = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(module)))),
+                            'flight', 'place_index.py')
+        if not os.path.exists(copy):
+            self.skipTest('the monolith is not in this checkout')
+        with open(module, encoding='utf-8') as f, open(copy, encoding='utf-8') as g:
+            self.assertEqual(g.read(), f.read(), f'{copy} differs from flight/place_index.py')
+
+
+class FlightPayloadTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='traveller', password='secret')
+        self.origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        self.destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flights = [
+            Flight.objects.create(
+                origin=self.origin, destination=self.destination,
+                depart_time=time(8 + i, 0), arrival_time=time(10 + i, 30),
+                duration=timedelta(hours=2, minutes=30), plane='A321',
+                airline='American Airlines', flight_number=f'AA{i}',
+                economy_fare=100 + i, business_fare=500, first_fare=900
+            ) for i in range(4)
+        ]
+        flight_payloads.invalidate()
+
+    def create_ticket(self, ref_no, flight, passenger_count=2):
+        ticket = Ticket.objects.create(
+            user=self.user, ref_no=ref_no, flight=flight, seat_class='economy',
+            email='t@example.com', mobile='555', status='CONFIRMED'
+        )
+        for i in range(passenger_count):
+            ticket.passengers.add(Passenger.objects.create(first_name=f'P{i}', last_name='Test', gender='female'))
+        return ticket
+
+    def test_flight_detail_memoized_and_refreshed(self):
+        url = reverse('flight_detail', args=[self.flights[0].id])
+        # flight-data version for the ETag, then the flight itself
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).json()['origin']['code'], 'DFW')
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        self.flights[0].economy_fare = 75
+        self.flights[0].save()
+        self.assertEqual(self.client.get(url).json()['economy_fare'], 75.0)
+        missing = self.client.get(reverse('flight_detail', args=[999999]))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_booking_stores_its_own_flight_copy(self):
+        flight = self.flights[0]
+        response = self.client.post(reverse('book_flight'), json.dumps({
+            'flight_id': flight.id,
+            'user_id': 'payload-test',
+            'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace', 'gender': 'female'}],
+            'contact_info': {'email': 'ada@example.com', 'mobile': '555'}
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.addCleanup(stored_tickets.pop, 'payload-test', None)
+
+        stored = stored_tickets['payload-test'][0]['flight']
+        stored['economy_fare'] = 1
+        stored['origin']['city'] = 'Changed'
+        memo = flight_payloads.get(flight.id)
+        self.assertEqual((memo['economy_fare'], memo['origin']['city']), (100.0, 'Dallas'))
+
+    def test_ticket_queries_independent_of_ticket_count(self):
+        url = reverse('get_user_tickets_with_saga', args=[self.user.id])
+        self.create_ticket('AAA001', self.flights[0])
+        # user, tickets, passengers, flights
+        with self.assertNumQueries(4):
+            self.assertEqual(len(self.client.get(url).json()), 1)
+
+        for i, flight in enumerate(self.flights[1:], start=2):
+            self.create_ticket(f'AAA00{i}', flight, passenger_count=3)
+        flight_payloads.invalidate()
+        with self.assertNumQueries(4):
+            tickets = self.client.get(url).json()
+        self.assertEqual(len(tickets), 4)
+        self.assertEqual(len(tickets[-1]['passengers']), 3)
+        self.assertEqual(tickets[0]['flight']['destination']['city'], 'Chicago')
+        self.assertEqual(tickets[0]['status'], 'confirmed')
+
+
+class FareCalendarTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.calendar_url = reverse('fare_calendar')
+        self.dfw = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        self.ord = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.lax = Place.objects.create(city='Los Angeles', airport='LAX International', code='LAX', country='USA')
+        self.weekdays = [Week.objects.create(number=i, name=f'Day {i}') for i in range(7)]
+        self.cheap = self.create_flight('AA1', economy_fare=120, business_fare=0)
+        self.daily = self.create_flight('AA2', economy_fare=200, business_fare=650)
+        self.cheap.depart_day.add(self.weekdays[0])
+        self.daily.depart_day.add(*self.weekdays)
+        fare_calendar.invalidate()
+
+    def create_flight(self, flight_number, **fares):
+        return Flight.objects.create(
+            origin=self.dfw, destination=self.ord,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number=flight_number,
+            first_fare=0, **fares
+        )
+
+    def fares_by_weekday(self, origin='DFW', destination='ORD'):
+        data = self.client.get(self.calendar_url, {'origin': origin, 'destination': destination, 'days': 7}).json()
+        return {entry['weekday']: entry['fares'] for entry in data['calendar']}
+
+    def test_ninety_day_window(self):
+        data = self.client.get(self.calendar_url, {'origin': 'dfw', 'destination': 'ord'}).json()
+        self.assertEqual(len(data['calendar']), 90)
+        self.assertEqual(data['calendar'][0]['date'], str(date.today()))
+        self.assertEqual(data['cheapest']['economy']['fare'], 120.0)
+        self.assertIsNone(data['cheapest'].get('first'))
+
+    def test_lowest_fare_per_weekday(self):
+        fares = self.fares_by_weekday()
+        self.assertEqual(fares[0], {'economy': 120.0, 'business': 650.0, 'first': None})
+        self.assertEqual(fares[3]['economy'], 200.0)
+
+    def test_refreshed_incrementally_on_flight_change(self):
+        self.fares_by_weekday()
+        self.cheap.depart_day.add(self.weekdays[3])
+        self.daily.economy_fare = 90
+        self.daily.save()
+        self.assertEqual(self.fares_by_weekday()[3]['economy'], 90.0)
+
+        # Moving a flight updates both the route it left and the one it joined
+        self.daily.destination = self.lax
+        self.daily.save()
+        self.assertEqual(self.fares_by_weekday()[3]['economy'], 120.0)
+        self.assertEqual(self.fares_by_weekday()[2]['economy'], None)
+        self.assertEqual(self.fares_by_weekday('DFW', 'LAX')[2]['economy'], 90.0)
+
+    def test_rejects_dates_outside_window(self):
+        past = self.client.get(self.calendar_url, {
+            'origin': 'DFW', 'destination': 'ORD', 'start_date': str(date.today() - timedelta(days=1))
+        })
+        self.assertEqual(past.status_code, 400)
+        late = self.client.get(self.calendar_url, {
+            'origin': 'DFW', 'destination': 'ORD', 'start_date': str(date.today() + timedelta(days=85))
+        }).json()
+        self.assertEqual(len(late['calendar']), 5)
+
+
+class FlightETagTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        self.destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.monday = Week.objects.create(number=0, name='Monday')
+        self.flight = Flight.objects.create(
+            origin=self.origin, destination=self.destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+        self.flight.depart_day.add(self.monday)
+        self.detail_url = reverse('flight_detail', args=[self.flight.id])
+        self.search_params = {'origin': 'DFW', 'destination': 'ORD', 'depart_date': '2026-01-05'}
+
+    def test_not_modified_until_flight_data_changes(self):
+        for url, params in ((self.detail_url, {}), (reverse('flight_search'), self.search_params)):
+            first = self.client.get(url, params)
+            self.assertEqual(first.status_code, 200)
+            tag = first['ETag']
+            self.assertFalse(tag.startswith('W/'))
+
+            repeat = self.client.get(url, params, HTTP_IF_NONE_MATCH=tag)
+            self.assertEqual(repeat.status_code, 304)
+            self.assertEqual(repeat.content, b'')
+
+            self.flight.economy_fare += 10
+            self.flight.save()
+            changed = self.client.get(url, params, HTTP_IF_NONE_MATCH=tag)
+            self.assertEqual(changed.status_code, 200)
+            self.assertNotEqual(changed['ETag'], tag)
+
+    def test_schedule_change_bumps_version(self):
+        tag = self.client.get(self.detail_url)['ETag']
+        self.flight.depart_day.add(Week.objects.create(number=1, name='Tuesday'))
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=tag).status_code, 200)
+
+    def test_write_from_another_process_drops_local_indexes(self):
+        self.client.get(reverse('flight_search'), self.search_params)
+        # A queryset update skips signals, like a write made by another worker
+        Flight.objects.filter(id=self.flight.id).update(economy_fare=99)
+        FlightDataVersion.bump()
+        data = self.client.get(reverse('flight_search'), self.search_params).json()
+        self.assertEqual(data['flights'][0]['economy_fare'], 99.0)
+
+    def test_endpoints_without_etag_also_see_writes_from_another_process(self):
+        search = reverse('places_search')
+        self.assertEqual(self.client.get(search, {'q': 'DFW'}).json()[0]['city'], 'Dallas')
+        Place.objects.filter(id=self.origin.id).update(city='Dallas-Fort Worth')
+        FlightDataVersion.bump()
+        self.assertEqual(self.client.get(search, {'q': 'DFW'}).json()[0]['city'], 'Dallas-Fort Worth')
+
+
+class StubSagaServices:
+    """aiohttp server answering every SAGA step and compensation URL on one local port"""
+
+    STEP_RESULTS = {
+        'reserve-seat': {'message': 'Seat reserved', 'reservation_id': 'R1'},
+        'authorize-payment': {'message': 'Payment authorized', 'authorization_id': 'A1', 'amount': 150},
+        'award-miles': {'message': 'Miles awarded', 'miles_awarded': 500, 'original_balance': 0, 'new_balance': 500},
+        'confirm-booking': {'message': 'Booking confirmed'},
+    }
+
+    def __init__(self, delay=0):
+        self.peers = set()
+        self.actions = []
+        self.delay = delay
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.loop = asyncio.new_event_loop()
+        app = web.Application()
+        app.router.add_post('/api/saga/{action}/', self.handle)
+        self.runner = web.AppRunner(app)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        self.loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def handle(self, request):
+        self.peers.add(request.transport.get_extra_info('peername'))
+        action = request.match_info['action']
+        self.actions.append(action)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        data = await request.json()
+        if data.get('simulate_failure'):
+            return web.json_response({'success': False, 'error': f'Simulated {action} failure'})
+        result = self.STEP_RESULTS.get(action, {'message': f'{action} done'})
+        return web.json_response({'success': True, **result})
+
+    def point(self, orchestrator):
+        for step in orchestrator.steps:
+            step.action_url = f"http://127.0.0.1:{self.port}{urlsplit(step.action_url).path}"
+            step.compensation_url = f"http://127.0.0.1:{self.port}{urlsplit(step.compensation_url).path}"
+        return orchestrator
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class AsyncSagaOrchestratorTests(TransactionTestCase):
+    def setUp(self):
+        self.services = StubSagaServices()
+        self.addCleanup(self.services.stop)
+        self.orchestrator = self.services.point(AsyncBookingOrchestrator(connections_per_service=2))
+        self.addCleanup(self.orchestrator.close)
+
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+
+    def booking_data(self, **flags):
+        return {
+            'flight_id': self.flight.id,
+            'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace', 'gender': 'female'}],
+            'contact_info': {'email': 'ada@example.com', 'mobile': '555'},
+            **flags
+        }
+
+    def saga_log(self, correlation_id):
+        return [
+            (entry.step_name, entry.service, entry.log_level, entry.message.replace(correlation_id, '<id>'), entry.is_compensation)
+            for entry in SagaLogEntry.objects.filter(correlation_id=correlation_id).order_by('id')
+        ]
+
+    def test_matches_threaded_orchestrator(self):
+        threaded = self.services.point(BookingOrchestrator())
+        for flags in ({}, {'simulate_awardmiles_fail': True}):
+            expected = threaded.start_booking_saga(self.booking_data(**flags))
+            result = self.orchestrator.start_booking_saga(self.booking_data(**flags))
+
+            self.assertEqual(result['success'], expected['success'])
+            self.assertEqual(result.get('failed_step'), expected.get('failed_step'))
+            # Same entries; independent steps interleave in the async log
+            self.assertCountEqual(self.saga_log(result['correlation_id']), self.saga_log(expected['correlation_id']))
+
+        failed = result['compensation_result']
+        self.assertEqual(failed['successful_compensations'], 2)
+        self.assertEqual([r['step'] for r in failed['results']], ['AuthorizePayment', 'ReserveSeat'])
+        self.assertTrue(Ticket.objects.filter(ref_no=result['failed_booking_ref'], status='FAILED').exists())
+
+    def test_concurrent_sagas_share_pooled_connections(self):
+        futures = [self.orchestrator.submit_booking_saga(self.booking_data()) for _ in range(20)]
+        results = [future.result(timeout=30) for future in futures]
+
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(len({result['correlation_id'] for result in results}), 20)
+        # 80 step calls over at most two kept-alive connections
+        self.assertLessEqual(len(self.services.peers), 2)
+        for result in results:
+            self.assertEqual(len(self.saga_log(result['correlation_id'])), 12)
+
+
+class SagaStepGraphTests(TransactionTestCase):
+    def setUp(self):
+        self.services = StubSagaServices(delay=0.05)
+        self.addCleanup(self.services.stop)
+        self.orchestrator = self.services.point(AsyncBookingOrchestrator())
+        self.addCleanup(self.orchestrator.close)
+
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+
+    def booking_data(self, **flags):
+        return {
+            'flight_id': self.flight.id,
+            'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace', 'gender': 'female'}],
+            'contact_info': {'email': 'ada@example.com', 'mobile': '555'},
+            **flags
+        }
+
+    def test_independent_steps_run_concurrently(self):
+        result = self.orchestrator.start_booking_saga(self.booking_data())
+
+        self.assertTrue(result['success'])
+        self.assertCountEqual(self.services.actions[:2], ['reserve-seat', 'authorize-payment'])
+        self.assertEqual(self.services.actions[2:], ['award-miles', 'confirm-booking'])
+        self.assertEqual(self.services.peak_in_flight, 2)
+
+    def test_step_in_flight_when_another_fails_is_compensated(self):
+        result = self.orchestrator.start_booking_saga(self.booking_data(simulate_authorizepayment_fail=True))
+
+        self.assertEqual(result['failed_step'], 'AuthorizePayment')
+        self.assertNotIn('award-miles', self.services.actions)
+        self.assertEqual(self.services.actions[-1], 'cancel-seat')
+        self.assertEqual(result['compensation_result']['successful_compensations'], 1)
+        transaction = SagaTransaction.objects.get(correlation_id=result['correlation_id'])
+        self.assertEqual(transaction.step_outcomes, {'ReserveSeat': 'COMPENSATED', 'AuthorizePayment': 'FAILED'})
+
+    def test_compensation_waves_follow_dependencies(self):
+        steps = {step.name: step for step in self.orchestrator.steps}
+        waves = self.orchestrator._compensation_waves(list(steps.values()))
+        self.assertEqual(
+            [[step.name for step in wave] for wave in waves],
+            [['ConfirmBooking'], ['AwardMiles', 'ReserveSeat'], ['AuthorizePayment']]
+        )
+
+        self.orchestrator.steps.reverse()
+        with self.assertRaises(ValueError):
+            self.orchestrator._check_dependencies()
+
+
+class SagaInProcessTransportTests(TransactionTestCase):
+    def setUp(self):
+        self.services = StubSagaServices()
+        self.addCleanup(self.services.stop)
+
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+
+    def booking_data(self, **flags):
+        return {
+            'flight_id': self.flight.id,
+            'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace', 'gender': 'female'}],
+            'contact_info': {'email': 'ada@example.com', 'mobile': '2145550100'},
+            **flags
+        }
+
+    def orchestrators(self):
+        """Threaded and asyncio orchestrators calling this process's steps in-process, the rest on the stub"""
+        for orchestrator_class in (BookingOrchestrator, AsyncBookingOrchestrator):
+            transport = InProcessTransport(['http://localhost:8001'])
+            orchestrator = orchestrator_class(transport=transport)
+            if hasattr(orchestrator, 'close'):
+                self.addCleanup(orchestrator.close)
+            for step in orchestrator.steps:
+                if urlsplit(step.action_url).port != 8001:
+                    step.action_url = f"http://127.0.0.1:{self.services.port}{urlsplit(step.action_url).path}"
+                    step.compensation_url = f"http://127.0.0.1:{self.services.port}{urlsplit(step.compensation_url).path}"
+            yield orchestrator, transport
+
+    def test_http_is_the_default(self):
+        self.assertIsNone(BookingOrchestrator().local_transport)
+        self.assertIsNone(InProcessTransport(['http://localhost:8001']).handler('http://localhost:8002/api/saga/authorize-payment/'))
+
+    def test_backend_steps_skip_http(self):
+        for orchestrator, transport in self.orchestrators():
+            self.services.actions.clear()
+            result = orchestrator.start_booking_saga(self.booking_data())
+
+            self.assertTrue(result['success'], result)
+            self.assertEqual(self.services.actions, ['authorize-payment', 'award-miles'])
+            self.assertEqual(transport.calls, 2)
+            self.assertTrue(SeatReservation.objects.filter(correlation_id=result['correlation_id']).exists())
+        self.assertEqual(Ticket.objects.filter(status='CONFIRMED').count(), 2)
+
+    def test_backend_compensation_runs_in_process(self):
+        for orchestrator, transport in self.orchestrators():
+            self.services.actions.clear()
+            result = orchestrator.start_booking_saga(self.booking_data(simulate_awardmiles_fail=True))
+
+            self.assertEqual(result['failed_step'], 'AwardMiles')
+            self.assertEqual(result['compensation_result']['successful_compensations'], 2)
+            self.assertEqual(self.services.actions, ['authorize-payment', 'award-miles', 'cancel-payment'])
+            # reserve-seat, then cancel-seat
+            self.assertEqual(transport.calls, 2)
+            self.assertEqual(SeatReservation.objects.get(correlation_id=result['correlation_id']).status, 'CANCELLED')
+
+
+class SagaIdempotencyTests(TestCase):
+    def setUp(self):
+        saga_idempotency.clear_cache()
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+
+    def post(self, name, correlation_id='saga-1', **fields):
+        payload = {
+            'correlation_id': correlation_id,
+            'booking_data': {
+                'flight_id': self.flight.id,
+                'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace', 'gender': 'female'}],
+                'contact_info': {'email': 'ada@example.com', 'mobile': '2145550100'}
+            },
+            **fields
+        }
+        return self.client.post(reverse(name), json.dumps(payload), content_type='application/json')
+
+    def test_service_copies_stay_identical(self):
+        module = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saga_idempotency.py')
+        services = os.path.dirname(os.path.dirname(os.path.dirname(module)))
+        copies = [os.path.join(services, service, app, 'saga_idempotency.py')
+                  for service, app in (('payment-service', 'payment'), ('loyalty-service', 'loyalty'))]
+        copies = [copy for copy in copies if os.path.exists(copy)]
+        if not copies:
+            self.skipTest('other services are not in this checkout')
+        with open(module, encoding='utf-8') as f:
+            source = f.read()
+        for copy in copies:
+            with open(copy, encoding='utf-8') as f:
+                self.assertEqual(f.read(), source, f'{copy} differs from flight/saga_idempotency.py')
+
+    def test_retried_confirmation_replays_first_response(self):
+        first = self.post('saga_confirm_booking')
+        saga_idempotency.clear_cache()
+        retry = self.post('saga_confirm_booking')
+
+        self.assertTrue(first.json()['success'])
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Ticket.objects.count(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post('saga_confirm_booking').json(), first.json())
+
+    def test_failed_call_can_be_retried(self):
+        self.assertFalse(self.post('saga_reserve_seat', simulate_failure=True).json()['success'])
+        self.assertFalse(SagaIdempotencyRecord.objects.exists())
+
+        self.assertTrue(self.post('saga_reserve_seat').json()['success'])
+        self.assertEqual(SagaIdempotencyRecord.objects.get().step, 'ReserveSeat')
+
+    def test_call_in_progress_is_rejected_until_its_claim_goes_stale(self):
+        now = timezone.now()
+        record = SagaIdempotencyRecord.objects.create(
+            correlation_id='saga-1', step='ReserveSeat', claimed_at=now, expires_at=now + timedelta(days=1)
+        )
+        self.assertEqual(self.post('saga_reserve_seat').status_code, 409)
+
+        SagaIdempotencyRecord.objects.filter(pk=record.pk).update(claimed_at=now - timedelta(minutes=5))
+        self.assertTrue(self.post('saga_reserve_seat').json()['success'])
+        self.assertEqual(SagaIdempotencyRecord.objects.get().status_code, 200)
+
+    def test_expired_keys_are_purged(self):
+        self.post('saga_reserve_seat', correlation_id='old')
+        self.post('saga_reserve_seat', correlation_id='new')
+        SagaIdempotencyRecord.objects.filter(correlation_id='old').update(expires_at=timezone.now())
+
+        self.assertEqual(saga_idempotency.purge_expired(), 1)
+        self.assertEqual(list(SagaIdempotencyRecord.objects.values_list('correlation_id', flat=True)), ['new'])
+
+
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.breaker = CircuitBreaker('localhost:8002', clock=lambda: self.now)
+
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        for _ in range(breakers_module.CONSECUTIVE_FAILURES - 1):
+            self.breaker.before_call()
+            self.breaker.record_failure(0.01, ConnectionError('refused'))
+        self.assertEqual(self.breaker.state, 'CLOSED')
+
+        self.breaker.record_failure(0.01, ConnectionError('refused'))
+        self.assertEqual(self.breaker.state, 'OPEN')
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.assertEqual(self.breaker.snapshot()['rejections'], 1)
+
+    def test_half_open_probe_closes_or_reopens(self):
+        for _ in range(breakers_module.CONSECUTIVE_FAILURES):
+            self.breaker.record_failure(0.01, 'HTTP 503')
+
+        self.now += breakers_module.OPEN_SECONDS
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, 'HALF_OPEN')
+        # Only one probe at a time
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.breaker.record_failure(0.01, 'HTTP 503')
+        self.assertEqual(self.breaker.state, 'OPEN')
+
+        self.now += breakers_module.OPEN_SECONDS
+        self.breaker.before_call()
+        self.breaker.record_response(0.05, 200)
+        self.assertEqual(self.breaker.state, 'CLOSED')
+        self.breaker.before_call()
+
+    def test_business_failures_do_not_open_breaker(self):
+        for _ in range(20):
+            self.breaker.record_response(0.05, 400)
+        self.assertEqual(self.breaker.state, 'CLOSED')
+
+    def test_timeout_adapts_to_p99_latency(self):
+        self.assertEqual(self.breaker.timeout(), breakers_module.MAX_TIMEOUT)
+        for i in range(100):
+            self.breaker.record_response(0.5 if i == 99 else 0.1, 200)
+        # p99 of 100 samples is the slowest one
+        self.assertAlmostEqual(self.breaker.timeout(), 0.5 * breakers_module.TIMEOUT_MULTIPLIER)
+
+        for _ in range(100):
+            self.breaker.record_response(0.01, 200)
+        self.assertEqual(self.breaker.timeout(), breakers_module.MIN_TIMEOUT)
+
+        snapshot = self.breaker.snapshot()
+        self.assertEqual(snapshot['latency_ms']['p50'], 10.0)
+        self.assertEqual(snapshot['window_calls'], breakers_module.WINDOW_SIZE)
+
+
+class SagaBreakerOrchestratorTests(TransactionTestCase):
+    def setUp(self):
+        saga_breakers.reset()
+        self.addCleanup(saga_breakers.reset)
+        self.services = StubSagaServices()
+        self.addCleanup(self.services.stop)
+        self.threaded = self.services.point(BookingOrchestrator())
+        self.orchestrator = self.services.point(AsyncBookingOrchestrator())
+        self.addCleanup(self.orchestrator.close)
+        # A port nothing listens on stands in for a payment service that is down
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            dead_port = sock.getsockname()[1]
+        for orchestrator in (self.threaded, self.orchestrator):
+            payment = orchestrator.steps[1]
+            payment.action_url = f"http://127.0.0.1:{dead_port}{urlsplit(payment.action_url).path}"
+
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+
+    def booking_data(self):
+        return {
+            'flight_id': self.flight.id,
+            'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace', 'gender': 'female'}],
+            'contact_info': {'email': 'ada@example.com', 'mobile': '555'}
+        }
+
+    def test_open_breaker_fails_payment_step_fast(self):
+        for _ in range(breakers_module.CONSECUTIVE_FAILURES):
+            result = self.threaded.start_booking_saga(self.booking_data())
+            self.assertEqual(result['failed_step'], 'AuthorizePayment')
+
+        started = clock.monotonic()
+        result = self.orchestrator.start_booking_saga(self.booking_data())
+        self.assertLess(clock.monotonic() - started, 5)
+        self.assertEqual(result['failed_step'], 'AuthorizePayment')
+        self.assertIn('Circuit open', result['error'])
+        # The seat reserved before the failure is still released
+        self.assertEqual(result['compensation_result']['successful_compensations'], 1)
+
+        data = self.client.get(reverse('saga_breakers')).json()
+        services = {service['service']: service for service in data['services']}
+        self.assertEqual(data['open'], [urlsplit(self.orchestrator.steps[1].action_url).netloc])
+        self.assertEqual(services[data['open'][0]]['rejections'], 1)
+        healthy = services[f'127.0.0.1:{self.services.port}']
+        self.assertEqual(healthy['state'], 'CLOSED')
+        self.assertEqual(healthy['failures'], 0)
+        self.assertIsNotNone(healthy['latency_ms']['p99'])
+
+    def test_compensation_goes_out_while_breaker_is_open(self):
+        seat = self.threaded.steps[0]
+        seat.compensation_url = f"http://localhost:{self.services.port}{urlsplit(seat.compensation_url).path}"
+        breaker = saga_breakers.for_url(seat.compensation_url)
+        for _ in range(breakers_module.CONSECUTIVE_FAILURES):
+            breaker.record_failure(0.01, 'down')
+        self.assertEqual(breaker.state, breakers_module.OPEN)
+
+        result = self.threaded.start_booking_saga(self.booking_data())
+        self.assertEqual(result['failed_step'], 'AuthorizePayment')
+        self.assertEqual(result['compensation_result']['successful_compensations'], 1)
+        self.assertEqual(breaker.state, breakers_module.CLOSED)
+        transaction = SagaTransaction.objects.get(correlation_id=result['correlation_id'])
+        self.assertEqual(transaction.status, 'FAILED')
+        self.assertEqual(transaction.step_outcomes['ReserveSeat'], 'COMPENSATED')
+
+    def test_failed_rollback_is_left_for_recovery(self):
+        seat = self.threaded.steps[0]
+        healthy_url = seat.compensation_url
+        seat.compensation_url = self.threaded.steps[1].action_url.replace('authorize-payment', 'cancel-seat')
+
+        result = self.threaded.start_booking_saga(self.booking_data())
+        correlation_id = result['correlation_id']
+        self.assertEqual(result['compensation_result']['successful_compensations'], 0)
+        transaction = SagaTransaction.objects.get(correlation_id=correlation_id)
+        self.assertEqual(transaction.status, 'COMPENSATING')
+        self.assertEqual(transaction.step_outcomes['ReserveSeat'], 'COMPENSATION_FAILED')
+
+        seat.compensation_url = healthy_url
+        SagaTransaction.objects.filter(correlation_id=correlation_id).update(
+            updated_at=timezone.now() - timedelta(minutes=5)
+        )
+        worker = SagaRecoveryWorker(stale_seconds=60, orchestrator_factory=lambda: self.threaded)
+        self.assertEqual(worker.recover_stale(), 1)
+
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, 'FAILED')
+        self.assertEqual(transaction.step_outcomes['ReserveSeat'], 'COMPENSATED')
+        failed = Ticket.objects.get(saga_correlation_id=correlation_id, status='FAILED')
+        self.assertEqual(failed.compensation_details['successful_compensations'], 1)
+
+
+class ReservationSweeperTests(TestCase):
+    def setUp(self):
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+        now = timezone.now()
+        for number in range(3):
+            self.reserve(f'abandoned-{number}', now - timedelta(minutes=10 - number))
+        self.reserve('active', now + timedelta(minutes=20))
+        self.reserve('confirmed', now - timedelta(minutes=30), status='CONFIRMED')
+
+    def reserve(self, correlation_id, expires_at, status='RESERVED'):
+        reservation = SeatReservation.objects.create(
+            correlation_id=correlation_id, flight=self.flight, status=status, expires_at=expires_at
+        )
+        seat = Seat.objects.create(flight=self.flight, seat_number=f'{SeatReservation.objects.count()}A',
+                                   seat_class='economy', is_available=False)
+        reservation.seats.add(seat)
+        return reservation
+
+    def statuses(self):
+        return dict(SeatReservation.objects.values_list('correlation_id', 'status'))
+
+    def test_sweep_expires_overdue_holds_in_batches(self):
+        sweeper = ReservationSweeper(interval=0, batch_size=2)
+        self.assertEqual(sweeper.stats()['overdue'], 3)
+
+        report = sweeper.sweep()
+
+        self.assertEqual(report['batches'], [2, 1])
+        self.assertEqual(report['seats_released'], 3)
+        self.assertGreaterEqual(report['lag_seconds'], 600)
+        self.assertEqual(self.statuses(), {
+            'abandoned-0': 'EXPIRED', 'abandoned-1': 'EXPIRED', 'abandoned-2': 'EXPIRED',
+            'active': 'RESERVED', 'confirmed': 'CONFIRMED'
+        })
+        self.assertEqual(
+            set(Seat.objects.filter(is_available=False).values_list('reservations__correlation_id', flat=True)),
+            {'active', 'confirmed'}
+        )
+        stats = sweeper.stats()
+        self.assertEqual((stats['overdue'], stats['expired'], stats['recent_batch_sizes']), (0, 3, [2, 1]))
+        self.assertEqual(sweeper.sweep()['expired'], 0)
+
+    def test_confirmed_booking_is_not_swept(self):
+        payload = {
+            'correlation_id': 'booked',
+            'booking_data': {
+                'flight_id': self.flight.id,
+                'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace', 'gender': 'female'}],
+                'contact_info': {'email': 'ada@example.com', 'mobile': '2145550100'}
+            }
+        }
+        for name in ('saga_reserve_seat', 'saga_confirm_booking'):
+            self.client.post(reverse(name), json.dumps(payload), content_type='application/json')
+        SeatReservation.objects.filter(correlation_id='booked').update(expires_at=timezone.now())
+
+        ReservationSweeper(interval=0).sweep()
+        self.assertEqual(self.statuses()['booked'], 'CONFIRMED')
+
+    def test_migration_confirms_reservations_of_finished_bookings(self):
+        migration = importlib.import_module('flight.migrations.0016_seatreservation_status_expiry_idx')
+        for correlation_id in ('completed-saga', 'ticketed', 'failed-ticket'):
+            self.reserve(correlation_id, timezone.now() - timedelta(minutes=5))
+        SagaTransaction.objects.create(correlation_id='completed-saga', flight=self.flight, booking_data={},
+                                       status='COMPLETED')
+        Ticket.objects.create(ref_no='TKT001', flight=self.flight, seat_class='economy', status='CONFIRMED',
+                              saga_correlation_id='ticketed')
+        Ticket.objects.create(ref_no='FTK001', flight=self.flight, seat_class='economy', status='FAILED',
+                              saga_correlation_id='failed-ticket')
+
+        migration.confirm_booked_reservations(apps, None)
+
+        statuses = self.statuses()
+        self.assertEqual((statuses['completed-saga'], statuses['ticketed']), ('CONFIRMED', 'CONFIRMED'))
+        self.assertEqual(statuses['failed-ticket'], 'RESERVED')
+        self.assertEqual(statuses['abandoned-0'], 'RESERVED')
+
+    def test_management_command_runs_one_sweep(self):
+        out = StringIO()
+        call_command('expire_reservations', '--batch-size', '10', '--json', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['expired'], 3)
+        self.assertEqual(list(SeatReservation.objects.filter(status='RESERVED').values_list('correlation_id', flat=True)), ['active'])
+
+
+class SeatInventoryTests(TransactionTestCase):
+    def setUp(self):
+        seat_inventory.clear_cache()
+        saga_idempotency.clear_cache()
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+        for row in range(1, 4):
+            Seat.objects.create(flight=self.flight, seat_number=f'{row}A', seat_class='economy')
+        Seat.objects.create(flight=self.flight, seat_number='1F', seat_class='business')
+
+    def reserve(self, correlation_id, passengers=1):
+        payload = {
+            'correlation_id': correlation_id,
+            'booking_data': {
+                'flight_id': self.flight.id,
+                'passengers': [{'first_name': 'Ada', 'last_name': f'Lovelace{n}', 'gender': 'female'} for n in range(passengers)]
+            }
+        }
+        return self.client.post(reverse('saga_reserve_seat'), json.dumps(payload), content_type='application/json').json()
+
+    def remaining(self):
+        return SeatInventory.objects.get(flight=self.flight, seat_class='economy').remaining
+
+    def test_holds_stop_at_capacity(self):
+        self.assertTrue(self.reserve('party', passengers=2)['success'])
+        self.assertEqual(SeatInventory.objects.get(flight=self.flight, seat_class='economy').capacity, 3)
+
+        refused = self.reserve('too-many', passengers=2)
+        self.assertFalse(refused['success'])
+        self.assertIn('Not enough economy seats', refused['error'])
+        self.assertFalse(SeatReservation.objects.filter(correlation_id='too-many').exists())
+
+        self.assertTrue(self.reserve('single')['success'])
+        self.assertEqual(self.remaining(), 0)
+
+    def test_cancel_and_expiry_give_seats_back_once(self):
+        self.reserve('cancelled', passengers=2)
+        self.reserve('abandoned')
+        self.assertEqual(self.remaining(), 0)
+
+        cancel = {'correlation_id': 'cancelled'}
+        for _ in range(2):
+            self.client.post(reverse('saga_cancel_seat'), json.dumps(cancel), content_type='application/json')
+            saga_idempotency.clear_cache()
+        self.assertEqual(self.remaining(), 2)
+
+        SeatReservation.objects.filter(correlation_id='abandoned').update(expires_at=timezone.now())
+        ReservationSweeper(interval=0).sweep()
+        ReservationSweeper(interval=0).sweep()
+        self.assertEqual(self.remaining(), 3)
+
+    def test_confirmation_keeps_the_reserved_departure(self):
+        # Flights without operating days leave the next day, so the departure rolls over at midnight
+        reserved_at = timezone.make_aware(datetime(2030, 1, 7, 23, 50), timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=reserved_at):
+            reserved = self.reserve('overnight')
+        self.assertEqual(reserved['departure_date'], '2030-01-08')
+
+        payload = {
+            'correlation_id': 'overnight',
+            'booking_data': {
+                'flight_id': self.flight.id,
+                'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace0', 'gender': 'female'}],
+                'contact_info': {'email': 'ada@example.com', 'mobile': '2145550100'}
+            }
+        }
+        with mock.patch('django.utils.timezone.now', return_value=reserved_at + timedelta(minutes=15)):
+            confirmed = self.client.post(reverse('saga_confirm_booking'), json.dumps(payload), content_type='application/json').json()
+        self.assertTrue(confirmed['success'], confirmed)
+        self.assertEqual(confirmed['flight_ddate'], '2030-01-08')
+        self.assertEqual(Ticket.objects.get(id=confirmed['ticket_id']).flight_ddate, date(2030, 1, 8))
+
+    @mock.patch.object(db_retry_module, 'DB_LOCK_BACKOFF', 0)
+    def test_confirmation_retries_a_locked_database(self):
+        self.reserve('locked')
+        create = Ticket.objects.create
+        calls = []
+
+        def locked_once(**fields):
+            calls.append(fields['ref_no'])
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return create(**fields)
+
+        payload = {
+            'correlation_id': 'locked',
+            'booking_data': {
+                'flight_id': self.flight.id,
+                'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace0', 'gender': 'female'}],
+                'contact_info': {'email': 'ada@example.com', 'mobile': '2145550100'}
+            }
+        }
+        with mock.patch.object(Ticket.objects, 'create', side_effect=locked_once):
+            confirmed = self.client.post(reverse('saga_confirm_booking'), json.dumps(payload), content_type='application/json').json()
+        self.assertTrue(confirmed['success'], confirmed)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Ticket.objects.get().passengers.count(), 1)
+        self.assertEqual(Passenger.objects.count(), 1)
+        self.assertEqual(SeatReservation.objects.get(correlation_id='locked').status, 'CONFIRMED')
+
+    @mock.patch.object(db_retry_module, 'DB_LOCK_BACKOFF', 0)
+    def test_lock_retries_stop_at_other_errors_and_the_limit(self):
+        write = mock.Mock(side_effect=[OperationalError('database is locked'), 'written'])
+        self.assertEqual(retry_when_locked(write), 'written')
+        self.assertEqual(write.call_count, 2)
+
+        write = mock.Mock(side_effect=OperationalError('no such table: flight_ticket'))
+        with self.assertRaises(OperationalError):
+            retry_when_locked(write)
+        self.assertEqual(write.call_count, 1)
+
+        write = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            retry_when_locked(write)
+        self.assertEqual(write.call_count, db_retry_module.DB_LOCK_RETRIES)
+
+    def test_contention_benchmark_never_oversells(self):
+        report = SeatContentionBenchmark(self.flight.id, capacity=5).run(sagas=20, concurrency=4)
+
+        self.assertTrue(report['consistent'], report)
+        self.assertEqual((report['held'], report['sold_out'], report['remaining']), (5, 15, 0))
+        self.assertGreater(report['throughput_per_second'], 0)
+
+
+class SeatMapTests(TestCase):
+    def setUp(self):
+        seat_inventory.clear_cache()
+        saga_idempotency.clear_cache()
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+
+    def reserve(self, correlation_id, passengers=1, seat_class='economy'):
+        payload = {
+            'correlation_id': correlation_id,
+            'booking_data': {
+                'flight_id': self.flight.id,
+                'seat_class': seat_class,
+                'passengers': [{'first_name': 'Ada', 'last_name': f'Lovelace{n}', 'gender': 'female'} for n in range(passengers)]
+            }
+        }
+        return self.client.post(reverse('saga_reserve_seat'), json.dumps(payload), content_type='application/json').json()
+
+    def seat_map(self, **params):
+        return self.client.get(reverse('flight_seat_map', args=[self.flight.id]), params)
+
+    def test_adjacent_seats_stay_within_an_aisle_block(self):
+        cabin = CabinLayout('economy', 1, 2, 'ABC-DEF')
+        occupied = cabin.mask(['1A'])
+        self.assertEqual(cabin.labels(cabin.find_adjacent(occupied, 2)), ['1B', '1C'])
+        self.assertEqual(cabin.labels(cabin.find_adjacent(occupied, 3)), ['1D', '1E', '1F'])
+
+        occupied = cabin.mask(['1A', '1B', '1E', '1F'])
+        self.assertEqual(cabin.labels(cabin.find_adjacent(occupied, 2)), ['2A', '2B'])
+        self.assertIsNone(cabin.find_adjacent(occupied, 4))
+        self.assertEqual(cabin.labels(cabin.find_free(occupied, 4)), ['1C', '1D', '2A', '2B'])
+        self.assertIsNone(cabin.find_free(cabin.all_seats, 1))
+
+    def test_reservation_assigns_seats_and_returns_compact_map(self):
+        party = self.reserve('party', passengers=3)
+        self.assertEqual(party['seat_numbers'], ['8A', '8B', '8C'])
+        self.assertEqual(self.reserve('single')['seat_numbers'], ['8D'])
+
+        seat_map = party['seat_map']
+        self.assertEqual((seat_map['layout'], seat_map['rows'], seat_map['letters']), ('A321', [8, 33], 'ABC-DEF'))
+        self.assertEqual((seat_map['seats'], seat_map['available']), (156, 153))
+        self.assertEqual(base64.b64decode(seat_map['occupied'])[:1], bytes([0b111]))
+        self.assertEqual(SeatInventory.objects.get(flight=self.flight, seat_class='economy').capacity, 156)
+        self.assertEqual(self.seat_map().json()['available'], 152)
+
+    def test_business_cabin_is_bookable_on_every_layout(self):
+        party = self.reserve('business', passengers=2, seat_class='business')
+        self.assertTrue(party['success'], party)
+        self.assertEqual(party['seat_numbers'], ['6A', '6B'])
+        self.assertEqual(SeatInventory.objects.get(flight=self.flight, seat_class='business').capacity, 12)
+
+        with mock.patch.dict('flight.seat_map.SEAT_LAYOUTS', {'A321': [('economy', 8, 33, 'ABC-DEF')]}), \
+                mock.patch.object(seat_maps, '_layouts', {}):
+            self.assertEqual(seat_maps.layout('A321').capacity('business'), 6)
+
+    def test_cancel_and_expiry_free_assigned_seats(self):
+        self.reserve('cancelled', passengers=2)
+        self.reserve('abandoned')
+        self.client.post(reverse('saga_cancel_seat'), json.dumps({'correlation_id': 'cancelled'}), content_type='application/json')
+        self.assertEqual(self.seat_map().json()['available'], 155)
+
+        SeatReservation.objects.filter(correlation_id='abandoned').update(expires_at=timezone.now())
+        ReservationSweeper(interval=0).sweep()
+        self.assertEqual(self.seat_map().json()['available'], 156)
+        self.assertEqual(self.reserve('next', passengers=2)['seat_numbers'], ['8A', '8B'])
+
+    def test_seat_map_endpoint_validates_cabin_and_date(self):
+        empty = self.seat_map(seat_class='first', date='2030-01-07').json()
+        self.assertEqual((empty['departure_date'], empty['seats'], empty['available']), ('2030-01-07', 20, 20))
+        self.assertFalse(SeatMap.objects.exists())
+
+        business = self.seat_map(seat_class='business', date='2030-01-07').json()
+        self.assertEqual((business['rows'], business['seats']), ([6, 7], 12))
+        self.assertEqual(self.seat_map(seat_class='premium').status_code, 400)
+        self.assertEqual(self.seat_map(date='07/01/2030').status_code, 400)
+
+
+class SagaRecoveryTests(TransactionTestCase):
+    def setUp(self):
+        self.services = StubSagaServices()
+        self.addCleanup(self.services.stop)
+        self.orchestrator = self.services.point(AsyncBookingOrchestrator())
+        self.addCleanup(self.orchestrator.close)
+        self.worker = SagaRecoveryWorker(stale_seconds=60, orchestrator_factory=lambda: self.orchestrator)
+
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+
+    def booking_data(self, **flags):
+        return {
+            'flight_id': self.flight.id,
+            'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace', 'gender': 'female'}],
+            'contact_info': {'email': 'ada@example.com', 'mobile': '555'},
+            **flags
+        }
+
+    def orphan(self, correlation_id, status, outcomes, minutes_ago=5, **fields):
+        """A SAGA row as a crashed process would leave it"""
+        SagaTransaction.objects.create(
+            correlation_id=correlation_id, flight=self.flight, booking_data=self.booking_data(),
+            status=status, step_outcomes=outcomes, current_step=len(outcomes) - 1, **fields
+        )
+        SagaTransaction.objects.filter(correlation_id=correlation_id).update(
+            updated_at=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+
+    def test_step_transitions_are_recorded(self):
+        result = self.orchestrator.start_booking_saga(self.booking_data())
+        transaction = SagaTransaction.objects.get(correlation_id=result['correlation_id'])
+        self.assertEqual(transaction.status, 'COMPLETED')
+        self.assertEqual(transaction.current_step, 3)
+        self.assertEqual(set(transaction.step_outcomes.values()), {'SUCCEEDED'})
+
+        result = self.orchestrator.start_booking_saga(self.booking_data(simulate_awardmiles_fail=True))
+        transaction = SagaTransaction.objects.get(correlation_id=result['correlation_id'])
+        self.assertEqual(transaction.status, 'FAILED')
+        self.assertEqual(transaction.failed_step, 'AwardMiles')
+        self.assertEqual(transaction.step_outcomes, {
+            'ReserveSeat': 'COMPENSATED', 'AuthorizePayment': 'COMPENSATED', 'AwardMiles': 'FAILED'
+        })
+
+    def test_steps_finishing_out_of_order_are_all_counted(self):
+        self.orphan('dag', 'IN_PROGRESS', {'ReserveSeat': 'STARTED', 'AuthorizePayment': 'STARTED'})
+        saga_state.step_succeeded('dag', 'AuthorizePayment')
+        self.assertEqual(SagaTransaction.objects.get(correlation_id='dag').steps_completed, 1)
+
+        threads = [threading.Thread(target=saga_state.step_succeeded, args=('dag', name))
+                   for name in ('ReserveSeat', 'AwardMiles')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        transaction = SagaTransaction.objects.get(correlation_id='dag')
+        self.assertEqual(transaction.steps_completed, 3)
+        self.assertEqual(set(transaction.step_outcomes.values()), {'SUCCEEDED'})
+        self.assertEqual(saga_state._saga_locks, {})
+
+    def test_resumes_interrupted_saga_from_step_in_progress(self):
+        self.orphan('crashed-forward', 'IN_PROGRESS', {'ReserveSeat': 'SUCCEEDED', 'AuthorizePayment': 'STARTED'})
+        SagaQueueItem.objects.create(correlation_id='crashed-forward', booking_data={}, status='INTERRUPTED')
+        # Still being worked on elsewhere
+        self.orphan('recent', 'IN_PROGRESS', {'ReserveSeat': 'STARTED'}, minutes_ago=0)
+
+        self.assertEqual(self.worker.recover_stale(), 1)
+
+        self.assertEqual(self.services.actions, ['authorize-payment', 'award-miles', 'confirm-booking'])
+        transaction = SagaTransaction.objects.get(correlation_id='crashed-forward')
+        self.assertEqual(transaction.status, 'COMPLETED')
+        self.assertEqual(transaction.recovery_attempts, 1)
+        self.assertEqual(SagaQueueItem.objects.get(correlation_id='crashed-forward').status, 'COMPLETED')
+        self.assertEqual(SagaTransaction.objects.get(correlation_id='recent').status, 'IN_PROGRESS')
+        self.assertEqual(self.worker.recover_stale(), 0)
+
+    def test_rolls_back_saga_interrupted_while_compensating(self):
+        self.orphan('crashed-rollback', 'COMPENSATING', {
+            'ReserveSeat': 'SUCCEEDED', 'AuthorizePayment': 'COMPENSATED', 'AwardMiles': 'FAILED'
+        }, failed_step='AwardMiles', error_message='Loyalty service unavailable')
+
+        self.assertEqual(self.worker.recover_stale(), 1)
+
+        self.assertEqual(self.services.actions, ['cancel-seat'])
+        transaction = SagaTransaction.objects.get(correlation_id='crashed-rollback')
+        self.assertEqual(transaction.status, 'FAILED')
+        self.assertEqual(transaction.step_outcomes['ReserveSeat'], 'COMPENSATED')
+        self.assertIn('Loyalty service unavailable', transaction.error_message)
+        self.assertTrue(Ticket.objects.filter(status='FAILED').exists())
+        self.assertEqual(self.worker.stats()['rolled_back'], 1)
+
+    def test_gives_up_resuming_after_repeated_attempts(self):
+        self.orphan('crash-loop', 'IN_PROGRESS', {'ReserveSeat': 'SUCCEEDED', 'AuthorizePayment': 'STARTED'},
+                    recovery_attempts=2)
+
+        self.worker.recover_stale()
+
+        # The payment may have been authorized before the crash, so it is cancelled too
+        self.assertCountEqual(self.services.actions, ['cancel-payment', 'cancel-seat'])
+        self.assertEqual(SagaTransaction.objects.get(correlation_id='crash-loop').failed_step, 'AuthorizePayment')
+
+
+class GatedOrchestrator:
+    """Orchestrator stand-in that holds every SAGA until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def start_booking_saga(self, booking_data):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.release.wait(10)
+        with self.lock:
+            self.running -= 1
+        return {'success': True, 'correlation_id': booking_data['correlation_id']}
+
+
+class SagaWorkerPoolTests(TransactionTestCase):
+    def setUp(self):
+        self.orchestrator = GatedOrchestrator()
+
+    def make_pool(self, workers, max_depth):
+        pool = SagaWorkerPool(workers=workers, max_depth=max_depth, orchestrator_factory=lambda: self.orchestrator)
+        self.addCleanup(pool.stop, 10)
+        # Cleanups run last-in first-out: release held SAGAs before stopping
+        self.addCleanup(self.orchestrator.release.set)
+        return pool
+
+    def wait_for(self, condition, timeout=10):
+        deadline = clock.monotonic() + timeout
+        while not condition():
+            self.assertLess(clock.monotonic(), deadline, 'condition not reached')
+            clock.sleep(0.02)
+
+    def test_runs_queued_sagas_with_bounded_concurrency(self):
+        pool = self.make_pool(workers=2, max_depth=10)
+        for i in range(5):
+            pool.enqueue({'flight_id': 1}, f'saga-{i}')
+
+        self.wait_for(lambda: pool.stats()['running'] == 2)
+        stats = pool.stats()
+        self.assertEqual((stats['queued'], stats['busy_workers'], stats['accepted']), (3, 2, 5))
+        self.assertEqual(SagaQueueItem.objects.get(correlation_id='saga-0').booking_data['correlation_id'], 'saga-0')
+
+        self.orchestrator.release.set()
+        self.wait_for(lambda: pool.stats()['completed'] == 5)
+        self.assertEqual(self.orchestrator.peak, 2)
+        self.assertEqual(SagaQueueItem.objects.filter(status='COMPLETED').count(), 5)
+
+    def test_rejects_when_queue_is_full(self):
+        pool = self.make_pool(workers=1, max_depth=2)
+        pool.enqueue({}, 'running')
+        self.wait_for(lambda: pool.stats()['running'] == 1)
+        pool.enqueue({}, 'waiting-1')
+        pool.enqueue({}, 'waiting-2')
+
+        with self.assertRaises(SagaQueueFull):
+            pool.enqueue({}, 'overflow')
+        stats = pool.stats()
+        self.assertEqual((stats['queued'], stats['rejected'], stats['queue_utilization']), (2, 1, 1.0))
+        self.assertFalse(SagaQueueItem.objects.filter(correlation_id='overflow').exists())
+
+    def test_restart_runs_queued_and_interrupts_running(self):
+        SagaQueueItem.objects.create(correlation_id='left-running', booking_data={}, status='RUNNING')
+        SagaQueueItem.objects.create(correlation_id='left-queued', booking_data={'correlation_id': 'left-queued'})
+        self.orchestrator.release.set()
+
+        pool = self.make_pool(workers=1, max_depth=10)
+        pool.start()
+        self.wait_for(lambda: SagaQueueItem.objects.get(correlation_id='left-queued').status == 'COMPLETED')
+        self.assertEqual(SagaQueueItem.objects.get(correlation_id='left-running').status, 'INTERRUPTED')
+
+    def test_restart_leaves_rows_of_live_workers_alone(self):
+        host = socket.gethostname()
+        finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+        finished.wait()
+        now = timezone.now()
+        stale = now - timedelta(seconds=queue_module.RUNNING_LEASE_SECONDS + 1)
+        for correlation_id, owner, started_at in (
+            ('other-process', f'{host}:{os.getppid()}', now),
+            ('dead-process', f'{host}:{finished.pid}', now),
+            ('other-host', 'web-2:4242', now),
+            ('other-host-stale', 'web-2:4242', stale),
+        ):
+            SagaQueueItem.objects.create(correlation_id=correlation_id, booking_data={}, status='RUNNING',
+                                         owner=owner, started_at=started_at)
+
+        self.make_pool(workers=1, max_depth=10).start()
+        statuses = dict(SagaQueueItem.objects.values_list('correlation_id', 'status'))
+        expected = {'other-process': 'RUNNING', 'dead-process': 'INTERRUPTED',
+                    'other-host': 'RUNNING', 'other-host-stale': 'INTERRUPTED'}
+        if os.name != 'posix':
+            expected['dead-process'] = 'RUNNING'
+        self.assertEqual(statuses, expected)
+
+    def test_async_start_answers_503_when_queue_is_full(self):
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+        with mock.patch.object(saga_worker_pool, 'max_depth', 0):
+            response = self.client.post(reverse('saga_start_booking_async'), {
+                'flight_id': flight.id,
+                'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace'}],
+                'contact_info': {'email': 'ada@example.com'}
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(SagaQueueItem.objects.count(), 0)
+
+        stats = self.client.get(reverse('saga_queue_stats')).json()
+        self.assertEqual((stats['queued'], stats['max_depth']), (0, saga_worker_pool.max_depth))
+
+
+@mock.patch.object(log_storage_module, 'FLUSH_INTERVAL', 60)
+class SagaLogStorageTests(TransactionTestCase):
+    def setUp(self):
+        self.storage = SagaLogStorage()
+
+    def add(self, correlation_id, count):
+        for i in range(count):
+            self.storage.add_log(correlation_id, f'Step{i}', 'Test Service', 'info', f'entry {i}')
+
+    def test_entries_are_buffered_and_written_in_one_insert(self):
+        self.add('saga-a', 3)
+        self.add('saga-b', 2)
+        self.assertEqual(SagaLogEntry.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.storage.flush('saga-a')
+        self.assertEqual(sum(q['sql'].startswith('INSERT') for q in queries.captured_queries), 1)
+        self.assertEqual(SagaLogEntry.objects.filter(correlation_id='saga-a').count(), 3)
+        self.assertEqual(SagaLogEntry.objects.filter(correlation_id='saga-b').count(), 0)
+
+    def test_reader_flushes_and_sees_logging_order(self):
+        self.add('saga-a', 3)
+        SagaLogEntry.objects.create(
+            correlation_id='saga-a', step_name='Early', service='Other Process', message='first',
+            timestamp=self.storage._pending['saga-a'][0].timestamp - timedelta(seconds=1)
+        )
+        logs = self.storage.get_logs('saga-a')
+        self.assertEqual([log['message'] for log in logs], ['first', 'entry 0', 'entry 1', 'entry 2'])
+        self.assertEqual(self.storage._pending_count, 0)
+
+    def test_size_threshold_triggers_flush(self):
+        with mock.patch.object(log_storage_module, 'FLUSH_MAX_ENTRIES', 4):
+            self.add('saga-a', 3)
+            self.assertEqual(SagaLogEntry.objects.count(), 0)
+            self.add('saga-b', 1)
+        self.assertEqual(SagaLogEntry.objects.count(), 4)
+
+    def test_in_flight_logs_are_served_from_memory(self):
+        SagaLogEntry.objects.create(correlation_id='saga-a', step_name='SAGA_START', service='Backend', message='accepted')
+        self.storage.begin('saga-a')
+        self.add('saga-a', 2)
+
+        with self.assertNumQueries(0):
+            logs = self.storage.get_logs('saga-a')
+        self.assertEqual([log['message'] for log in logs], ['accepted', 'entry 0', 'entry 1'])
+
+        self.storage.complete('saga-a')
+        self.assertEqual([log['message'] for log in self.storage.get_logs('saga-a')], ['accepted', 'entry 0', 'entry 1'])
+        stats = self.storage.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['in_flight_sagas']), (1, 1, 0))
+
+    def test_failed_write_is_kept_and_retried(self):
+        self.storage.begin('saga-a')
+        self.add('saga-a', 2)
+        with mock.patch.object(SagaLogEntry.objects, 'bulk_create', side_effect=OperationalError('database is locked')):
+            self.assertFalse(self.storage.flush())
+            self.add('saga-a', 1)
+            self.storage.complete('saga-a')
+
+        self.assertEqual(SagaLogEntry.objects.count(), 0)
+        self.assertEqual([entry.message for entry in self.storage._pending['saga-a']], ['entry 0', 'entry 1', 'entry 0'])
+        self.assertEqual(len(self.storage.get_logs('saga-a')), 3)
+
+        self.assertTrue(self.storage.flush())
+        self.assertEqual(SagaLogEntry.objects.count(), 3)
+        self.assertNotIn('saga-a', self.storage.logs)
+        self.assertEqual(self.storage.cache_stats()['pending_writes'], 0)
+
+    def test_memory_tier_is_bounded_by_size_and_age(self):
+        with mock.patch.object(log_storage_module, 'MEMORY_MAX_SAGAS', 2):
+            for correlation_id in ('saga-a', 'saga-b', 'saga-c'):
+                self.storage.begin(correlation_id)
+                self.add(correlation_id, 1)
+            self.assertEqual(list(self.storage.logs), ['saga-b', 'saga-c'])
+
+            self.storage._touched['saga-b'] -= log_storage_module.MEMORY_MAX_AGE + 1
+            self.assertEqual(len(self.storage.get_logs('saga-b')), 1)
+        stats = self.storage.cache_stats()
+        self.assertEqual((stats['evictions'], stats['misses'], stats['in_flight_sagas']), (2, 1, 1))
+
+
+class SagaLogStreamTests(TransactionTestCase):
+    @staticmethod
+    def parse(frames):
+        events = []
+        for frame in ''.join(frames).split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in frame.split('\n') if ': ' in line and not line.startswith(':'))
+            if 'event' in fields:
+                events.append((fields['event'], fields.get('id'), json.loads(fields['data'])))
+        return events
+
+    def test_resumed_stream_sends_only_new_entries_then_ends(self):
+        SagaQueueItem.objects.create(correlation_id='saga-a', booking_data={}, status='COMPLETED')
+        for i in range(3):
+            SagaLogEntry.objects.create(correlation_id='saga-a', step_name=f'Step{i}', service='Backend', message=f'entry {i}')
+
+        response = self.client.get(reverse('saga_log_stream', args=['saga-a']), HTTP_LAST_EVENT_ID='1')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = self.parse(chunk.decode() for chunk in response.streaming_content)
+
+        self.assertEqual([(e, i) for e, i, _ in events], [('log', '2'), ('log', '3'), ('status', None), ('end', None)])
+        self.assertEqual(events[0][2]['message'], 'entry 1')
+        self.assertEqual(events[3][2], {'correlation_id': 'saga-a', 'status': 'COMPLETED', 'total_logs': 3})
+
+    @mock.patch('flight.saga_stream.STREAM_POLL_INTERVAL', 5)
+    def test_in_flight_entries_are_pushed_as_they_are_logged(self):
+        item = SagaQueueItem.objects.create(correlation_id='saga-b', booking_data={}, status='RUNNING')
+        saga_log_storage.begin('saga-b')
+        saga_log_storage.add_log('saga-b', 'ReserveSeat', 'Backend', 'info', 'first')
+
+        stream = saga_event_stream('saga-b')
+        frames = [next(stream), next(stream), next(stream)]
+        self.assertEqual([e for e, _, _ in self.parse(frames)], ['log', 'status'])
+
+        def finish():
+            clock.sleep(0.1)
+            saga_log_storage.add_log('saga-b', 'ConfirmBooking', 'Backend', 'success', 'second')
+            saga_log_storage.complete('saga-b')
+            SagaQueueItem.objects.filter(pk=item.pk).update(status='COMPLETED')
+            saga_log_storage.notify_change()
+        writer = threading.Thread(target=finish)
+        started = clock.monotonic()
+        writer.start()
+        events = self.parse(list(stream))
+        writer.join()
+
+        self.assertEqual([(e, d.get('message') or d.get('status')) for e, _, d in events],
+                         [('log', 'second'), ('status', 'COMPLETED'), ('end', 'COMPLETED')])
+        # Woken by the write rather than waiting out the poll interval
+        self.assertLess(clock.monotonic() - started, 5)
+
+
+    def test_final_status_is_written_after_the_log(self):
+        flight = Flight.objects.create(
+            origin=Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA'),
+            destination=Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA'),
+            depart_time=time(8, 0), arrival_time=time(10, 30), duration=timedelta(hours=2, minutes=30),
+            plane='A321', airline='American Airlines', flight_number='AA100', economy_fare=150
+        )
+        SagaTransaction.objects.create(correlation_id='saga-d', flight=flight, booking_data={}, status='IN_PROGRESS')
+        saga_log_storage.begin('saga-d')
+        self.addCleanup(saga_log_storage.complete, 'saga-d')
+        saga_log_storage.add_log('saga-d', 'ConfirmBooking', 'Backend', 'success', 'last step')
+
+        saga_state.finish('saga-d', 'COMPLETED')
+
+        # What a stream in another process reads once it sees the final status
+        self.assertEqual(list(SagaLogEntry.objects.filter(correlation_id='saga-d').values_list('message', flat=True)),
+                         ['last step'])
+
+    def test_open_streams_are_bounded(self):
+        SagaQueueItem.objects.create(correlation_id='saga-e', booking_data={}, status='COMPLETED')
+        with mock.patch.object(saga_stream_slots, 'limit', 1):
+            first = self.client.get(reverse('saga_log_stream', args=['saga-e']))
+            refused = self.client.get(reverse('saga_log_stream', args=['saga-e']))
+            self.assertEqual(refused.status_code, 503)
+            self.assertEqual(refused['Retry-After'], str(stream_module.STREAM_RETRY_AFTER_SECONDS))
+
+            first.close()
+            again = self.client.get(reverse('saga_log_stream', args=['saga-e']))
+            self.assertEqual(again.status_code, 200)
+            self.assertEqual(self.parse(chunk.decode() for chunk in again.streaming_content)[-1][0], 'end')
+        self.assertEqual(saga_stream_slots.stats()['open'], 0)
+
+
+class SagaBenchmarkTests(TransactionTestCase):
+    def setUp(self):
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+
+    def test_reports_both_booking_paths(self):
+        with SagaBenchmark(self.flight.id, payment_latency=0, loyalty_latency=0) as benchmark:
+            reports = [benchmark.run(mode, sagas=3, concurrency=1) for mode in ('sync', 'async')]
+
+        for report in reports:
+            self.assertEqual((report['completed'], report['failed'], report['error']), (3, 0, 0))
+            self.assertGreater(report['throughput_per_second'], 0)
+            self.assertLessEqual(report['latency_ms']['p50'], report['latency_ms']['p99'])
+            self.assertGreater(report['queries_per_saga'], 0)
+        self.assertEqual(benchmark.payment.calls, 6)
+        self.assertEqual(Ticket.objects.filter(status='CONFIRMED').count(), 6)
+
+    def test_stub_failures_are_compensated_and_reported(self):
+        with SagaBenchmark(self.flight.id, payment_latency=0, loyalty_latency=0, loyalty_failure_rate=1.0) as benchmark:
+            report = benchmark.run('sync', sagas=2, concurrency=2)
+
+        self.assertEqual(report['failed'], 2)
+        self.assertEqual(report['failure_reasons'], {'SAGA failed at step AwardMiles: Stub loyalty award-miles failure': 2})
+        # Each declined miles award cancels its payment authorization
+        self.assertEqual(benchmark.payment.calls, 4)
+
+
+class SagaMetricsTests(TransactionTestCase):
+    def setUp(self):
+        self.services = StubSagaServices(delay=0.05)
+        self.addCleanup(self.services.stop)
+        self.orchestrator = self.services.point(AsyncBookingOrchestrator())
+        self.addCleanup(self.orchestrator.close)
+        self.metrics = SagaMetrics()
+        for module in ('saga_orchestrator_fixed', 'saga_orchestrator_async', 'saga_views_complete'):
+            patcher = mock.patch(f'flight.{module}.saga_metrics', self.metrics)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        origin = Place.objects.create(city='Dallas', airport='DFW International', code='DFW', country='USA')
+        destination = Place.objects.create(city='Chicago', airport="O'Hare International", code='ORD', country='USA')
+        self.flight = Flight.objects.create(
+            origin=origin, destination=destination,
+            depart_time=time(8, 0), arrival_time=time(10, 30),
+            duration=timedelta(hours=2, minutes=30), plane='A321',
+            airline='American Airlines', flight_number='AA100',
+            economy_fare=150, business_fare=600, first_fare=0
+        )
+
+    def booking_data(self, **flags):
+        return {
+            'flight_id': self.flight.id,
+            'passengers': [{'first_name': 'Ada', 'last_name': 'Lovelace', 'gender': 'female'}],
+            'contact_info': {'email': 'ada@example.com', 'mobile': '555'},
+            **flags
+        }
+
+    def scrape(self):
+        response = self.client.get(reverse('saga_metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode().splitlines()
+
+    def test_steps_compensations_and_sagas_are_counted_and_timed(self):
+        self.assertTrue(self.orchestrator.start_booking_saga(self.booking_data())['success'])
+        self.assertFalse(self.orchestrator.start_booking_saga(self.booking_data(simulate_awardmiles_fail=True))['success'])
+
+        lines = self.scrape()
+        for line in (
+            'saga_in_flight 0',
+            'saga_queue_depth{status="queued"} 0',
+            'saga_transactions_in_flight{status="IN_PROGRESS"} 0',
+            'saga_total{outcome="completed"} 1',
+            'saga_total{outcome="failed"} 1',
+            'saga_steps_total{step="ReserveSeat",outcome="success"} 2',
+            'saga_steps_total{step="AwardMiles",outcome="failure"} 1',
+            'saga_steps_total{step="ConfirmBooking",outcome="success"} 1',
+            'saga_step_duration_seconds_count{step="ReserveSeat"} 2',
+            # The stub services answer after 50 ms
+            'saga_step_duration_seconds_bucket{step="ReserveSeat",le="0.025"} 0',
+            'saga_compensations_total{step="AuthorizePayment",outcome="success"} 1',
+            'saga_compensation_duration_seconds_count{step="ReserveSeat"} 1',
+            'saga_duration_seconds_count{outcome="completed"} 1',
+        ):
+            self.assertIn(line, lines)
+        self.assertIn('# TYPE saga_step_duration_seconds histogram', lines)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('step_seconds', 'Step latency.', ('step',), buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 0.7, 30):
+            histogram.observe(seconds, 'Reserve "Seat"')
+
+        self.assertEqual(histogram.render()[2:], [
+            'step_seconds_bucket{step="Reserve \\"Seat\\"",le="0.1"} 1',
+            'step_seconds_bucket{step="Reserve \\"Seat\\"",le="1.0"} 3',
+            'step_seconds_bucket{step="Reserve \\"Seat\\"",le="+Inf"} 4',
+            'step_seconds_sum{step="Reserve \\"Seat\\""} 31.25',
+            'step_seconds_count{step="Reserve \\"Seat\\""} 4',
+        ])
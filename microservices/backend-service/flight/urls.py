@@ -17,7 +17,11 @@ urlpatterns = [
     
     # Flights
     path('flights/search/', simple_views.flight_search, name='flight_search'),
+    path('flights/search/flex/', simple_views.flight_search_flex, name='flight_search_flex'),
+    path('flights/search/connections/', simple_views.flight_search_connections, name='flight_search_connections'),
+    path('flights/fare-calendar/', simple_views.fare_calendar_view, name='fare_calendar'),
     path('flights/<int:flight_id>/', simple_views.get_flight_detail, name='flight_detail'),
+    path('flights/<int:flight_id>/seat-map/', simple_views.get_seat_map, name='flight_seat_map'),
     path('flights/book/', simple_views.book_flight, name='book_flight'),
     
     # Tickets
@@ -41,6 +45,10 @@ if SAGA_AVAILABLE:
         # SAGA Management endpoints
         path('saga/status/<str:correlation_id>/', saga_views_complete.get_saga_status, name='saga_status'),
         path('saga/logs/<str:correlation_id>/', saga_views_complete.get_saga_logs, name='saga_logs'),
+        path('saga/logs/<str:correlation_id>/stream/', saga_views_complete.stream_saga_logs, name='saga_log_stream'),
+        path('saga/queue/', saga_views_complete.get_saga_queue_stats, name='saga_queue_stats'),
+        path('saga/breakers/', saga_views_complete.get_saga_breakers, name='saga_breakers'),
+        path('saga/metrics/', saga_views_complete.get_saga_metrics, name='saga_metrics'),
         path('saga/create-demo-log/', saga_views_complete.create_demo_log, name='create_demo_log'),
         path('saga/demo-failure/', saga_views_complete.demo_saga_failure, name='saga_demo_failure'),
 
@@ -13,6 +13,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 from .models import User, Place, Flight, Passenger, Ticket, Week
+from .route_index import DEFAULT_AIRLINE_CODES
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, LoginSerializer,
     PlaceSerializer, FlightSerializer, PassengerSerializer, TicketSerializer,
@@ -103,13 +104,9 @@ def flight_search(request):
         
         origin = Place.objects.get(code=origin_code)
         destination = Place.objects.get(code=destination_code)
-        flight_day = Week.objects.get(number=depart_date.weekday())
-        
-        flights = Flight.objects.filter(
+        flights = Flight.objects.operating_on(depart_date.weekday()).by_airlines(DEFAULT_AIRLINE_CODES).filter(
             origin=origin,
-            destination=destination,
-            depart_day=flight_day,
-            airline__icontains='American Airlines'
+            destination=destination
         )
         
         if seat_class == 'economy':
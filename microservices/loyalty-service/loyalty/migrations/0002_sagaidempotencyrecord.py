@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loyalty', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SagaIdempotencyRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('correlation_id', models.CharField(max_length=50)),
+                ('step', models.CharField(max_length=30)),
+                ('status_code', models.IntegerField(blank=True, null=True)),
+                ('response_body', models.TextField(blank=True, default='')),
+                ('claimed_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='sagaidempotencyrecord',
+            constraint=models.UniqueConstraint(fields=('correlation_id', 'step'), name='saga_idempotency_key'),
+        ),
+        migrations.AddIndex(
+            model_name='sagaidempotencyrecord',
+            index=models.Index(fields=['expires_at'], name='saga_idempotency_expiry_idx'),
+        ),
+    ]
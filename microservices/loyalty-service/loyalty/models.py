@@ -95,4 +95,25 @@ class SagaMilesAward(models.Model):
     reversed_at = models.DateTimeField(null=True, blank=True)
     
     def __str__(self):
-        return f"SAGA Miles {self.correlation_id} - {self.miles_awarded} miles - {self.status}"
\ No newline at end of file
+        return f"SAGA Miles {self.correlation_id} - {self.miles_awarded} miles - {self.status}"
+
+
+class SagaIdempotencyRecord(models.Model):
+    """First successful response of a SAGA step call, replayed to retries of the same step"""
+    correlation_id = models.CharField(max_length=50)
+    step = models.CharField(max_length=30)
+    status_code = models.IntegerField(null=True, blank=True)  # None while the first call is running
+    response_body = models.TextField(blank=True, default='')
+    claimed_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['correlation_id', 'step'], name='saga_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='saga_idempotency_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"SAGA {self.correlation_id} {self.step} - {self.status_code or 'in progress'}"
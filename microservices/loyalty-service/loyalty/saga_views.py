@@ -8,6 +8,7 @@ import json
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from .saga_idempotency import idempotent_step
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +18,7 @@ from django.utils import timezone
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent_step("AwardMiles")
 def award_miles(request):
     """SAGA Step 3: Award miles for successful booking"""
     try:
@@ -25,15 +27,6 @@ def award_miles(request):
         booking_data = data.get('booking_data', {})
         simulate_failure = data.get('simulate_failure', False)
 
-        # DIAGNOSTIC: detect duplicate/retried calls
-        remote_addr = request.META.get('REMOTE_ADDR')
-        forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        logger.info(f"[LOYALTY IDEMPOTENCY DEBUG] AwardMiles called correlation_id={correlation_id} remote={remote_addr} xff={forwarded_for}")
-        if correlation_id:
-            existing_awards = SagaMilesAward.objects.filter(correlation_id=correlation_id).count()
-            existing_txn = LoyaltyTransaction.objects.filter(transaction_id=f"SAGA-{correlation_id[:8]}").count()
-            logger.info(f"[LOYALTY IDEMPOTENCY DEBUG] AwardMiles precheck correlation_id={correlation_id} SagaMilesAward.count={existing_awards} LoyaltyTransaction(SAGA-*).count={existing_txn}")
-
         logger.info(f"[SAGA LOYALTY] 📝 Logging detailed transaction for loyalty point history.")
         
         logger.info(f"[SAGA LOYALTY] 🎯 AwardMiles step initiated for correlation_id: {correlation_id}")
@@ -134,6 +127,7 @@ def award_miles(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent_step("ReverseMiles")
 def reverse_miles(request):
     """SAGA Compensation: Reverse miles award"""
     try:
@@ -141,16 +135,6 @@ def reverse_miles(request):
         correlation_id = data.get('correlation_id')
         compensation_reason = data.get('compensation_reason', 'SAGA compensation')
 
-        # DIAGNOSTIC: detect duplicate/retried calls
-        remote_addr = request.META.get('REMOTE_ADDR')
-        forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        logger.info(f"[LOYALTY IDEMPOTENCY DEBUG] ReverseMiles called correlation_id={correlation_id} remote={remote_addr} xff={forwarded_for}")
-        if correlation_id:
-            existing_awards = SagaMilesAward.objects.filter(correlation_id=correlation_id).count()
-            existing_reversed_awards = SagaMilesAward.objects.filter(correlation_id=correlation_id, status='REVERSED').count()
-            existing_comp_txn = LoyaltyTransaction.objects.filter(transaction_id=f"COMP-{correlation_id[:8]}").count()
-            logger.info(f"[LOYALTY IDEMPOTENCY DEBUG] ReverseMiles precheck correlation_id={correlation_id} SagaMilesAward.count={existing_awards} SagaMilesAward(REVERSED).count={existing_reversed_awards} LoyaltyTransaction(COMP-*).count={existing_comp_txn}")
-
         # DIAGNOSTIC: Enhanced logging for compensation debugging
         logger.info(f"[COMPENSATION_DEBUG] ===== LOYALTY COMPENSATION RECEIVED =====")
         logger.info(f"[COMPENSATION_DEBUG] Request method: {request.method}")
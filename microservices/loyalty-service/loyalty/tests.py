@@ -1,11 +1,13 @@
 import json
 from django.test import TestCase, Client
 from django.urls import reverse
-from .models import LoyaltyAccount, LoyaltyTransaction, SagaMilesAward
+from .models import LoyaltyAccount, LoyaltyTransaction, SagaMilesAward, SagaIdempotencyRecord
+from .saga_idempotency import saga_idempotency
 
 class LoyaltyServiceTests(TestCase):
     def setUp(self):
         self.client = Client()
+        saga_idempotency.clear_cache()
         self.award_miles_url = reverse('award_miles')
         self.reverse_miles_url = reverse('reverse_miles')
         self.user_id = "test_user"
@@ -54,4 +56,39 @@ class LoyaltyServiceTests(TestCase):
         self.assertTrue(response.json().get("success"))
         self.assertEqual(LoyaltyTransaction.objects.count(), 1)
         self.assertEqual(SagaMilesAward.objects.get(correlation_id=self.correlation_id).status, "REVERSED")
-        self.assertEqual(LoyaltyAccount.objects.get(user_id=self.user_id).points_balance, 100)
\ No newline at end of file
+        self.assertEqual(LoyaltyAccount.objects.get(user_id=self.user_id).points_balance, 100)
+
+    def test_retried_award_is_replayed(self):
+        """Test a retried AwardMiles returns the first response without awarding again"""
+        data = {
+            "correlation_id": self.correlation_id,
+            "booking_data": {
+                "user_id": self.user_id,
+                "flight_fare": self.flight_fare
+            }
+        }
+        first = self.client.post(self.award_miles_url, json.dumps(data), content_type="application/json")
+        saga_idempotency.clear_cache()
+        retry = self.client.post(self.award_miles_url, json.dumps(data), content_type="application/json")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(SagaMilesAward.objects.count(), 1)
+        self.assertEqual(LoyaltyAccount.objects.get(user_id=self.user_id).points_balance, 300)
+
+    def test_failed_award_is_not_stored(self):
+        """Test an AwardMiles that failed can be retried"""
+        data = {
+            "correlation_id": self.correlation_id,
+            "booking_data": {
+                "user_id": self.user_id,
+                "flight_fare": self.flight_fare
+            },
+            "simulate_failure": True
+        }
+        response = self.client.post(self.award_miles_url, json.dumps(data), content_type="application/json")
+        self.assertFalse(response.json().get("success"))
+        self.assertFalse(SagaIdempotencyRecord.objects.exists())
+
+        data["simulate_failure"] = False
+        response = self.client.post(self.award_miles_url, json.dumps(data), content_type="application/json")
+        self.assertTrue(response.json().get("success"))
+        self.assertEqual(LoyaltyAccount.objects.get(user_id=self.user_id).points_balance, 300)
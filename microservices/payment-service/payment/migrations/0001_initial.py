@@ -0,0 +1,42 @@
+# Generated by Django 3.1.2 on 2026-10-17 03:02
+
+from django.db import migrations, models
+
+
+def create_payment_authorization_table(apps, schema_editor):
+    PaymentAuthorization = apps.get_model('payment', 'PaymentAuthorization')
+    # Databases set up before the app had migrations already have the table
+    if PaymentAuthorization._meta.db_table not in schema_editor.connection.introspection.table_names():
+        schema_editor.create_model(PaymentAuthorization)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='PaymentAuthorization',
+                    fields=[
+                        ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('correlation_id', models.CharField(max_length=50)),
+                        ('authorization_id', models.CharField(max_length=50, unique=True)),
+                        ('amount', models.FloatField()),
+                        ('flight_fare', models.FloatField()),
+                        ('other_charges', models.FloatField()),
+                        ('currency', models.CharField(default='USD', max_length=3)),
+                        ('status', models.CharField(choices=[('AUTHORIZED', 'Authorized'), ('CANCELLED', 'Cancelled'), ('EXPIRED', 'Expired')], default='AUTHORIZED', max_length=15)),
+                        ('payment_method', models.CharField(default='mock_card', max_length=20)),
+                        ('authorized_at', models.DateTimeField(auto_now_add=True)),
+                        ('cancelled_at', models.DateTimeField(blank=True, null=True)),
+                    ],
+                ),
+            ],
+        ),
+        migrations.RunPython(create_payment_authorization_table, migrations.RunPython.noop),
+    ]
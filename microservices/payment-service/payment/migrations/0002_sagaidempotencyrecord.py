@@ -0,0 +1,33 @@
+# Generated by Django 3.1.2 on 2026-10-17 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SagaIdempotencyRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('correlation_id', models.CharField(max_length=50)),
+                ('step', models.CharField(max_length=30)),
+                ('status_code', models.IntegerField(blank=True, null=True)),
+                ('response_body', models.TextField(blank=True, default='')),
+                ('claimed_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='sagaidempotencyrecord',
+            index=models.Index(fields=['expires_at'], name='saga_idempotency_expiry_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='sagaidempotencyrecord',
+            constraint=models.UniqueConstraint(fields=('correlation_id', 'step'), name='saga_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,198 @@
+"""
+SAGA Step Idempotency
+Keeps the first successful response of each (correlation_id, step) and replays it to retries
+"""
+# Every service builds its image from its own directory, so there is no shared package to import
+# this from; identical copies live in backend-service/flight, payment-service/payment and
+# loyalty-service/loyalty, and flight/tests.py in the backend fails as soon as they differ.
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from functools import wraps
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import SagaIdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+# How long a stored response is replayed before it is purged
+IDEMPOTENCY_TTL = timedelta(seconds=getattr(settings, 'SAGA_IDEMPOTENCY_TTL_SECONDS', 24 * 3600))
+
+# Stored responses kept in memory per process
+CACHE_SIZE = 10000
+
+# Seconds between purges of expired rows
+PURGE_INTERVAL = 300
+
+# Seconds after which the claim of a call that never finished may be taken over
+CLAIM_TIMEOUT = 60
+
+
+class SagaIdempotencyStore:
+    """
+    Durable idempotency keys for SAGA step endpoints.
+
+    The first call for a key claims it with an insert that the unique
+    (correlation_id, step) constraint lets only one caller win, runs the
+    step and stores its response. Retries are answered from a bounded
+    in-memory cache or, in another process, from that indexed row, without
+    running the step again. A call that fails releases its claim, since it
+    left nothing to protect and the step may be retried. Expired rows are
+    purged every PURGE_INTERVAL through the expires_at index.
+    """
+
+    def __init__(self, ttl: timedelta = IDEMPOTENCY_TTL, cache_size: int = CACHE_SIZE):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[Tuple[str, str], Tuple[int, str, object]]' = OrderedDict()
+        self._last_purge = time.monotonic()
+        self.replays = 0
+
+    def lookup(self, key: Tuple[str, str]) -> Optional[Tuple[int, str]]:
+        """Stored (status, body) for a key, or None if no call has finished yet"""
+        now = timezone.now()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                if cached[2] > now:
+                    self._cache.move_to_end(key)
+                    return cached[0], cached[1]
+                del self._cache[key]
+        record = SagaIdempotencyRecord.objects.filter(
+            correlation_id=key[0], step=key[1], status_code__isnull=False, expires_at__gt=now
+        ).first()
+        if record is None:
+            return None
+        self._remember(key, record.status_code, record.response_body, record.expires_at)
+        return record.status_code, record.response_body
+
+    def claim(self, key: Tuple[str, str]) -> bool:
+        """Reserve a key for the calling request; False while another call holds it"""
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                SagaIdempotencyRecord.objects.create(
+                    correlation_id=key[0], step=key[1], claimed_at=now, expires_at=now + self.ttl
+                )
+            return True
+        except IntegrityError:
+            pass
+        records = SagaIdempotencyRecord.objects.filter(correlation_id=key[0], step=key[1])
+        # An expired key starts over, and so does a claim whose call died before answering
+        expired = records.filter(expires_at__lte=now).update(
+            status_code=None, response_body='', claimed_at=now, expires_at=now + self.ttl
+        )
+        abandoned = expired or records.filter(
+            status_code__isnull=True, claimed_at__lt=now - timedelta(seconds=CLAIM_TIMEOUT)
+        ).update(claimed_at=now, expires_at=now + self.ttl)
+        return bool(abandoned)
+
+    def complete(self, key: Tuple[str, str], status_code: int, body: str):
+        expires_at = timezone.now() + self.ttl
+        SagaIdempotencyRecord.objects.filter(correlation_id=key[0], step=key[1]).update(
+            status_code=status_code, response_body=body, expires_at=expires_at
+        )
+        self._remember(key, status_code, body, expires_at)
+        self._maybe_purge()
+
+    def replayed(self):
+        with self._lock:
+            self.replays += 1
+
+    def release(self, key: Tuple[str, str]):
+        SagaIdempotencyRecord.objects.filter(correlation_id=key[0], step=key[1], status_code__isnull=True).delete()
+
+    def _remember(self, key, status_code, body, expires_at):
+        with self._lock:
+            self._cache[key] = (status_code, body, expires_at)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _maybe_purge(self):
+        with self._lock:
+            if time.monotonic() - self._last_purge < PURGE_INTERVAL:
+                return
+            self._last_purge = time.monotonic()
+        self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Delete expired keys; returns how many rows were removed"""
+        deleted, _ = SagaIdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+        if deleted:
+            logger.info(f"[SAGA IDEMPOTENCY] Purged {deleted} expired keys")
+        return deleted
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def _succeeded(response) -> bool:
+    if response.status_code != 200:
+        return False
+    try:
+        return bool(json.loads(response.content).get('success'))
+    except (ValueError, AttributeError):
+        return False
+
+
+def idempotent_step(step: str):
+    """
+    Make a SAGA step view replay its first successful response for a correlation_id.
+
+    Requests without a correlation_id are passed through unchanged. A request
+    arriving while the first call for its key is still running gets a 409.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                correlation_id = json.loads(request.body).get('correlation_id')
+            except (ValueError, AttributeError):
+                correlation_id = None
+            if not correlation_id:
+                return view(request, *args, **kwargs)
+
+            key = (correlation_id, step)
+            stored = saga_idempotency.lookup(key)
+            if stored is None and not saga_idempotency.claim(key):
+                stored = saga_idempotency.lookup(key)
+                if stored is None:
+                    logger.warning(f"[SAGA IDEMPOTENCY] {step} for {correlation_id} is already running")
+                    return JsonResponse({
+                        "success": False,
+                        "correlation_id": correlation_id,
+                        "error": f"{step} for {correlation_id} is already in progress"
+                    }, status=409)
+            if stored is not None:
+                saga_idempotency.replayed()
+                logger.info(f"[SAGA IDEMPOTENCY] Replaying stored {step} response for {correlation_id}")
+                status_code, body = stored
+                return HttpResponse(body, status=status_code, content_type='application/json')
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                saga_idempotency.release(key)
+                raise
+            if _succeeded(response):
+                saga_idempotency.complete(key, response.status_code, response.content.decode(response.charset))
+            else:
+                saga_idempotency.release(key)
+            return response
+        return wrapper
+    return decorator
+
+
+# Global instance
+saga_idempotency = SagaIdempotencyStore()
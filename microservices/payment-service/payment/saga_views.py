@@ -8,6 +8,7 @@ import json
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from .saga_idempotency import idempotent_step
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,7 @@ saga_payment_authorizations = {}
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent_step("AuthorizePayment")
 def authorize_payment(request):
     """SAGA Step 2: Authorize payment for booking"""
     try:
@@ -94,6 +96,7 @@ def authorize_payment(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent_step("CancelPayment")
 def cancel_payment(request):
     """SAGA Compensation: Cancel payment authorization"""
     try:
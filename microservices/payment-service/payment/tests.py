@@ -0,0 +1,55 @@
+import json
+from datetime import timedelta
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from .models import SagaIdempotencyRecord
+from .saga_idempotency import saga_idempotency
+from .saga_views import saga_payment_authorizations
+
+class PaymentSagaTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        saga_idempotency.clear_cache()
+        saga_payment_authorizations.clear()
+        self.authorize_url = reverse('saga_authorize_payment')
+        self.correlation_id = "test_correlation"
+        self.data = {
+            "correlation_id": self.correlation_id,
+            "booking_data": {"flight_fare": 200}
+        }
+
+    def post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type="application/json")
+
+    def test_authorize_payment(self):
+        """Test authorizing a payment for a booking"""
+        response = self.post(self.authorize_url, self.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json().get("success"))
+        self.assertEqual(response.json().get("amount"), 250.0)
+        self.assertEqual(saga_payment_authorizations[self.correlation_id]["status"], "AUTHORIZED")
+
+    def test_retried_authorization_is_replayed(self):
+        """Test a retried AuthorizePayment returns the first response without authorizing again"""
+        first = self.post(self.authorize_url, self.data)
+        saga_idempotency.clear_cache()
+        saga_payment_authorizations.clear()
+
+        retry = self.post(self.authorize_url, dict(self.data, booking_data={"flight_fare": 900}))
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertNotIn(self.correlation_id, saga_payment_authorizations)
+        self.assertEqual(SagaIdempotencyRecord.objects.count(), 1)
+
+    def test_authorization_in_progress_is_rejected(self):
+        """Test an AuthorizePayment arriving while the first call still runs gets a 409"""
+        now = timezone.now()
+        SagaIdempotencyRecord.objects.create(
+            correlation_id=self.correlation_id, step="AuthorizePayment",
+            claimed_at=now, expires_at=now + timedelta(hours=1)
+        )
+        response = self.post(self.authorize_url, self.data)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(response.json().get("success"))
+        self.assertNotIn(self.correlation_id, saga_payment_authorizations)
@@ -0,0 +1,54 @@
+"""
+Validated Response Cache
+Small LRU of backend GET bodies keyed by URL, revalidated with If-None-Match
+"""
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+# Flight detail and search pages revisited within a booking flow
+MAX_ENTRIES = 128
+
+
+class ValidatedResponseCache:
+    """
+    Keeps the last body and ETag per backend GET URL.
+
+    Entries are never served without asking the backend first: the ETag goes
+    out as If-None-Match and the stored body is reused only on a 304. Raw
+    bytes are stored so each caller decodes its own copy and can mutate it.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (etag, body bytes)
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(url, params=None) -> str:
+        if not params:
+            return url
+        return f"{url}?{urlencode(sorted(params.items()), doseq=True)}"
+
+    def get(self, key):
+        """(etag, body) for the URL, or None when nothing is cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def store(self, key, etag, body):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+# Global instance
+backend_response_cache = ValidatedResponseCache()
@@ -15,6 +15,7 @@ urlpatterns = [
     path("register/", views.register_view, name="register_slash"),
     path("query/places/<str:q>", views.query, name="query"),
     path("flight", views.flight, name="flight"),
+    path("flight/flex", views.flight_flex, name="flight_flex"),
     path("review", views.review, name="review"),
     path("flight/ticket/book", views.book, name="book"),
     path("flight/ticket/payment", views.payment, name="payment"),
@@ -30,6 +31,7 @@ urlpatterns = [
     path('aadvantage/dashboard', views.aadvantage_dashboard, name="aadvantage_dashboard"),
     path('saga/results', views.saga_results, name="saga_results"),
     path('api/saga/logs/<str:correlation_id>/', views.proxy_saga_logs, name="proxy_saga_logs"),
+    path('api/saga/logs/<str:correlation_id>/stream/', views.proxy_saga_log_stream, name="proxy_saga_log_stream"),
 ]
 
 if settings.DEBUG:
@@ -1,6 +1,6 @@
 
 from django.shortcuts import render
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth import authenticate, login, logout
@@ -14,6 +14,7 @@ import math
 import re
 from decimal import Decimal
 from . import loyalty_tracker
+from .response_cache import backend_response_cache
 
 # Fee and Surcharge variable
 FEE = 50.0
@@ -40,12 +41,18 @@ def call_backend_api(endpoint, method='GET', data=None, timeout=10, retries=3):
     if data:
         print(f"[DEBUG] Request data keys: {list(data.keys()) if isinstance(data, dict) else 'N/A'}")
     
+    # GET bodies are kept with their ETag and revalidated instead of re-downloaded
+    cache_key = backend_response_cache.key(url, data) if method == 'GET' else None
+    cached = None
+    
     for attempt in range(retries):
         try:
             print(f"[DEBUG] Attempt {attempt + 1}/{retries}")
             
             if method == 'GET':
-                response = requests.get(url, params=data, timeout=timeout)
+                cached = backend_response_cache.get(cache_key)
+                headers = {'If-None-Match': cached[0]} if cached else {}
+                response = requests.get(url, params=data, timeout=timeout, headers=headers)
             elif method == 'POST':
                 response = requests.post(url, json=data, timeout=timeout)
             else:
@@ -54,11 +61,20 @@ def call_backend_api(endpoint, method='GET', data=None, timeout=10, retries=3):
             
             print(f"[DEBUG] Response status: {response.status_code}")
             
+            if response.status_code == 304 and cached:
+                return json.loads(cached[1])
+            
             # Handle successful responses (including 202 Accepted for async operations)
             if response.status_code in [200, 201, 202]:
                 try:
                     result = response.json()
                     print(f"[DEBUG] API Success - Response keys: {list(result.keys()) if isinstance(result, dict) else 'N/A'}")
+                    if cache_key is not None:
+                        etag = response.headers.get('ETag')
+                        if response.status_code == 200 and etag:
+                            backend_response_cache.store(cache_key, etag, response.content)
+                        else:
+                            backend_response_cache.discard(cache_key)
                     return result
                 except json.JSONDecodeError as e:
                     print(f"[DEBUG] JSON decode error: {e}")
@@ -211,6 +227,20 @@ def query(request, q):
     else:
         return JsonResponse([], safe=False)
 
+def flight_flex(request):
+    """Cheapest fares around the requested date via a single backend call"""
+    flex_params = {
+        'origin': request.GET.get('Origin'),
+        'destination': request.GET.get('Destination'),
+        'depart_date': request.GET.get('DepartDate'),
+        'days': request.GET.get('Days', 3)
+    }
+    flex_data = call_backend_api('api/flights/search/flex/', 'GET', flex_params)
+    if flex_data:
+        return JsonResponse(flex_data)
+    else:
+        return JsonResponse({'calendar': [], 'error': 'No fares found or service unavailable'}, status=502)
+
 @csrf_exempt
 def flight(request):
     """Search flights via backend API"""
@@ -231,12 +261,13 @@ def flight(request):
     if flight_data:
         print(f"[DEBUG] Raw flight_data from API: {flight_data}")
         
-        # Extract flights list from API response
+        # Extract flights list from API response (return leg comes in the same response)
         flights = flight_data.get('flights', [])
-        print(f"[DEBUG] Number of flights: {len(flights)}")
+        flights2 = flight_data.get('return_flights', [])
+        print(f"[DEBUG] Number of flights: {len(flights)}, return flights: {len(flights2)}")
         
         # Convert time strings to proper format for template display
-        for flight in flights:
+        for flight in flights + flights2:
             # Convert time strings like "08:09:00" to "08:09" for display
             if 'depart_time' in flight and flight['depart_time']:
                 flight['depart_time_display'] = flight['depart_time'][:5]  # "08:09:00" -> "08:09"
@@ -258,15 +289,24 @@ def flight(request):
             'trip_type': search_params.get('trip_type'),
         }
         
-        # Calculate min/max prices for filters
-        if flights:
-            seat_class = search_params.get('seat_class', 'economy')
-            fare_field = f"{seat_class}_fare"
-            fares = [flight.get(fare_field, 0) for flight in flights if flight.get(fare_field)]
-            if fares:
-                context['min_price'] = min(fares)
-                context['max_price'] = max(fares)
-                print(f"[DEBUG] Price range for {seat_class}: {context['min_price']} - {context['max_price']}")
+        # Min/max prices for filters come precomputed from the backend
+        price_summary = flight_data.get('price_summary', {})
+        outbound_range = price_summary.get('outbound', {})
+        if flights and outbound_range:
+            context['min_price'] = outbound_range.get('min')
+            context['max_price'] = outbound_range.get('max')
+            print(f"[DEBUG] Price range: {context['min_price']} - {context['max_price']}")
+        
+        if search_params['trip_type'] == '2':
+            return_range = price_summary.get('return', {})
+            context.update({
+                'flights2': flights2,
+                'origin2': flight_data.get('return_origin'),
+                'destination2': flight_data.get('return_destination'),
+                'return_date': datetime.strptime(flight_data['return_date'], '%Y-%m-%d') if flight_data.get('return_date') else None,
+                'min_price2': return_range.get('min', 0),
+                'max_price2': return_range.get('max', 0)
+            })
         
         print(f"[DEBUG] Final context keys: {list(context.keys())}")
         return render(request, "flight/search.html", context)
@@ -1251,3 +1291,36 @@ def proxy_saga_logs(request, correlation_id):
         return JsonResponse({"success": False, "error": f"Backend logs API returned {response.status_code}"}, status=502)
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+
+def proxy_saga_log_stream(request, correlation_id):
+    """
+    Relay the backend SAGA log event stream so the results page receives only new entries.
+    Calls backend-service /api/saga/logs/<correlation_id>/stream/ and passes frames through unchanged.
+    """
+    try:
+        backend_url = settings.BACKEND_SERVICE_URL
+        url = f"{backend_url}/api/saga/logs/{correlation_id}/stream/"
+        headers = {'Accept': 'text/event-stream'}
+        last_event_id = request.headers.get('Last-Event-ID')
+        if last_event_id:
+            headers['Last-Event-ID'] = last_event_id
+        # Read timeout above the backend keep-alive interval, so a quiet SAGA does not drop the relay
+        upstream = requests.get(url, headers=headers, params=request.GET, stream=True, timeout=(5, 30))
+        if upstream.status_code != 200:
+            upstream.close()
+            return JsonResponse({"success": False, "error": f"Backend log stream returned {upstream.status_code}"}, status=502)
+
+        def relay():
+            try:
+                for chunk in upstream.iter_content(chunk_size=None):
+                    yield chunk
+            finally:
+                upstream.close()
+
+        response = StreamingHttpResponse(relay(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=500)